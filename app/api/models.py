@@ -39,7 +39,7 @@ class APIResponse(BaseModel):
 class ProgressResponse(BaseModel):
     """进度响应模型"""
     task_id: str = Field(..., description="任务ID")
-    status: Literal["pending", "processing", "completed", "failed"] = Field(..., description="任务状态")
+    status: Literal["pending", "processing", "completed", "failed", "cancelled"] = Field(..., description="任务状态")
     progress: int = Field(..., description="进度百分比（0-100）")
     message: str = Field(..., description="当前状态描述")
     result: Optional[TranscriptData] = Field(None, description="完成后的结果")
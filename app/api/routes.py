@@ -1,7 +1,8 @@
 """
 API路由
 """
-from fastapi import APIRouter, HTTPException, BackgroundTasks
+from fastapi import APIRouter, HTTPException, BackgroundTasks, Request
+from fastapi.responses import Response, StreamingResponse
 from app.api.models import (
     VideoRequest, APIResponse, ProgressResponse,
     SummaryRequest, SummaryResponse, TranscriptData
@@ -11,22 +12,115 @@ from app.services.subtitle_processor import SubtitleProcessor
 from app.services.video_downloader import VideoDownloader
 from app.services.asr_engine import ASREngine
 from app.services.deepseek_service import DeepSeekService
+from app.services.asr_task import ASRTaskRunner
+from app.services.transcript_store import TranscriptStore
+from app.services.revalidation import TranscriptRevalidator
+from app.services.transcript_export import TranscriptExporter, EXPORT_FORMATS, PYARROW_AVAILABLE
+from app.services import transcript_codec
+from app.services.prefetch import PrefetchScheduler
+from app.core.config import settings
+from app.core.task_store import create_task_store, FINISHED_STATUSES
+from app.core.job_queue import JobQueue
+from app.core.admission import AdmissionController
+from app.core.metrics import (
+    REGISTRY, track_stage, EXTRACT_REQUESTS, EXTRACT_FAILURES, TRANSCRIPT_CACHE_REQUESTS
+)
+from app.core import tracing
+import asyncio
+import json
 import logging
+import time
 import uuid
-from typing import Dict
+from datetime import date, timedelta
+from typing import Literal, Optional
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
-# 任务存储（生产环境应使用Redis等持久化存储）
-tasks: Dict[str, dict] = {}
+# 任务存储（默认SQLite，多个worker进程共享）
+task_store = create_task_store()
 
 bilibili_api = BilibiliAPI()
 subtitle_processor = SubtitleProcessor()
-video_downloader = VideoDownloader()
-asr_engine = ASREngine()
-deepseek_service = DeepSeekService()
+# queue 模式下API只负责入队，由独立的 ASR worker（python -m app.worker）执行
+job_queue = JobQueue() if settings.ASR_EXECUTION == "queue" else None
+if job_queue is not None and settings.TASK_STORE == "memory":
+    logger.warning("ASR_EXECUTION=queue requires a shared task store, set TASK_STORE=sqlite")
+# ASR任务准入控制；queue 模式下识别不在本机执行，不检查本机CPU/内存
+admission = AdmissionController(task_store, check_host=job_queue is None)
+# 已提取的逐字稿（字幕、ASR结果、后台预取），命中时不再请求B站接口
+transcript_store = TranscriptStore() if settings.TRANSCRIPT_CACHE_ENABLED else None
+revalidator = (
+    TranscriptRevalidator(bilibili_api, subtitle_processor, transcript_store)
+    if transcript_store is not None else None
+)
+
+# ASR和AI总结的服务在第一次用到时才创建（下载目录、浏览器池、DeepSeek连接池等），
+# 只处理有字幕视频的实例启动更快、占用内存更少
+_asr_runner: Optional[ASRTaskRunner] = None
+_deepseek_service: Optional[DeepSeekService] = None
+_prefetcher: Optional[PrefetchScheduler] = None
+
+# 本进程正在处理的 /api/extract 请求数，后台预取据此判断前台是否繁忙
+_inflight_extracts = 0
+
+
+def get_asr_runner() -> ASRTaskRunner:
+    global _asr_runner
+    if _asr_runner is None:
+        _asr_runner = ASRTaskRunner(
+            task_store, VideoDownloader(), ASREngine(), subtitle_processor, transcript_store
+        )
+    return _asr_runner
+
+
+def get_deepseek_service() -> DeepSeekService:
+    global _deepseek_service
+    if _deepseek_service is None:
+        _deepseek_service = DeepSeekService()
+    return _deepseek_service
+
+
+def get_prefetcher() -> Optional[PrefetchScheduler]:
+    """后台预取调度器；没有开启逐字稿存储时无法预取，返回 None"""
+    global _prefetcher
+    if _prefetcher is None and transcript_store is not None:
+        _prefetcher = PrefetchScheduler(
+            bilibili_api, subtitle_processor, transcript_store, task_store, admission,
+            job_queue=job_queue,
+            asr_runner_factory=get_asr_runner,
+            foreground_requests=lambda: _inflight_extracts,
+            revalidator=revalidator
+        )
+    return _prefetcher
+
+
+async def close_services():
+    """关闭已创建的服务持有的连接和浏览器"""
+    if _asr_runner is not None:
+        await _asr_runner.video_downloader.close()
+    if _deepseek_service is not None:
+        await _deepseek_service.close()
+
+# 采集时才计算的负载指标（任务存储/队列是多进程共享的，反映整个部署）
+REGISTRY.gauge(
+    "bili_tasks_in_flight", "Pending or processing ASR tasks in the task store",
+    func=lambda: admission.snapshot()["active_tasks"]
+)
+REGISTRY.gauge(
+    "bili_pending_audio_seconds", "Audio duration of pending or processing ASR tasks",
+    func=lambda: admission.snapshot()["pending_audio_seconds"]
+)
+REGISTRY.gauge(
+    "bili_task_retained_result_bytes", "Bytes of task results kept in the task store (excluding offloaded results)",
+    func=lambda: task_store.retained_bytes()
+)
+if job_queue is not None:
+    REGISTRY.gauge(
+        "bili_asr_queue_depth", "Queued ASR jobs waiting for a worker",
+        func=lambda: job_queue.depth().get("queued", 0)
+    )
 
 
 @router.post("/extract", response_model=APIResponse)
@@ -34,17 +128,55 @@ async def extract_transcript(request: VideoRequest, background_tasks: Background
     """
     提取视频逐字稿主接口
     """
+    global _inflight_extracts
+    _inflight_extracts += 1
+    try:
+        return await _extract_transcript(request, background_tasks)
+    finally:
+        _inflight_extracts -= 1
+
+
+async def _extract_transcript(request: VideoRequest, background_tasks: BackgroundTasks) -> APIResponse:
     try:
         logger.info(f"Received request to extract transcript: {request.url}")
 
         # 步骤1：解析BV号
         bvid = bilibili_api.extract_bvid(request.url)
         if not bvid:
+            EXTRACT_FAILURES.inc(reason="invalid_url")
             raise HTTPException(status_code=400, detail="无效的B站视频链接")
 
+        # 之前提取过或已被后台预取的视频直接返回
+        if transcript_store is not None:
+            cached = transcript_store.get(bvid)
+            if cached and cached["stale"]:
+                # 过期条目发条件请求，未变化时不用重新下载字幕
+                cached = await revalidator.revalidate(cached)
+            TRANSCRIPT_CACHE_REQUESTS.inc(result="hit" if cached else "miss")
+            tracing.mark("transcript_cache", hit=cached is not None)
+            if cached:
+                logger.info(f"Transcript store hit for {bvid} ({cached['method']})")
+                with track_stage("format"):
+                    transcript = subtitle_processor.format_transcript(cached["utterances"], request.format)
+
+                EXTRACT_REQUESTS.inc(method=cached["method"])
+                return APIResponse(
+                    code=0,
+                    message="success",
+                    data=TranscriptData(
+                        bvid=bvid,
+                        title=cached["title"],
+                        duration=cached["duration"],
+                        method=cached["method"],
+                        transcript=transcript,
+                        utterances=cached["utterances"]
+                    )
+                )
+
         # 步骤2：获取视频信息
         video_info = await bilibili_api.get_video_info(bvid)
         if not video_info:
+            EXTRACT_FAILURES.inc(reason="video_not_found")
             raise HTTPException(status_code=404, detail="视频不存在或无法访问")
 
         cid = video_info.get('cid')
@@ -54,12 +186,21 @@ async def extract_transcript(request: VideoRequest, background_tasks: Background
         logger.info(f"Video info: {title} (BV{bvid}, CID: {cid})")
 
         # 步骤3：尝试获取CC字幕
-        subtitle = await bilibili_api.get_subtitle(bvid, cid)
+        subtitle_track = await bilibili_api.get_subtitle_track(bvid, cid)
+        subtitle = subtitle_track["body"] if subtitle_track else None
         if subtitle:
             logger.info("Found CC subtitle")
-            utterances = subtitle_processor.parse_bilibili_subtitle(subtitle)
-            transcript = subtitle_processor.format_transcript(utterances, request.format)
+            with track_stage("format"):
+                utterances = subtitle_processor.parse_bilibili_subtitle(subtitle)
+                transcript = subtitle_processor.format_transcript(utterances, request.format)
+            if transcript_store is not None:
+                transcript_store.put(
+                    bvid, cid, title, duration, "subtitle", utterances, subtitle_track["url"],
+                    {"info": video_info.get("validators") or {}, "subtitle": subtitle_track["validators"]},
+                    owner=video_info.get("owner")
+                )
 
+            EXTRACT_REQUESTS.inc(method="subtitle")
             return APIResponse(
                 code=0,
                 message="success",
@@ -74,12 +215,21 @@ async def extract_transcript(request: VideoRequest, background_tasks: Background
             )
 
         # 步骤4：尝试获取AI字幕
-        ai_subtitle = await bilibili_api.get_ai_subtitle(bvid, cid)
+        ai_subtitle_track = await bilibili_api.get_subtitle_track(bvid, cid, ai=True)
+        ai_subtitle = ai_subtitle_track["body"] if ai_subtitle_track else None
         if ai_subtitle:
             logger.info("Found AI subtitle")
-            utterances = subtitle_processor.parse_bilibili_subtitle(ai_subtitle)
-            transcript = subtitle_processor.format_transcript(utterances, request.format)
+            with track_stage("format"):
+                utterances = subtitle_processor.parse_bilibili_subtitle(ai_subtitle)
+                transcript = subtitle_processor.format_transcript(utterances, request.format)
+            if transcript_store is not None:
+                transcript_store.put(
+                    bvid, cid, title, duration, "ai_subtitle", utterances, ai_subtitle_track["url"],
+                    {"info": video_info.get("validators") or {}, "subtitle": ai_subtitle_track["validators"]},
+                    owner=video_info.get("owner")
+                )
 
+            EXTRACT_REQUESTS.inc(method="ai_subtitle")
             return APIResponse(
                 code=0,
                 message="success",
@@ -96,40 +246,55 @@ async def extract_transcript(request: VideoRequest, background_tasks: Background
         # 步骤5：没有字幕，需要下载视频并进行ASR
         logger.info("No subtitle found, will use ASR")
 
-        # 检查 ASR 是否可用
-        try:
-            # 尝试导入 ASR 引擎检查是否可用
-            if not hasattr(asr_engine, '_check_availability'):
-                # 添加可用性检查方法
-                from app.services.asr_engine import BCUT_AVAILABLE, WHISPER_AVAILABLE
-                if not BCUT_AVAILABLE and not WHISPER_AVAILABLE:
-                    raise HTTPException(
-                        status_code=501,
-                        detail="ASR 功能暂不可用。该视频没有字幕，需要语音识别功能，但当前部署环境不支持。建议选择有字幕的视频。"
-                    )
-        except ImportError:
+        # 检查 ASR 是否可用（queue 模式下由worker进程负责识别，API进程可以不安装ASR引擎）
+        if job_queue is None and not get_asr_runner().asr_engine.is_available():
+            EXTRACT_FAILURES.inc(reason="asr_unavailable")
             raise HTTPException(
                 status_code=501,
                 detail="ASR 功能暂不可用。该视频没有字幕，需要语音识别功能，但当前部署环境不支持。建议选择有字幕的视频。"
             )
 
+        # 过载时拒绝新的ASR任务，让已接收的任务保持可预期的延迟
+        # 准入检查和任务存储都要读写多进程共享的SQLite，放到线程池里，避免等写锁时阻塞事件循环
+        decision = await asyncio.to_thread(admission.check, duration)
+        if not decision.admitted:
+            EXTRACT_FAILURES.inc(reason="overloaded")
+            raise HTTPException(
+                status_code=429,
+                detail=f"{decision.reason}，请 {decision.retry_after} 秒后重试",
+                headers={"Retry-After": str(decision.retry_after)}
+            )
+
         # 创建异步任务
         task_id = str(uuid.uuid4())
-        tasks[task_id] = {
+        await task_store.acreate(task_id, {
             "status": "pending",
             "progress": 0,
             "message": "任务已创建",
             "bvid": bvid,
             "title": title,
             "duration": duration
-        }
+        })
 
-        # 添加后台任务
-        background_tasks.add_task(
-            process_video_with_asr,
-            task_id, request.url, bvid, cid, title, duration, request.format
-        )
+        if job_queue is not None:
+            # 交给独立的ASR worker处理
+            await asyncio.to_thread(job_queue.enqueue, task_id, {
+                "task_id": task_id,
+                "url": request.url,
+                "bvid": bvid,
+                "cid": cid,
+                "title": title,
+                "duration": duration,
+                "output_format": request.format
+            })
+        else:
+            # 添加后台任务
+            background_tasks.add_task(
+                process_video_with_asr,
+                task_id, request.url, bvid, cid, title, duration, request.format
+            )
 
+        EXTRACT_REQUESTS.inc(method="asr")
         return APIResponse(
             code=0,
             message="字幕不存在，已创建ASR任务",
@@ -147,18 +312,97 @@ async def extract_transcript(request: VideoRequest, background_tasks: Background
         raise
     except Exception as e:
         logger.error(f"Error extracting transcript: {str(e)}", exc_info=True)
+        EXTRACT_FAILURES.inc(reason="internal")
         raise HTTPException(status_code=500, detail=f"服务器错误: {str(e)}")
 
 
+@router.get("/transcripts/{bvid}")
+async def get_stored_transcript(bvid: str, format: Literal["txt", "srt", "json", "bin"] = "bin"):
+    """
+    读取已保存的逐字稿（不请求B站接口，也不会触发提取）
+
+    format=bin 返回紧凑的二进制编码（application/octet-stream，格式见 app.services.transcript_codec），
+    视频信息放在 X-Transcript-* 响应头中；其他格式返回纯文本
+    """
+    if transcript_store is None:
+        raise HTTPException(status_code=501, detail="逐字稿存储未开启")
+    entry = transcript_store.get(bvid)
+    if entry is None:
+        raise HTTPException(status_code=404, detail="逐字稿不存在，请先调用 /api/extract")
+
+    headers = {
+        "X-Transcript-Method": entry["method"],
+        "X-Transcript-Duration": str(entry["duration"] or 0),
+        "X-Transcript-Utterances": str(len(entry["utterances"])),
+    }
+    if format == "bin":
+        content = subtitle_processor.to_binary(entry["utterances"], settings.TRANSCRIPT_COMPRESSION)
+        return Response(content, media_type=transcript_codec.MEDIA_TYPE, headers=headers)
+    media_type = "application/json" if format == "json" else "text/plain"
+    return Response(subtitle_processor.format_transcript(entry["utterances"], format), media_type=media_type,
+                    headers=headers)
+
+
+@router.get("/search")
+async def search_transcripts(q: str, limit: int = 20):
+    """
+    在已保存的逐字稿中全文搜索句子（子串匹配），返回所在视频和时间点
+    """
+    if not q.strip():
+        raise HTTPException(status_code=400, detail="搜索内容不能为空")
+    if transcript_store is None or not transcript_store.search_enabled:
+        raise HTTPException(status_code=501, detail="逐字稿搜索不可用")
+    results = transcript_store.search(q, min(max(limit, 1), 100))
+    return {"query": q, "results": results}
+
+
+@router.get("/export")
+async def export_transcripts(
+    format: Literal["ndjson", "zip", "parquet", "arrow"] = "ndjson",
+    file_format: Literal["srt", "txt"] = "srt",
+    uploader: Optional[str] = None,
+    method: Optional[Literal["subtitle", "ai_subtitle", "asr"]] = None,
+    since: Optional[date] = None,
+    until: Optional[date] = None,
+    limit: Optional[int] = None
+):
+    """
+    批量导出已保存的逐字稿，流式返回
+
+    - format: ndjson（每行一个视频）/ zip（每个视频一个 file_format 文件）/
+      parquet、arrow（每句话一行的列式文件，需要安装 pyarrow）
+    - uploader: UP主名称；method: 逐字稿来源；since / until: 提取日期范围（含两端）
+    """
+    if transcript_store is None:
+        raise HTTPException(status_code=501, detail="逐字稿存储未开启")
+    if format in ("parquet", "arrow") and not PYARROW_AVAILABLE:
+        raise HTTPException(status_code=501, detail="导出 Parquet/Arrow 需要安装 pyarrow")
+
+    entries = transcript_store.iter_entries(
+        owner=uploader,
+        method=method,
+        since=time.mktime(since.timetuple()) if since else None,
+        until=time.mktime((until + timedelta(days=1)).timetuple()) if until else None,
+        limit=limit
+    )
+    media_type, extension = EXPORT_FORMATS[format]
+    filename = f"transcripts-{time.strftime('%Y%m%d-%H%M%S')}.{extension}"
+    return StreamingResponse(
+        TranscriptExporter(subtitle_processor).export(format, entries, file_format),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+
 @router.get("/progress/{task_id}", response_model=ProgressResponse)
 async def get_progress(task_id: str):
     """
     查询任务进度
     """
-    if task_id not in tasks:
+    task = await task_store.aget(task_id)
+    if task is None:
         raise HTTPException(status_code=404, detail="任务不存在")
-
-    task = tasks[task_id]
+    await task_store.atouch(task_id)
 
     return ProgressResponse(
         task_id=task_id,
@@ -169,6 +413,122 @@ async def get_progress(task_id: str):
     )
 
 
+def _sse(event: str, data: dict) -> str:
+    """格式化一条 Server-Sent Event"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+@router.get("/progress/{task_id}/stream")
+async def stream_progress(task_id: str, request: Request):
+    """
+    以 Server-Sent Events 推送任务进度
+
+    事件类型:
+    - progress: 状态/进度/描述变化
+    - partial: 流式识别新完成的窗口的句子（增量；窗口可能乱序完成，客户端按 start 排序合并）
+    - partial_reset: 流式识别失败改为顺序识别，之前推送的部分结果作废
+    - completed / failed / cancelled: 任务结束（completed 带完整结果），之后连接关闭
+    """
+    if await task_store.aget(task_id, include_result=False) is None:
+        raise HTTPException(status_code=404, detail="任务不存在")
+
+    async def event_stream():
+        since = None
+        sent_windows = 0
+        while not await request.is_disconnected():
+            # 订阅期间视为有人在等待，任务不会被当作无人查看而回收
+            await task_store.atouch(task_id)
+            task = await task_store.wait_for_update(task_id, since, settings.TASK_STREAM_KEEPALIVE)
+            if task is None:
+                yield _sse("failed", {"task_id": task_id, "message": "任务不存在"})
+                return
+            if since is not None and task["updated_at"] <= since:
+                # 没有变化，发送注释行保持连接
+                yield ": keep-alive\n\n"
+                continue
+            since = task["updated_at"]
+
+            if task["status"] == "completed":
+                # 等待期间不加载结果，完成时再取一次
+                task = await task_store.aget(task_id) or task
+
+            progress = ProgressResponse(
+                task_id=task_id,
+                status=task["status"],
+                progress=task["progress"],
+                message=task["message"],
+                result=task.get("result")
+            )
+
+            windows = task.get("partial_windows", 0)
+            if windows < sent_windows:
+                sent_windows = 0
+                yield _sse("partial_reset", {"task_id": task_id})
+            if windows > sent_windows:
+                sent_windows, utterances = await task_store.aget_partials(task_id, after=sent_windows)
+                if utterances:
+                    yield _sse("partial", {"task_id": task_id, "utterances": utterances})
+
+            if progress.status in FINISHED_STATUSES:
+                yield _sse(progress.status, progress.model_dump())
+                return
+            yield _sse("progress", progress.model_dump(exclude={"result"}))
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@router.delete("/tasks/{task_id}", response_model=ProgressResponse)
+async def cancel_task(task_id: str):
+    """
+    取消ASR任务
+    正在执行的任务会中止下载和识别并清理临时文件；已结束的任务返回 409
+    """
+    task = await task_store.aupdate(task_id, status="cancelled", message="任务已取消")
+    if task is None:
+        if await task_store.aget(task_id, include_result=False) is None:
+            raise HTTPException(status_code=404, detail="任务不存在")
+        raise HTTPException(status_code=409, detail="任务已结束，无法取消")
+
+    if job_queue is not None:
+        await asyncio.to_thread(job_queue.cancel, task_id)
+    logger.info(f"Task {task_id} cancelled by client")
+
+    return ProgressResponse(
+        task_id=task_id,
+        status=task["status"],
+        progress=task["progress"],
+        message=task["message"]
+    )
+
+
+@router.get("/tasks/stats")
+async def get_task_stats():
+    """
+    任务存储统计
+    包含各状态的任务数、当前保留的结果字节数、准入控制使用的负载快照、
+    逐字稿存储条目数和最近一轮后台预取的统计
+    """
+    counts = {}
+    for task in await task_store.alist():
+        counts[task["status"]] = counts.get(task["status"], 0) + 1
+    stats = {
+        "tasks": counts,
+        "retained_result_bytes": await task_store.aretained_bytes()
+    }
+    if job_queue is not None:
+        stats["queue"] = await asyncio.to_thread(job_queue.depth)
+    stats["admission"] = await asyncio.to_thread(admission.snapshot)
+    if transcript_store is not None:
+        stats["transcripts"] = await asyncio.to_thread(transcript_store.count)
+    if _prefetcher is not None:
+        stats["prefetch"] = _prefetcher.last_report
+    return stats
+
+
 @router.post("/summarize", response_model=SummaryResponse)
 async def summarize_transcript(request: SummaryRequest):
     """
@@ -187,7 +547,7 @@ async def summarize_transcript(request: SummaryRequest):
             )
 
         # 调用 DeepSeek 服务
-        result = await deepseek_service.summarize_transcript(
+        result = await get_deepseek_service().summarize_transcript(
             transcript=request.transcript,
             style=request.style
         )
@@ -209,6 +569,49 @@ async def summarize_transcript(request: SummaryRequest):
         )
 
 
+@router.post("/summarize/stream")
+async def summarize_transcript_stream(request: SummaryRequest):
+    """
+    以 Server-Sent Events 流式返回 DeepSeek 总结
+
+    事件类型:
+    - stage: 处理阶段（compact 逐字稿压缩统计 / map 分段总结已完成块数 / reduce 合并开始 / waiting 等待相同请求）
+    - delta: 模型输出的增量文本
+    - key_point: 输出中新识别出的关键要点
+    - done: 完整结果（summary + key_points），之后连接关闭
+    - error: 总结失败
+    """
+    logger.info(f"Received streaming summarize request, text length: {len(request.transcript)}, style: {request.style}")
+
+    # 检查文本长度
+    if len(request.transcript) < 10:
+        raise HTTPException(
+            status_code=400,
+            detail="逐字稿内容过短，无法总结"
+        )
+
+    async def event_stream():
+        try:
+            async for event, data in get_deepseek_service().summarize_stream(request.transcript, request.style):
+                if event == "delta":
+                    yield _sse("delta", {"text": data})
+                elif event == "key_point":
+                    yield _sse("key_point", {"point": data})
+                elif event == "stage":
+                    yield _sse("stage", data)
+                else:
+                    yield _sse("done", SummaryResponse(**data).model_dump())
+        except Exception as e:
+            logger.error(f"Streaming summarization failed: {str(e)}", exc_info=True)
+            yield _sse("error", {"message": f"总结失败: {str(e)}"})
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
 async def process_video_with_asr(
     task_id: str,
     url: str,
@@ -221,58 +624,4 @@ async def process_video_with_asr(
     """
     后台任务：下载视频并进行ASR识别
     """
-    try:
-        # 更新进度：开始处理
-        tasks[task_id].update({
-            "status": "processing",
-            "progress": 10,
-            "message": "开始下载视频..."
-        })
-
-        # 下载音频
-        audio_path = await video_downloader.download_audio_only(url)
-
-        # 检查下载是否成功
-        if not audio_path:
-            raise Exception("视频下载失败，无法进行语音识别")
-
-        tasks[task_id].update({
-            "progress": 50,
-            "message": "下载完成，开始语音识别..."
-        })
-
-        # ASR识别
-        utterances = await asr_engine.recognize(audio_path)
-
-        tasks[task_id].update({
-            "progress": 90,
-            "message": "识别完成，格式化输出..."
-        })
-
-        # 格式化输出
-        transcript = subtitle_processor.format_transcript(utterances, output_format)
-
-        # 完成
-        tasks[task_id].update({
-            "status": "completed",
-            "progress": 100,
-            "message": "处理完成",
-            "result": TranscriptData(
-                bvid=bvid,
-                title=title,
-                duration=duration,
-                method="asr",
-                transcript=transcript,
-                utterances=utterances
-            )
-        })
-
-        logger.info(f"Task {task_id} completed successfully")
-
-    except Exception as e:
-        logger.error(f"Task {task_id} failed: {str(e)}", exc_info=True)
-        tasks[task_id].update({
-            "status": "failed",
-            "progress": 0,
-            "message": f"处理失败: {str(e)}"
-        })
+    await get_asr_runner().run(task_id, url, bvid, cid, title, duration, output_format)
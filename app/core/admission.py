@@ -0,0 +1,146 @@
+"""
+ASR任务准入控制
+根据进行中的ASR任务数、待处理音频总时长以及本机CPU/内存余量决定是否接收新的ASR任务；
+超限时返回建议的重试等待时间，保证过载时已接收任务的延迟可预期
+"""
+import logging
+import math
+import os
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+from app.core.config import settings, parse_size
+from app.core.task_store import TaskStore, ACTIVE_STATUSES
+
+logger = logging.getLogger(__name__)
+
+# 建议重试等待时间的范围（秒）
+MIN_RETRY_AFTER = 1
+MAX_RETRY_AFTER = 600
+
+
+@dataclass
+class AdmissionDecision:
+    """准入判断结果"""
+    admitted: bool
+    reason: Optional[str] = None
+    retry_after: int = 0  # 拒绝时建议的重试等待时间（秒）
+
+
+def _cpu_load() -> Optional[float]:
+    """每个CPU核心的1分钟平均负载，平台不支持时返回 None"""
+    try:
+        return os.getloadavg()[0] / (os.cpu_count() or 1)
+    except (AttributeError, OSError):
+        return None
+
+
+def _available_memory() -> Optional[int]:
+    """可用内存字节数（/proc/meminfo 的 MemAvailable），平台不支持时返回 None"""
+    try:
+        with open("/proc/meminfo") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+
+class AdmissionController:
+    """ASR任务准入控制器"""
+
+    # 负载快照的缓存时间（秒），突发请求时不必每次都扫描任务存储
+    snapshot_ttl: float = 1.0
+
+    def __init__(self, task_store: TaskStore, check_host: bool = True):
+        """
+        check_host: 是否检查本机CPU/内存；ASR在独立worker中执行时（queue 模式）本机负载与识别无关
+        """
+        self.task_store = task_store
+        self.check_host = check_host
+        self.max_tasks = settings.ADMISSION_MAX_TASKS
+        self.max_pending_audio = settings.ADMISSION_MAX_PENDING_AUDIO
+        self.max_cpu_load = settings.ADMISSION_MAX_CPU_LOAD
+        self.min_free_memory = parse_size(settings.ADMISSION_MIN_FREE_MEMORY)
+        self._snapshot: Optional[Dict[str, Any]] = None
+        self._snapshot_at = 0.0
+
+    def snapshot(self) -> Dict[str, Any]:
+        """当前负载：进行中任务数、待处理音频时长、近期处理速度、本机CPU/内存"""
+        now = time.monotonic()
+        if self._snapshot is not None and now - self._snapshot_at < self.snapshot_ttl:
+            return self._snapshot
+
+        # 后台预取的任务只在空闲时提交、优先级最低，不占用户请求的准入名额
+        active = [
+            task for task in self.task_store.list(statuses=list(ACTIVE_STATUSES))
+            if task.get("source") != "prefetch"
+        ]
+        window = settings.ADMISSION_RATE_WINDOW
+        since = time.time() - window
+        drained = sum(
+            task.get("duration") or 0
+            for task in self.task_store.list(statuses=["completed"])
+            if task["updated_at"] >= since
+        )
+
+        self._snapshot = {
+            "active_tasks": len(active),
+            "pending_audio_seconds": sum(task.get("duration") or 0 for task in active),
+            # 最近一段时间每秒处理完的音频秒数，没有历史时为 None
+            "drain_rate": drained / window if drained else None,
+            "cpu_load": _cpu_load() if self.check_host else None,
+            "available_memory": _available_memory() if self.check_host else None,
+        }
+        self._snapshot_at = now
+        return self._snapshot
+
+    def check(self, duration: Optional[float] = None) -> AdmissionDecision:
+        """判断一个时长为 duration 秒的新ASR任务能否接收"""
+        snapshot = self.snapshot()
+        active = snapshot["active_tasks"]
+        pending = snapshot["pending_audio_seconds"]
+        duration = duration or 0
+
+        if self.max_tasks > 0 and active >= self.max_tasks:
+            # 需要先处理完多出来的任务，按平均时长折算成音频秒数
+            excess = active - self.max_tasks + 1
+            return self._reject(
+                f"进行中的识别任务已达上限（{active}/{self.max_tasks}）",
+                excess * pending / active
+            )
+
+        # 队列为空时总是接收，超长视频不会被永远拒绝
+        if self.max_pending_audio > 0 and active and pending + duration > self.max_pending_audio:
+            return self._reject(
+                f"待识别音频过多（{int(pending)}秒）",
+                pending + duration - self.max_pending_audio
+            )
+
+        cpu_load = snapshot["cpu_load"]
+        if self.max_cpu_load > 0 and cpu_load is not None and cpu_load > self.max_cpu_load:
+            return self._reject(f"服务器CPU负载过高（{cpu_load:.2f}）")
+
+        memory = snapshot["available_memory"]
+        if memory is not None and memory < self.min_free_memory:
+            return self._reject(f"服务器可用内存不足（{memory // (1024 * 1024)}MB）")
+
+        # 缓存的快照计入刚接收的任务，同一秒内的突发请求不会全部放行
+        snapshot["active_tasks"] = active + 1
+        snapshot["pending_audio_seconds"] = pending + duration
+        return AdmissionDecision(admitted=True)
+
+    def _reject(self, reason: str, backlog_seconds: Optional[float] = None) -> AdmissionDecision:
+        """
+        拒绝并估算重试时间：需要消化的音频秒数 / 近期处理速度；
+        无法估算时（本机资源不足、没有历史数据）使用 ADMISSION_RETRY_AFTER
+        """
+        rate = self.snapshot()["drain_rate"]
+        if backlog_seconds is not None and rate:
+            retry_after = backlog_seconds / rate
+        else:
+            retry_after = settings.ADMISSION_RETRY_AFTER
+        retry_after = min(MAX_RETRY_AFTER, max(MIN_RETRY_AFTER, math.ceil(retry_after)))
+        logger.warning(f"ASR task rejected: {reason}, retry after {retry_after}s")
+        return AdmissionDecision(admitted=False, reason=reason, retry_after=retry_after)
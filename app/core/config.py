@@ -18,24 +18,109 @@ class Settings(BaseSettings):
     BILIBILI_COOKIE: Optional[str] = None
     BILIBILI_API_BASE: str = "https://api.bilibili.com"
 
+    # HTTP连接池
+    HTTP_POOL_SIZE: int = 100  # 连接池总连接数
+    HTTP_POOL_SIZE_PER_HOST: int = 16  # 单个主机的最大连接数
+
     # ASR配置
-    ASR_PROVIDER: str = "bcut"  # bcut or whisper
+    ASR_PROVIDER: str = "bcut"  # bcut, whisper or stub
+    ASR_FALLBACK_PROVIDER: Optional[str] = "whisper"  # 主引擎失败时的备选引擎
     WHISPER_MODEL: str = "base"
 
+    # 流式识别：边下载边解码边识别（需要 ffmpeg 且ASR后端支持分窗口识别）
+    ASR_STREAMING: bool = True
+    ASR_STREAM_WINDOW_SECONDS: int = 30  # 每个识别窗口的音频时长（秒）
+    ASR_STREAM_WORKERS: int = 2  # 并行识别的窗口数
+
+    # 桩ASR引擎配置（离线压测用）
+    ASR_STUB_SPEED: float = 10.0  # 识别速度（音频时长/处理耗时），<=0 表示不消耗CPU
+    ASR_STUB_SEGMENT_SECONDS: float = 5.0  # 每句话的时长（秒）
+    ASR_STUB_BYTES_PER_SECOND: int = 16000  # 未知时长时按文件大小估算（约128kbps）
+
     # 文件存储
     UPLOAD_DIR: str = "./data/uploads"
     TEMP_DIR: str = "./data/temp"
-    MAX_FILE_SIZE: str = "500MB"
+    MAX_FILE_SIZE: str = "500MB"  # 单个音频文件的大小上限
+    AUDIO_CACHE_MAX_SIZE: str = "2GB"  # 音频缓存的磁盘预算，超出后按LRU淘汰
+
+    # 音频下载配置
+    DASH_AUDIO_MIN_BANDWIDTH: int = 32000  # 可接受的最低音频码率（bps），选满足条件中最小的流
+    DOWNLOAD_SEGMENT_SIZE: int = 1024 * 1024  # 分段下载时每个Range请求的字节数
+    DOWNLOAD_CONCURRENCY: int = 4  # 单个文件并行下载的分段数
+
+    # snapany 备选下载的浏览器池
+    BROWSER_POOL_SIZE: int = 2  # 最多同时运行的 Chromium 数
+    BROWSER_MAX_USES: int = 50  # 每个浏览器处理多少个任务后重启
+    BROWSER_MAX_CONCURRENCY: int = 4  # 同时进行的页面任务数上限
 
     # 日志配置
     LOG_LEVEL: str = "INFO"
     LOG_FILE: str = "./logs/app.log"
+    LOG_ASYNC: bool = True  # 日志写入由后台线程完成，不阻塞事件循环
+    LOG_FORMAT: str = "text"  # text / json（每行一个JSON对象）
+    # 按logger采样INFO及以下级别的日志，如 "app.services.subtitle_processor=0.1,httpx=0.01"；WARNING及以上不采样
+    LOG_SAMPLING: str = ""
+    TRACING_ENABLED: bool = True  # /api/extract、/api/summarize 返回 Server-Timing，支持 ?trace=1
 
     # DeepSeek API配置（预留）
     DEEPSEEK_API_KEY: Optional[str] = None
     DEEPSEEK_API_URL: str = "https://api.deepseek.com/v1"
+    DEEPSEEK_TIMEOUT: float = 120.0  # 单次请求超时（秒）
+    DEEPSEEK_MAX_CONNECTIONS: int = 20  # 连接池大小
+    SUMMARY_SINGLE_SHOT_TOKENS: int = 24000  # 逐字稿估算token数超过该值时改用分段总结（map-reduce）
+    SUMMARY_CHUNK_TOKENS: int = 6000  # 分段总结时每块的token预算
+    SUMMARY_MAP_CONCURRENCY: int = 4  # 同时进行的分块总结请求数
+    SUMMARY_MAP_MAX_TOKENS: int = 1500  # 每块要点的最大输出token数
+    SUMMARY_COMPACT: bool = True  # 总结前在本地压缩逐字稿（去语气词、合并重复字幕）
+    SUMMARY_CACHE_ENABLED: bool = True
+    SUMMARY_CACHE_DB_PATH: str = "./data/summaries.db"
+    SUMMARY_CACHE_TTL: int = 604800  # 总结缓存有效期（秒），默认7天
+    SUMMARY_CACHE_MAX_SIZE: str = "50MB"  # 总结缓存总大小上限
 
     # 任务配置
+    TASK_STORE: str = "sqlite"  # sqlite（多进程共享、可持久化）或 memory（仅单进程）
+    TASK_DB_PATH: str = "./data/tasks.db"
+    TASK_STREAM_POLL_INTERVAL: float = 0.5  # 进度推送时检查其他进程更新的间隔（秒）
+    TASK_STREAM_KEEPALIVE: int = 15  # 进度推送无变化时发送心跳的间隔（秒）
+    TASK_RESULT_TTL: int = 3600  # 已完成/失败任务的保留时间（秒）
+    TASK_RESULT_MAX_SIZE: str = "200MB"  # 保留的任务结果总大小上限
+    TASK_RESULT_DIR: str = "./data/results"  # 结果超出 TASK_RESULT_MAX_SIZE 时冷结果的转存目录
+    TASK_SWEEP_INTERVAL: int = 60  # 后台清理任务的间隔（秒）
+    TASK_ABANDON_TIMEOUT: int = 300  # 进行中的任务超过该时间无人轮询/订阅进度时自动取消（秒），0 表示不取消
+    # ASR执行方式：inline（API进程内后台执行）或 queue（入队，由 python -m app.worker 执行）
+    ASR_EXECUTION: str = "inline"
+    JOB_QUEUE_DB_PATH: Optional[str] = None  # 任务队列数据库，默认与 TASK_DB_PATH 相同
+    WORKER_CONCURRENCY: int = 1  # 每个worker进程同时处理的ASR任务数
+    WORKER_POLL_INTERVAL: float = 1.0  # 队列为空时的轮询间隔（秒）
+    WORKER_LEASE_SECONDS: int = 60  # 任务租约时长，worker失联超过该时间后任务会被其他worker接手
+    # ASR准入控制（超限时 /api/extract 对需要ASR的视频返回 429 + Retry-After，有字幕的视频不受影响）
+    ADMISSION_MAX_TASKS: int = 8  # 进行中（排队+识别中）的ASR任务数上限，0 表示不限制
+    ADMISSION_MAX_PENDING_AUDIO: int = 14400  # 进行中任务的音频总时长上限（秒），0 表示不限制
+    ADMISSION_MAX_CPU_LOAD: float = 2.0  # 每核1分钟平均负载上限，0 表示不检查（仅 inline 模式）
+    ADMISSION_MIN_FREE_MEMORY: str = "256MB"  # 可用内存下限（仅 inline 模式）
+    ADMISSION_RATE_WINDOW: int = 600  # 根据最近多长时间内完成的任务估算处理速度（秒）
+    ADMISSION_RETRY_AFTER: int = 30  # 无法估算时建议的重试等待时间（秒）
+
+    # 逐字稿存储（命中时 /api/extract 直接返回，不再请求B站接口）
+    TRANSCRIPT_CACHE_ENABLED: bool = True
+    TRANSCRIPT_DB_PATH: str = "./data/transcripts.db"
+    TRANSCRIPT_CACHE_TTL: int = 604800  # 逐字稿有效期（秒），默认7天；过期后用 ETag/Last-Modified 重新验证
+    TRANSCRIPT_STALE_TTL: int = 2592000  # 过期后继续保留用于重新验证的时间（秒），默认30天
+    TRANSCRIPT_COMPRESSION: str = "zstd"  # 逐字稿二进制编码的压缩方式：zstd（未安装 zstandard 时用 zlib）/ zlib / none
+
+    # 后台预取（只需在一个API实例上开启）
+    PREFETCH_ENABLED: bool = False
+    PREFETCH_UPLOADERS: str = ""  # 关注的UP主 mid，逗号分隔
+    PREFETCH_UPLOADER_VIDEOS: int = 10  # 每个UP主预取最新的几个投稿
+    PREFETCH_TRENDING: int = 20  # 预取的热门视频数，0 表示不预取热门
+    PREFETCH_INTERVAL: int = 1800  # 两轮预取的间隔（秒）
+    PREFETCH_MAX_VIDEOS: int = 50  # 每轮最多处理的视频数（已缓存的不计）
+    PREFETCH_REQUEST_INTERVAL: float = 1.0  # 相邻两个视频之间的间隔（秒），避免请求过快
+    PREFETCH_ASR_BUDGET: int = 0  # 每轮为无字幕视频提交ASR的音频总时长上限（秒），0 表示不做ASR
+    PREFETCH_ASR_PRIORITY: int = -10  # 预取ASR任务的队列优先级（用户任务为0）
+    PREFETCH_MAX_INFLIGHT: int = 4  # 本进程前台提取请求达到该数时暂停
+    PREFETCH_MAX_ACTIVE_TASKS: int = 1  # 用户的ASR任务（排队+识别中）达到该数时暂停
+    PREFETCH_MAX_CPU_LOAD: float = 1.0  # 每核1分钟平均负载超过该值时暂停，0 表示不检查（仅 inline 模式）
     MAX_VIDEO_DURATION: int = 7200  # 最大视频时长（秒）
     REQUEST_TIMEOUT: int = 1800  # 请求超时时间（秒）
     MAX_RETRY: int = 3  # 最大重试次数
@@ -45,5 +130,18 @@ class Settings(BaseSettings):
         env_file_encoding = "utf-8"
 
 
+def parse_size(value: str) -> int:
+    """
+    解析带单位的大小配置
+    例如: "500MB" -> 524288000, "2GB", "1024"（字节）
+    """
+    units = {"KB": 1024, "MB": 1024 ** 2, "GB": 1024 ** 3, "TB": 1024 ** 4, "B": 1}
+    text = str(value).strip().upper()
+    for unit, factor in units.items():
+        if text.endswith(unit):
+            return int(float(text[:-len(unit)].strip()) * factor)
+    return int(float(text))
+
+
 # 创建全局配置实例
 settings = Settings()
@@ -0,0 +1,51 @@
+"""
+共享HTTP连接池
+所有对外请求复用同一个 aiohttp 会话，避免每次请求都重新建连和握手
+"""
+import asyncio
+import ssl
+from typing import Optional
+
+import aiohttp
+
+from app.core.config import settings
+
+_session: Optional[aiohttp.ClientSession] = None
+_session_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def _make_ssl_context() -> ssl.SSLContext:
+    # 与 BilibiliAPI 保持一致：禁用证书验证
+    context = ssl.create_default_context()
+    context.check_hostname = False
+    context.verify_mode = ssl.CERT_NONE
+    return context
+
+
+def get_http_session() -> aiohttp.ClientSession:
+    """
+    获取共享会话
+    必须在事件循环中调用；事件循环变化（如脚本多次 asyncio.run）时会重新创建
+    """
+    global _session, _session_loop
+
+    loop = asyncio.get_running_loop()
+    if _session is None or _session.closed or _session_loop is not loop:
+        connector = aiohttp.TCPConnector(
+            ssl=_make_ssl_context(),
+            limit=settings.HTTP_POOL_SIZE,
+            limit_per_host=settings.HTTP_POOL_SIZE_PER_HOST,
+        )
+        _session = aiohttp.ClientSession(connector=connector)
+        _session_loop = loop
+    return _session
+
+
+async def close_http_session():
+    """关闭共享会话（应用关闭时调用）"""
+    global _session, _session_loop
+
+    if _session is not None and not _session.closed:
+        await _session.close()
+    _session = None
+    _session_loop = None
@@ -0,0 +1,148 @@
+"""
+ASR任务队列模块
+基于SQLite的本地任务队列：API进程入队，一个或多个 ASR worker 进程（python -m app.worker）领取执行。
+领取使用租约：worker 定期续约，进程崩溃或失联后租约过期，任务会被其他 worker 重新领取
+"""
+import json
+import logging
+import sqlite3
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class Job:
+    """已领取的任务"""
+    job_id: str
+    task_id: str
+    payload: Dict[str, Any]
+    attempts: int
+
+
+class JobQueue:
+    """SQLite任务队列（WAL模式，可被同一存储上的多个进程共享）"""
+
+    def __init__(self, db_path: Optional[str] = None, max_attempts: Optional[int] = None):
+        self.db_path = db_path or settings.JOB_QUEUE_DB_PATH or settings.TASK_DB_PATH
+        self.max_attempts = max_attempts or settings.MAX_RETRY
+        Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
+        # sqlite3 连接不能跨线程使用，每个线程各自持有一个
+        self._local = threading.local()
+        with self._conn() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    job_id TEXT PRIMARY KEY,
+                    task_id TEXT NOT NULL,
+                    payload TEXT NOT NULL,
+                    priority INTEGER NOT NULL DEFAULT 0,
+                    status TEXT NOT NULL,
+                    worker_id TEXT,
+                    lease_until REAL,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    created_at REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_claim ON jobs(status, priority, created_at)")
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def enqueue(self, task_id: str, payload: Dict[str, Any], priority: int = 0) -> str:
+        """入队，priority 越大越先执行"""
+        job_id = str(uuid.uuid4())
+        with self._conn() as conn:
+            conn.execute(
+                """
+                INSERT INTO jobs (job_id, task_id, payload, priority, status, created_at)
+                VALUES (?, ?, ?, ?, 'queued', ?)
+                """,
+                (job_id, task_id, json.dumps(payload, ensure_ascii=False), priority, time.time())
+            )
+        return job_id
+
+    def claim(self, worker_id: str, lease_seconds: Optional[float] = None) -> Optional[Job]:
+        """
+        领取一个任务（排队中的，或租约已过期的运行中任务）
+        单条 UPDATE ... RETURNING 语句完成，多个worker并发领取不会拿到同一个任务
+        """
+        now = time.time()
+        lease_seconds = lease_seconds or settings.WORKER_LEASE_SECONDS
+        with self._conn() as conn:
+            row = conn.execute(
+                """
+                UPDATE jobs
+                SET status = 'running', worker_id = ?, lease_until = ?, attempts = attempts + 1
+                WHERE job_id = (
+                    SELECT job_id FROM jobs
+                    WHERE (status = 'queued' OR (status = 'running' AND lease_until < ?))
+                      AND attempts < ?
+                    ORDER BY priority DESC, created_at
+                    LIMIT 1
+                )
+                RETURNING job_id, task_id, payload, attempts
+                """,
+                (worker_id, now + lease_seconds, now, self.max_attempts)
+            ).fetchone()
+        if row is None:
+            return None
+        if row[3] > 1:
+            logger.warning(f"Job {row[0]} reclaimed by {worker_id} (attempt {row[3]})")
+        return Job(job_id=row[0], task_id=row[1], payload=json.loads(row[2]), attempts=row[3])
+
+    def heartbeat(self, job_id: str, worker_id: str, lease_seconds: Optional[float] = None) -> bool:
+        """续约；返回 False 说明租约已被其他worker接手"""
+        lease_seconds = lease_seconds or settings.WORKER_LEASE_SECONDS
+        with self._conn() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET lease_until = ? WHERE job_id = ? AND worker_id = ? AND status = 'running'",
+                (time.time() + lease_seconds, job_id, worker_id)
+            )
+        return cursor.rowcount > 0
+
+    def finish(self, job_id: str, worker_id: str):
+        """标记任务结束（成功或失败都写在任务存储里），结束的任务不再保留在队列中"""
+        with self._conn() as conn:
+            conn.execute(
+                "DELETE FROM jobs WHERE job_id = ? AND worker_id = ?",
+                (job_id, worker_id)
+            )
+
+    def cancel(self, task_id: str) -> bool:
+        """删除尚未被领取的任务；已在运行的任务由执行它的worker发现取消状态后自行中止"""
+        with self._conn() as conn:
+            cursor = conn.execute(
+                "DELETE FROM jobs WHERE task_id = ? AND status = 'queued'",
+                (task_id,)
+            )
+        return cursor.rowcount > 0
+
+    def reap_exhausted(self) -> List[str]:
+        """删除重试次数用尽且租约已过期的任务（worker反复崩溃），返回对应的 task_id"""
+        with self._conn() as conn:
+            rows = conn.execute(
+                """
+                DELETE FROM jobs
+                WHERE status = 'running' AND lease_until < ? AND attempts >= ?
+                RETURNING task_id
+                """,
+                (time.time(), self.max_attempts)
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def depth(self) -> Dict[str, int]:
+        """各状态的任务数"""
+        rows = self._conn().execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        return {status: count for status, count in rows}
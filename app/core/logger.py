@@ -1,38 +1,131 @@
 """
 日志配置模块
+
+默认（LOG_ASYNC=true）业务线程只把日志记录放进队列，由后台 QueueListener 线程
+写控制台和轮转日志文件，文件I/O和日志轮转不会阻塞事件循环
 """
+import atexit
+import copy
+import itertools
+import json
 import logging
+import queue
 import sys
+from datetime import datetime
 from pathlib import Path
-from logging.handlers import RotatingFileHandler
+from logging.handlers import RotatingFileHandler, QueueHandler, QueueListener
+from typing import Dict, List, Optional
 from app.core.config import settings
+from app.core.tracing import TraceLogFilter
 
+# 当前运行的后台日志线程
+_listener: Optional[QueueListener] = None
 
-def setup_logging():
-    """配置日志系统"""
 
-    # 创建日志目录
-    log_dir = Path(settings.LOG_FILE).parent
-    log_dir.mkdir(parents=True, exist_ok=True)
+class JsonFormatter(logging.Formatter):
+    """每条日志输出为一行JSON"""
 
-    # 配置日志格式
-    log_format = logging.Formatter(
-        '%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-        datefmt='%Y-%m-%d %H:%M:%S'
-    )
+    def format(self, record: logging.LogRecord) -> str:
+        data = {
+            "time": datetime.fromtimestamp(record.created).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        trace_id = getattr(record, "trace_id", None)
+        if trace_id:
+            data["trace_id"] = trace_id
+            data["span_id"] = record.span_id
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            data["exc_info"] = record.exc_text
+        return json.dumps(data, ensure_ascii=False)
 
-    # 获取根日志记录器
-    root_logger = logging.getLogger()
-    root_logger.setLevel(getattr(logging, settings.LOG_LEVEL))
 
-    # 清除现有的处理器
-    root_logger.handlers.clear()
+class SamplingFilter(logging.Filter):
+    """
+    按logger采样INFO及以下级别的日志，WARNING及以上总是保留
+    规则按logger名称层级匹配（"app.services" 也作用于 "app.services.bilibili_api"），取最具体的一条；
+    采样率 0.1 表示每10条保留1条
+    """
+
+    def __init__(self, rates: Dict[str, float]):
+        super().__init__()
+        self.rates = rates
+        # logger名称 -> 每几条保留一条（1 表示不采样）
+        self._intervals: Dict[str, int] = {}
+        self._counters: Dict[str, itertools.count] = {}
+
+    @staticmethod
+    def parse(spec: str) -> Dict[str, float]:
+        """解析 "name=rate,name=rate" 格式的配置"""
+        rates = {}
+        for item in spec.split(","):
+            name, sep, rate = item.strip().partition("=")
+            if sep and name.strip():
+                rates[name.strip()] = min(1.0, max(0.0, float(rate)))
+        return rates
+
+    def _interval(self, name: str) -> int:
+        interval = self._intervals.get(name)
+        if interval is None:
+            rate = 1.0
+            prefix = name
+            while prefix:
+                if prefix in self.rates:
+                    rate = self.rates[prefix]
+                    break
+                prefix = prefix.rpartition(".")[0]
+            interval = self._intervals[name] = round(1 / rate) if rate > 0 else 0
+        return interval
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        # 同步模式下同一个过滤器挂在多个处理器上，每条记录只采样一次
+        sampled = getattr(record, "_sampled", None)
+        if sampled is None:
+            sampled = record._sampled = self._sample(record)
+        return sampled
+
+    def _sample(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        interval = self._interval(record.name)
+        if interval == 1:
+            return True
+        if interval == 0:
+            return False
+        counter = self._counters.get(record.name)
+        if counter is None:
+            counter = self._counters.setdefault(record.name, itertools.count())
+        return next(counter) % interval == 0
+
+
+class _RecordQueueHandler(QueueHandler):
+    """
+    入队前只合并消息参数、把异常格式化成文本，不套用格式
+    后台线程里的各处理器按自己的格式输出（JSON格式也能单独拿到异常堆栈）
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = _exception_formatter.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+_exception_formatter = logging.Formatter()
+
 
+def _build_handlers(log_format: logging.Formatter) -> List[logging.Handler]:
+    """控制台、应用日志和错误日志三个输出"""
     # 控制台处理器
     console_handler = logging.StreamHandler(sys.stdout)
     console_handler.setLevel(logging.DEBUG if settings.DEBUG else logging.INFO)
     console_handler.setFormatter(log_format)
-    root_logger.addHandler(console_handler)
 
     # 文件处理器（轮转日志）
     file_handler = RotatingFileHandler(
@@ -43,7 +136,6 @@ def setup_logging():
     )
     file_handler.setLevel(logging.INFO)
     file_handler.setFormatter(log_format)
-    root_logger.addHandler(file_handler)
 
     # 错误日志单独文件
     error_log_file = Path(settings.LOG_FILE).parent / "error.log"
@@ -55,6 +147,69 @@ def setup_logging():
     )
     error_handler.setLevel(logging.ERROR)
     error_handler.setFormatter(log_format)
-    root_logger.addHandler(error_handler)
+
+    return [console_handler, file_handler, error_handler]
+
+
+def stop_logging():
+    """停止后台日志线程，写完队列中剩余的日志"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
+
+
+def setup_logging():
+    """配置日志系统"""
+    global _listener
+
+    # 创建日志目录
+    log_dir = Path(settings.LOG_FILE).parent
+    log_dir.mkdir(parents=True, exist_ok=True)
+
+    # 配置日志格式（trace 字段由 TraceLogFilter 填充，追踪中的请求为 " [trace_id:span_id]"）
+    if settings.LOG_FORMAT == "json":
+        log_format = JsonFormatter()
+    else:
+        log_format = logging.Formatter(
+            '%(asctime)s - %(name)s - %(levelname)s%(trace)s - %(message)s',
+            datefmt='%Y-%m-%d %H:%M:%S'
+        )
+
+    # 获取根日志记录器
+    root_logger = logging.getLogger()
+    root_logger.setLevel(getattr(logging, settings.LOG_LEVEL))
+
+    # 清除现有的处理器
+    stop_logging()
+    for handler in root_logger.handlers:
+        handler.close()
+    root_logger.handlers.clear()
+
+    # 追踪ID取自当前协程的上下文，采样在入队前完成，都要在调用方线程执行
+    filters: List[logging.Filter] = [TraceLogFilter()]
+    if settings.LOG_SAMPLING:
+        filters.append(SamplingFilter(SamplingFilter.parse(settings.LOG_SAMPLING)))
+
+    handlers = _build_handlers(log_format)
+    if settings.LOG_ASYNC:
+        # 不限长度：队列满时丢日志或阻塞调用方都比占用内存更糟
+        queue_handler = _RecordQueueHandler(queue.SimpleQueue())
+        for log_filter in filters:
+            queue_handler.addFilter(log_filter)
+        root_logger.addHandler(queue_handler)
+        _listener = QueueListener(queue_handler.queue, *handlers, respect_handler_level=True)
+        _listener.start()
+    else:
+        for handler in handlers:
+            for log_filter in filters:
+                handler.addFilter(log_filter)
+            root_logger.addHandler(handler)
 
     logging.info("Logging system initialized")
+
+
+# 进程退出前写完队列中的日志
+atexit.register(stop_logging)
@@ -0,0 +1,283 @@
+"""
+运行指标模块
+进程内的 Counter / Gauge / Histogram，按 Prometheus 文本格式输出（GET /metrics）。
+记录一次指标只是一次字典查找和加法，热路径上的开销可以忽略；
+多个进程（uvicorn 多 worker、ASR worker）各自统计
+"""
+import bisect
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+from app.core import tracing
+
+# 耗时类指标的默认分桶（秒）：覆盖从几毫秒的接口调用到几十分钟的ASR
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800)
+
+CONTENT_TYPE = "text/plain; version=0.0.4"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Metric:
+    """指标基类"""
+
+    type = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type}"]
+        lines.extend(self._samples())
+        return lines
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(Metric):
+    """只增不减的计数"""
+
+    type = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            values = list(self._values.items())
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+            for key, value in values
+        ]
+
+
+class Gauge(Metric):
+    """
+    可增可减的当前值
+    指定 func 时在采集时调用 func() 取值（如队列长度），不需要在业务代码里维护
+    """
+
+    type = "gauge"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        func: Optional[Callable[[], float]] = None
+    ):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._func = func
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    def _samples(self) -> List[str]:
+        if self._func is not None:
+            try:
+                return [f"{self.name} {_format_value(self._func())}"]
+            except Exception:
+                # 采集失败时不输出该指标，不影响其他指标
+                return []
+        with self._lock:
+            values = list(self._values.items())
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+            for key, value in values
+        ]
+
+
+class Histogram(Metric):
+    """分桶统计（用于耗时）"""
+
+    type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # labels -> [各桶计数（非累计，最后一个为 +Inf）, sum, count]
+        self._values: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            entry[0][index] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            values = [(key, (list(counts), total, count)) for key, (counts, total, count) in self._values.items()]
+        lines = []
+        for key, (counts, total, count) in values:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    """指标注册表"""
+
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+
+    def register(self, metric: Metric) -> Metric:
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        func: Optional[Callable[[], float]] = None
+    ) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames, func))
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS
+    ) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        """输出 Prometheus 文本格式"""
+        lines = []
+        for metric in list(self._metrics.values()):
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+# 各处理阶段的耗时和失败
+STAGE_DURATION = REGISTRY.histogram(
+    "bili_stage_duration_seconds", "Duration of each processing stage", ["stage"]
+)
+STAGE_FAILURES = REGISTRY.counter(
+    "bili_stage_failures_total", "Failed processing stages by error type", ["stage", "error"]
+)
+
+# 提取接口
+EXTRACT_REQUESTS = REGISTRY.counter(
+    "bili_extract_requests_total", "Successful /api/extract requests by transcript method", ["method"]
+)
+EXTRACT_FAILURES = REGISTRY.counter(
+    "bili_extract_failures_total", "Rejected or failed /api/extract requests by reason", ["reason"]
+)
+
+# ASR任务
+ASR_TASKS = REGISTRY.counter(
+    "bili_asr_tasks_total", "Finished ASR tasks by final status", ["status"]
+)
+ASR_RUNNING = REGISTRY.gauge(
+    "bili_asr_tasks_running", "ASR tasks currently executing in this process"
+)
+ASR_RUNNING.set(0)
+AUDIO_CACHE_REQUESTS = REGISTRY.counter(
+    "bili_audio_cache_requests_total", "Audio cache lookups", ["result"]
+)
+TRANSCRIPT_CACHE_REQUESTS = REGISTRY.counter(
+    "bili_transcript_cache_requests_total", "Transcript store lookups by /api/extract", ["result"]
+)
+TRANSCRIPT_REVALIDATIONS = REGISTRY.counter(
+    "bili_transcript_revalidations_total", "Conditional revalidations of expired transcripts by outcome", ["result"]
+)
+
+
+class track_stage:
+    """
+    记录一个阶段的耗时，抛出异常时按异常类型记录失败
+    请求正在被追踪时同时记为一个 span（见 app.core.tracing）
+
+    用法:
+        with track_stage("video_info") as stage:
+            info = await api.get_video_info(bvid)
+            if not info:
+                stage.fail("not_found")  # 没有抛异常的失败
+    """
+
+    __slots__ = ("stage", "_started", "_failed", "_span")
+
+    def __init__(self, stage: str):
+        self.stage = stage
+        self._failed = False
+        self._span = tracing.span(stage)
+
+    def fail(self, error: str):
+        if not self._failed:
+            self._failed = True
+            STAGE_FAILURES.inc(stage=self.stage, error=error)
+            self._span.set(error=error)
+
+    def __enter__(self) -> "track_stage":
+        self._span.__enter__()
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        STAGE_DURATION.observe(time.perf_counter() - self._started, stage=self.stage)
+        if exc_type is not None:
+            self.fail(exc_type.__name__)
+        self._span.__exit__(exc_type, exc, tb)
+        return False
@@ -0,0 +1,17 @@
+"""
+可选依赖探测
+只用 importlib.util.find_spec 查找模块，不执行模块代码，
+bcut_asr / faster_whisper / playwright 等重量级依赖在真正使用时才导入
+"""
+import importlib.util
+from functools import lru_cache
+
+
+@lru_cache(maxsize=None)
+def is_installed(module_name: str) -> bool:
+    """模块是否已安装（不导入模块本身）"""
+    try:
+        return importlib.util.find_spec(module_name) is not None
+    except (ImportError, ValueError):
+        # 父包不存在或 __spec__ 异常
+        return False
@@ -0,0 +1,634 @@
+"""
+任务存储模块
+提供内存和SQLite两种实现；SQLite（WAL模式）可在多个 uvicorn worker
+以及独立的ASR worker进程之间共享，进程重启后任务状态不会丢失
+"""
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Sequence, Set, Tuple
+from app.core.config import settings, parse_size
+
+logger = logging.getLogger(__name__)
+
+# 已结束的任务状态：不再接受更新，超过 TASK_RESULT_TTL 后会被清理
+FINISHED_STATUSES = ("completed", "failed", "cancelled")
+
+# 仍在进行中的任务状态，长时间无人查看时会被取消
+ACTIVE_STATUSES = ("pending", "processing")
+
+
+class TaskStore:
+    """
+    任务存储接口
+    同步方法可能阻塞（SQLite 等待其他进程释放写锁时最长等 timeout 秒），
+    协程中应使用 a 前缀的异步版本（aget / aupdate ...），它们在线程池中执行
+    """
+
+    # 等待其他进程更新时的轮询间隔（秒）；同进程内的更新会立即唤醒等待者
+    poll_interval: Optional[float] = None
+    # 操作是否可能阻塞；为 False 时异步版本直接调用同步方法
+    blocking = True
+
+    def __init__(self):
+        self._waiters: Dict[str, Set[Tuple[asyncio.AbstractEventLoop, asyncio.Event]]] = {}
+        self._waiters_lock = threading.Lock()
+
+    def _notify(self, task_id: str):
+        """唤醒等待该任务更新的协程（可以在任意线程中调用）"""
+        with self._waiters_lock:
+            waiters = list(self._waiters.get(task_id, ()))
+        for loop, event in waiters:
+            loop.call_soon_threadsafe(event.set)
+
+    async def wait_for_update(
+        self,
+        task_id: str,
+        since: Optional[float],
+        timeout: float
+    ) -> Optional[Dict[str, Any]]:
+        """
+        等待任务在 since（updated_at）之后发生变化
+        变化或超时后返回当前任务；任务不存在时返回 None
+        """
+        loop = asyncio.get_running_loop()
+        event = asyncio.Event()
+        waiter = (loop, event)
+        with self._waiters_lock:
+            self._waiters.setdefault(task_id, set()).add(waiter)
+
+        try:
+            deadline = loop.time() + timeout
+            while True:
+                # 先清除事件再读取，避免错过读取之后到来的通知
+                event.clear()
+                task = await self.aget(task_id, include_result=False)
+                if task is None or since is None or task.get("updated_at", 0) > since:
+                    return task
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    return task
+                wait = min(remaining, self.poll_interval) if self.poll_interval else remaining
+                try:
+                    await asyncio.wait_for(event.wait(), wait)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            with self._waiters_lock:
+                waiters = self._waiters.get(task_id)
+                if waiters is not None:
+                    waiters.discard(waiter)
+                    if not waiters:
+                        del self._waiters[task_id]
+
+    def create(self, task_id: str, data: Dict[str, Any]):
+        """创建任务"""
+        raise NotImplementedError
+
+    def get(self, task_id: str, include_result: bool = True) -> Optional[Dict[str, Any]]:
+        """
+        获取任务，不存在时返回 None
+        include_result=False 时不加载 result（结果可能很大，且可能已转存到磁盘）
+        """
+        raise NotImplementedError
+
+    def update(self, task_id: str, **fields) -> Optional[Dict[str, Any]]:
+        """
+        原子地合并更新任务字段，返回更新后的任务（不含 result）
+        值为 None 的字段保存为 None（不会删除该字段）
+        任务不存在或已结束（见 FINISHED_STATUSES）时不做修改，返回 None
+        """
+        raise NotImplementedError
+
+    def touch(self, task_id: str):
+        """记录客户端仍在关注该任务（last_seen），不改变 updated_at，也不唤醒等待者"""
+        raise NotImplementedError
+
+    def delete(self, task_id: str) -> bool:
+        """删除任务"""
+        raise NotImplementedError
+
+    def list(self, statuses: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        """列出任务（可按状态过滤，不含 result），每项包含 task_id"""
+        raise NotImplementedError
+
+    def append_partial(self, task_id: str, utterances: List[Dict[str, Any]]) -> int:
+        """
+        追加一批部分结果（流式识别完成的一个窗口的句子），返回该批的序号（从1开始递增）
+        部分结果与任务分开保存，追加的开销与已有的部分结果数量无关
+        """
+        raise NotImplementedError
+
+    def get_partials(self, task_id: str, after: int = 0) -> Tuple[int, List[Dict[str, Any]]]:
+        """返回 (最后一批的序号, 序号大于 after 的各批句子依次拼接)，没有新的批次时序号为 after"""
+        raise NotImplementedError
+
+    def clear_partials(self, task_id: str):
+        """删除任务的全部部分结果"""
+        raise NotImplementedError
+
+    def sweep(self) -> int:
+        """清理过期的已结束任务并执行结果内存预算，返回删除的任务数"""
+        raise NotImplementedError
+
+    def retained_bytes(self) -> int:
+        """当前保留的任务结果字节数"""
+        raise NotImplementedError
+
+    async def _call(self, func, *args, **kwargs):
+        if not self.blocking:
+            return func(*args, **kwargs)
+        return await asyncio.to_thread(func, *args, **kwargs)
+
+    async def acreate(self, task_id: str, data: Dict[str, Any]):
+        return await self._call(self.create, task_id, data)
+
+    async def aget(self, task_id: str, include_result: bool = True) -> Optional[Dict[str, Any]]:
+        return await self._call(self.get, task_id, include_result)
+
+    async def aupdate(self, task_id: str, **fields) -> Optional[Dict[str, Any]]:
+        return await self._call(self.update, task_id, **fields)
+
+    async def atouch(self, task_id: str):
+        return await self._call(self.touch, task_id)
+
+    async def alist(self, statuses: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        return await self._call(self.list, statuses)
+
+    async def aappend_partial(self, task_id: str, utterances: List[Dict[str, Any]]) -> int:
+        return await self._call(self.append_partial, task_id, utterances)
+
+    async def aget_partials(self, task_id: str, after: int = 0) -> Tuple[int, List[Dict[str, Any]]]:
+        return await self._call(self.get_partials, task_id, after)
+
+    async def aclear_partials(self, task_id: str):
+        return await self._call(self.clear_partials, task_id)
+
+    async def aretained_bytes(self) -> int:
+        return await self._call(self.retained_bytes)
+
+    def reap_abandoned(self, timeout: float) -> List[str]:
+        """取消超过 timeout 秒无人轮询或订阅的进行中任务，返回被取消的 task_id"""
+        deadline = time.time() - timeout
+        reaped = []
+        for task in self.list(statuses=list(ACTIVE_STATUSES)):
+            # 后台预取的任务本来就没有客户端关注
+            if task.get("source") == "prefetch":
+                continue
+            if task.get("last_seen", task["created_at"]) >= deadline:
+                continue
+            if self.update(task["task_id"], status="cancelled", message="长时间无人查看，任务已取消"):
+                reaped.append(task["task_id"])
+        return reaped
+
+
+class MemoryTaskStore(TaskStore):
+    """
+    进程内存储，只适用于单进程部署
+    结果占用超过 TASK_RESULT_MAX_SIZE 时，最久未访问的结果转存到 TASK_RESULT_DIR
+    """
+
+    # 只在短时间持有进程内的锁（结果转存除外），异步版本直接调用
+    blocking = False
+
+    def __init__(self, result_dir: Optional[str] = None, max_result_bytes: Optional[int] = None):
+        super().__init__()
+        self._tasks: Dict[str, Dict[str, Any]] = {}
+        # 内存中的结果，顺序即LRU顺序: task_id -> (result, 字节数)
+        self._results: "OrderedDict[str, Tuple[Dict[str, Any], int]]" = OrderedDict()
+        self._result_bytes = 0
+        self._spilled: Dict[str, Path] = {}
+        self._partials: Dict[str, List[List[Dict[str, Any]]]] = {}
+        self._lock = threading.Lock()
+        self.result_dir = Path(result_dir or settings.TASK_RESULT_DIR)
+        self.max_result_bytes = (
+            max_result_bytes if max_result_bytes is not None else parse_size(settings.TASK_RESULT_MAX_SIZE)
+        )
+
+    def create(self, task_id: str, data: Dict[str, Any]):
+        now = time.time()
+        data = dict(data)
+        result = data.pop("result", None)
+        with self._lock:
+            self._tasks[task_id] = {**data, "created_at": now, "updated_at": now}
+            if result is not None:
+                self._set_result(task_id, result)
+
+    def get(self, task_id: str, include_result: bool = True) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            task = self._tasks.get(task_id)
+            if task is None:
+                return None
+            task = dict(task)
+            if include_result:
+                task["result"] = self._get_result(task_id)
+            return task
+
+    def update(self, task_id: str, **fields) -> Optional[Dict[str, Any]]:
+        has_result = "result" in fields
+        result = fields.pop("result", None)
+        with self._lock:
+            task = self._tasks.get(task_id)
+            if task is None or task.get("status") in FINISHED_STATUSES:
+                return None
+            task.update(fields)
+            task["updated_at"] = time.time()
+            if has_result:
+                self._set_result(task_id, result)
+            task = dict(task)
+        self._notify(task_id)
+        return task
+
+    def touch(self, task_id: str):
+        with self._lock:
+            task = self._tasks.get(task_id)
+            if task is not None:
+                task["last_seen"] = time.time()
+
+    def delete(self, task_id: str) -> bool:
+        with self._lock:
+            deleted = self._tasks.pop(task_id, None) is not None
+            self._drop_result(task_id)
+            self._partials.pop(task_id, None)
+        self._notify(task_id)
+        return deleted
+
+    def list(self, statuses: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [
+                {**task, "task_id": task_id}
+                for task_id, task in self._tasks.items()
+                if statuses is None or task.get("status") in statuses
+            ]
+
+    def append_partial(self, task_id: str, utterances: List[Dict[str, Any]]) -> int:
+        with self._lock:
+            batches = self._partials.setdefault(task_id, [])
+            batches.append(utterances)
+            return len(batches)
+
+    def get_partials(self, task_id: str, after: int = 0) -> Tuple[int, List[Dict[str, Any]]]:
+        with self._lock:
+            batches = self._partials.get(task_id, [])[after:]
+            return after + len(batches), [u for batch in batches for u in batch]
+
+    def clear_partials(self, task_id: str):
+        with self._lock:
+            self._partials.pop(task_id, None)
+
+    def sweep(self) -> int:
+        deadline = time.time() - settings.TASK_RESULT_TTL
+        with self._lock:
+            expired = [
+                task_id for task_id, task in self._tasks.items()
+                if task.get("status") in FINISHED_STATUSES and task["updated_at"] < deadline
+            ]
+        for task_id in expired:
+            self.delete(task_id)
+        with self._lock:
+            # 已结束的任务有完整结果，部分结果不再需要
+            for task_id in list(self._partials):
+                task = self._tasks.get(task_id)
+                if task is None or task.get("status") in FINISHED_STATUSES:
+                    del self._partials[task_id]
+            self._enforce_budget()
+        return len(expired)
+
+    def retained_bytes(self) -> int:
+        return self._result_bytes
+
+    def _get_result(self, task_id: str) -> Optional[Dict[str, Any]]:
+        if task_id in self._results:
+            self._results.move_to_end(task_id)
+            return self._results[task_id][0]
+        path = self._spilled.get(task_id)
+        if path is not None:
+            try:
+                return json.loads(path.read_text(encoding="utf-8"))
+            except OSError:
+                logger.warning(f"Offloaded result of task {task_id} is missing")
+        return None
+
+    def _set_result(self, task_id: str, result: Optional[Dict[str, Any]]):
+        self._drop_result(task_id)
+        if result is None:
+            return
+        size = len(json.dumps(result, ensure_ascii=False).encode("utf-8"))
+        self._results[task_id] = (result, size)
+        self._result_bytes += size
+        self._enforce_budget()
+
+    def _drop_result(self, task_id: str):
+        entry = self._results.pop(task_id, None)
+        if entry is not None:
+            self._result_bytes -= entry[1]
+        path = self._spilled.pop(task_id, None)
+        if path is not None:
+            path.unlink(missing_ok=True)
+
+    def _enforce_budget(self):
+        """把最久未访问的结果转存到磁盘，直到内存占用不超过预算"""
+        while self._result_bytes > self.max_result_bytes and self._results:
+            task_id, (result, size) = self._results.popitem(last=False)
+            self._result_bytes -= size
+            self.result_dir.mkdir(parents=True, exist_ok=True)
+            path = self.result_dir / f"{task_id}.json"
+            tmp_path = path.with_name(path.name + ".tmp")
+            tmp_path.write_text(json.dumps(result, ensure_ascii=False), encoding="utf-8")
+            os.replace(tmp_path, path)
+            self._spilled[task_id] = path
+
+
+class SQLiteTaskStore(TaskStore):
+    """
+    SQLite持久化存储
+    任务以JSON保存；更新使用单条 json_set UPDATE 语句，多进程并发更新也是原子的。
+    结果单独存一列，不常驻进程内存；库中结果总量超过 TASK_RESULT_MAX_SIZE 时，
+    最久未访问的已结束任务的结果转存到 TASK_RESULT_DIR（任务本身保留，仍可查询）
+    """
+
+    def __init__(
+        self,
+        db_path: Optional[str] = None,
+        max_result_bytes: Optional[int] = None,
+        result_dir: Optional[str] = None
+    ):
+        super().__init__()
+        self.poll_interval = settings.TASK_STREAM_POLL_INTERVAL
+        self.db_path = db_path or settings.TASK_DB_PATH
+        self.max_result_bytes = (
+            max_result_bytes if max_result_bytes is not None else parse_size(settings.TASK_RESULT_MAX_SIZE)
+        )
+        self.result_dir = Path(result_dir or settings.TASK_RESULT_DIR)
+        Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
+        # sqlite3 连接不能跨线程使用，每个线程各自持有一个
+        self._local = threading.local()
+        with self._conn() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS tasks (
+                    task_id TEXT PRIMARY KEY,
+                    status TEXT NOT NULL,
+                    data TEXT NOT NULL,
+                    result TEXT,
+                    result_bytes INTEGER NOT NULL DEFAULT 0,
+                    result_path TEXT,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL
+                )
+            """)
+            # 兼容旧版本创建的表（没有单独的结果列）
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(tasks)")}
+            if "result" not in columns:
+                conn.execute("ALTER TABLE tasks ADD COLUMN result TEXT")
+                conn.execute("ALTER TABLE tasks ADD COLUMN result_bytes INTEGER NOT NULL DEFAULT 0")
+                conn.execute("ALTER TABLE tasks ADD COLUMN accessed_at REAL NOT NULL DEFAULT 0")
+            if "result_path" not in columns:
+                conn.execute("ALTER TABLE tasks ADD COLUMN result_path TEXT")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_tasks_status ON tasks(status)")
+            # 流式识别的部分结果，每个窗口一行，只追加不改写
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS task_partials (
+                    task_id TEXT NOT NULL,
+                    seq INTEGER NOT NULL,
+                    utterances TEXT NOT NULL,
+                    PRIMARY KEY (task_id, seq)
+                )
+            """)
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def create(self, task_id: str, data: Dict[str, Any]):
+        now = time.time()
+        data = {**data, "created_at": now, "updated_at": now}
+        result = data.pop("result", None)
+        result_json = json.dumps(result, ensure_ascii=False) if result is not None else None
+        with self._conn() as conn:
+            conn.execute(
+                """
+                INSERT OR REPLACE INTO tasks
+                    (task_id, status, data, result, result_bytes, created_at, updated_at, accessed_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                (
+                    task_id, data.get("status", "pending"), json.dumps(data, ensure_ascii=False),
+                    result_json, len(result_json.encode("utf-8")) if result_json else 0, now, now, now
+                )
+            )
+
+    def get(self, task_id: str, include_result: bool = True) -> Optional[Dict[str, Any]]:
+        if not include_result:
+            row = self._conn().execute("SELECT data FROM tasks WHERE task_id = ?", (task_id,)).fetchone()
+            return json.loads(row[0]) if row else None
+
+        with self._conn() as conn:
+            row = conn.execute(
+                "UPDATE tasks SET accessed_at = ? WHERE task_id = ? RETURNING data, result, result_path",
+                (time.time(), task_id)
+            ).fetchone()
+        if row is None:
+            return None
+        task = json.loads(row[0])
+        task["result"] = json.loads(row[1]) if row[1] else None
+        if task["result"] is None and row[2]:
+            try:
+                task["result"] = json.loads(Path(row[2]).read_text(encoding="utf-8"))
+            except OSError:
+                logger.warning(f"Offloaded result of task {task_id} is missing")
+        return task
+
+    def update(self, task_id: str, **fields) -> Optional[Dict[str, Any]]:
+        now = time.time()
+        has_result = "result" in fields
+        result = fields.pop("result", None)
+        # 逐个字段 json_set（json_patch 会把 None 当作删除字段，与内存存储不一致）
+        values = {**fields, "updated_at": now}
+        paths = ", ".join("?, json(?)" for _ in values)
+        assignments = f"data = json_set(data, {paths}), status = COALESCE(?, status), updated_at = ?"
+        params: List[Any] = []
+        for name, value in values.items():
+            params += [f"$.{name}", json.dumps(value, ensure_ascii=False)]
+        params += [fields.get("status"), now]
+        if has_result:
+            result_json = json.dumps(result, ensure_ascii=False) if result is not None else None
+            assignments += ", result = ?, result_bytes = ?"
+            params += [result_json, len(result_json.encode("utf-8")) if result_json else 0]
+
+        placeholders = ",".join("?" * len(FINISHED_STATUSES))
+        with self._conn() as conn:
+            row = conn.execute(
+                f"""
+                UPDATE tasks SET {assignments}
+                WHERE task_id = ? AND status NOT IN ({placeholders})
+                RETURNING data
+                """,
+                params + [task_id, *FINISHED_STATUSES]
+            ).fetchone()
+        if row is None:
+            return None
+        self._notify(task_id)
+        return json.loads(row[0])
+
+    def touch(self, task_id: str):
+        with self._conn() as conn:
+            conn.execute(
+                "UPDATE tasks SET data = json_set(data, '$.last_seen', ?) WHERE task_id = ?",
+                (time.time(), task_id)
+            )
+
+    def delete(self, task_id: str) -> bool:
+        with self._conn() as conn:
+            rows = conn.execute("DELETE FROM tasks WHERE task_id = ? RETURNING result_path", (task_id,)).fetchall()
+            conn.execute("DELETE FROM task_partials WHERE task_id = ?", (task_id,))
+        self._unlink_results(rows)
+        self._notify(task_id)
+        return bool(rows)
+
+    def list(self, statuses: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        if statuses:
+            placeholders = ",".join("?" * len(statuses))
+            rows = self._conn().execute(
+                f"SELECT task_id, data FROM tasks WHERE status IN ({placeholders})", statuses
+            ).fetchall()
+        else:
+            rows = self._conn().execute("SELECT task_id, data FROM tasks").fetchall()
+        return [{**json.loads(data), "task_id": task_id} for task_id, data in rows]
+
+    def append_partial(self, task_id: str, utterances: List[Dict[str, Any]]) -> int:
+        with self._conn() as conn:
+            row = conn.execute(
+                """
+                INSERT INTO task_partials (task_id, seq, utterances)
+                SELECT ?, COALESCE(MAX(seq), 0) + 1, ? FROM task_partials WHERE task_id = ?
+                RETURNING seq
+                """,
+                (task_id, json.dumps(utterances, ensure_ascii=False), task_id)
+            ).fetchone()
+        return row[0]
+
+    def get_partials(self, task_id: str, after: int = 0) -> Tuple[int, List[Dict[str, Any]]]:
+        rows = self._conn().execute(
+            "SELECT seq, utterances FROM task_partials WHERE task_id = ? AND seq > ? ORDER BY seq",
+            (task_id, after)
+        ).fetchall()
+        if not rows:
+            return after, []
+        return rows[-1][0], [u for _, utterances in rows for u in json.loads(utterances)]
+
+    def clear_partials(self, task_id: str):
+        with self._conn() as conn:
+            conn.execute("DELETE FROM task_partials WHERE task_id = ?", (task_id,))
+
+    def sweep(self) -> int:
+        placeholders = ",".join("?" * len(FINISHED_STATUSES))
+        with self._conn() as conn:
+            expired = conn.execute(
+                f"DELETE FROM tasks WHERE status IN ({placeholders}) AND updated_at < ? RETURNING result_path",
+                (*FINISHED_STATUSES, time.time() - settings.TASK_RESULT_TTL)
+            ).fetchall()
+            # 已结束（或已删除）的任务有完整结果，部分结果不再需要
+            conn.execute(
+                f"""
+                DELETE FROM task_partials WHERE task_id NOT IN (
+                    SELECT task_id FROM tasks WHERE status NOT IN ({placeholders})
+                )
+                """,
+                FINISHED_STATUSES
+            )
+        self._unlink_results(expired)
+
+        # 超出结果预算时，按最近访问时间把已结束任务的结果转存到磁盘
+        excess = self.retained_bytes() - self.max_result_bytes
+        if excess > 0:
+            rows = self._conn().execute(
+                f"""
+                SELECT task_id, result_bytes FROM tasks
+                WHERE status IN ({placeholders}) AND result_bytes > 0
+                ORDER BY accessed_at ASC
+                """,
+                FINISHED_STATUSES
+            ).fetchall()
+            for task_id, size in rows:
+                if excess <= 0:
+                    break
+                if self._offload_result(task_id):
+                    excess -= size
+        return len(expired)
+
+    def _offload_result(self, task_id: str) -> bool:
+        """把一个任务的结果写到 TASK_RESULT_DIR 并清空结果列，返回是否转存成功"""
+        row = self._conn().execute("SELECT result FROM tasks WHERE task_id = ?", (task_id,)).fetchone()
+        if row is None or row[0] is None:
+            return False
+        self.result_dir.mkdir(parents=True, exist_ok=True)
+        path = self.result_dir / f"{task_id}.json"
+        tmp_path = path.with_name(path.name + ".tmp")
+        tmp_path.write_text(row[0], encoding="utf-8")
+        os.replace(tmp_path, path)
+        with self._conn() as conn:
+            # 其他进程可能同时转存或删除了该任务
+            offloaded = conn.execute(
+                """
+                UPDATE tasks SET result = NULL, result_bytes = 0, result_path = ?
+                WHERE task_id = ? AND result IS NOT NULL
+                """,
+                (str(path), task_id)
+            ).rowcount
+        return offloaded > 0
+
+    @staticmethod
+    def _unlink_results(rows: List[Tuple[Optional[str]]]):
+        for (result_path,) in rows:
+            if result_path:
+                Path(result_path).unlink(missing_ok=True)
+
+    def retained_bytes(self) -> int:
+        row = self._conn().execute("SELECT COALESCE(SUM(result_bytes), 0) FROM tasks").fetchone()
+        return row[0]
+
+
+def create_task_store() -> TaskStore:
+    """根据配置创建任务存储"""
+    if settings.TASK_STORE == "memory":
+        return MemoryTaskStore()
+    return SQLiteTaskStore()
+
+
+async def run_sweeper(
+    store: TaskStore,
+    interval: Optional[float] = None,
+    cleanups: Sequence[Callable[[], Any]] = ()
+):
+    """
+    后台定期清理过期任务、取消无人查看的任务（应用启动时创建，关闭时取消）
+    cleanups: 每轮顺带在线程池中执行的其他清理函数（如逐字稿存储的过期淘汰）
+    """
+    interval = interval or settings.TASK_SWEEP_INTERVAL
+    loop = asyncio.get_running_loop()
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            removed = await loop.run_in_executor(None, store.sweep)
+            if removed:
+                logger.info(f"Task sweeper removed {removed} tasks, retained result bytes: {store.retained_bytes()}")
+            if settings.TASK_ABANDON_TIMEOUT > 0:
+                reaped = await loop.run_in_executor(None, store.reap_abandoned, settings.TASK_ABANDON_TIMEOUT)
+                if reaped:
+                    logger.info(f"Task sweeper cancelled {len(reaped)} abandoned tasks: {reaped}")
+            for cleanup in cleanups:
+                await loop.run_in_executor(None, cleanup)
+        except Exception as e:
+            logger.error(f"Task sweeper error: {str(e)}", exc_info=True)
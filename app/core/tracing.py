@@ -0,0 +1,263 @@
+"""
+请求追踪模块
+为 /api/extract、/api/summarize 请求记录各阶段的耗时（span 树）：
+- 响应头 Server-Timing 带上各阶段耗时，浏览器开发者工具可以直接查看
+- 请求带 ?trace=1 或 X-Trace: 1 时，在JSON响应里附上完整的 span 树
+- 日志行带上 trace_id:span_id，可以按ID串起一个慢请求的所有日志
+
+当前 span 保存在 contextvar 中，没有进行中的追踪时所有记录操作都是空操作
+"""
+import json
+import logging
+import time
+import uuid
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional
+from urllib.parse import parse_qs
+from app.core.config import settings
+
+TRACED_PATHS = ("/api/extract", "/api/summarize")
+
+_current_span: ContextVar[Optional["Span"]] = ContextVar("bili_current_span", default=None)
+
+
+def _new_id(length: int) -> str:
+    return uuid.uuid4().hex[:length]
+
+
+class Trace:
+    """一次请求的追踪"""
+
+    def __init__(self, name: str):
+        self.trace_id = _new_id(16)
+        # 响应发出后不再记录新的 span（如响应后执行的后台任务），只保留日志关联
+        self.closed = False
+        self.root = Span(self, name)
+
+    def close(self):
+        self.root.finish()
+        self.closed = True
+
+    def server_timing(self) -> str:
+        """
+        Server-Timing 头：同名阶段的耗时相加，按首次出现的顺序排列，最后是总耗时
+        """
+        totals: Dict[str, float] = {}
+        for span in self.root.walk():
+            if span is self.root or span.end is None:
+                continue
+            totals[span.name] = totals.get(span.name, 0.0) + span.duration_ms
+        entries = [f"{name};dur={duration:.1f}" for name, duration in totals.items()]
+        entries.append(f"total;dur={self.root.duration_ms:.1f}")
+        return ", ".join(entries)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"trace_id": self.trace_id, "root": self.root.to_dict(self.root.start)}
+
+
+class Span:
+    """一个阶段"""
+
+    __slots__ = ("trace", "name", "span_id", "start", "end", "attributes", "children")
+
+    def __init__(self, trace: Trace, name: str, start: Optional[float] = None, **attributes):
+        self.trace = trace
+        self.name = name
+        self.span_id = _new_id(8)
+        self.start = time.perf_counter() if start is None else start
+        self.end: Optional[float] = None
+        self.attributes = attributes
+        self.children: List["Span"] = []
+
+    def finish(self):
+        if self.end is None:
+            self.end = time.perf_counter()
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    @property
+    def duration_ms(self) -> float:
+        end = self.end if self.end is not None else time.perf_counter()
+        return (end - self.start) * 1000
+
+    def walk(self):
+        yield self
+        for child in self.children:
+            yield from child.walk()
+
+    def to_dict(self, origin: float) -> Dict[str, Any]:
+        data = {
+            "name": self.name,
+            "span_id": self.span_id,
+            "start_ms": round((self.start - origin) * 1000, 3),
+            "duration_ms": round(self.duration_ms, 3),
+        }
+        if self.attributes:
+            data["attributes"] = self.attributes
+        if self.children:
+            data["children"] = [child.to_dict(origin) for child in self.children]
+        return data
+
+
+def current_span() -> Optional[Span]:
+    return _current_span.get()
+
+
+def _recording_parent() -> Optional[Span]:
+    parent = _current_span.get()
+    if parent is None or parent.trace.closed:
+        return None
+    return parent
+
+
+class span:
+    """
+    记录一个阶段，期间新建的 span 和输出的日志都挂在它下面
+
+    用法:
+        with span("subtitle_lookup", bvid=bvid) as s:
+            ...
+            s.set(hit=True)
+    """
+
+    __slots__ = ("name", "attributes", "span", "_token")
+
+    def __init__(self, name: str, **attributes):
+        self.name = name
+        self.attributes = attributes
+        self.span: Optional[Span] = None
+
+    def set(self, **attributes):
+        if self.span is not None:
+            self.span.set(**attributes)
+
+    def __enter__(self) -> "span":
+        parent = _recording_parent()
+        if parent is not None:
+            self.span = Span(parent.trace, self.name, **self.attributes)
+            parent.children.append(self.span)
+            self._token = _current_span.set(self.span)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if self.span is not None:
+            self.span.finish()
+            if exc_type is not None:
+                self.span.set(error=exc_type.__name__)
+            _current_span.reset(self._token)
+        return False
+
+
+def record(name: str, start: float, **attributes):
+    """
+    补记一个已结束的阶段（start 为 time.perf_counter() 时间）
+    用于跨 yield 的异步生成器等不能用 with 切换当前 span 的地方
+    """
+    parent = _recording_parent()
+    if parent is not None:
+        child = Span(parent.trace, name, start, **attributes)
+        child.finish()
+        parent.children.append(child)
+
+
+def mark(name: str, **attributes):
+    """记录一个瞬时事件（如缓存命中）"""
+    record(name, time.perf_counter(), **attributes)
+
+
+class TraceLogFilter(logging.Filter):
+    """
+    给日志记录加上 trace 字段：有追踪时为 " [trace_id:span_id]"，否则为空；
+    另外设置 trace_id / span_id 字段供JSON格式使用
+    """
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        current = _current_span.get()
+        if current is not None:
+            record.trace_id = current.trace.trace_id
+            record.span_id = current.span_id
+            record.trace = f" [{record.trace_id}:{record.span_id}]"
+        else:
+            record.trace_id = record.span_id = None
+            record.trace = ""
+        return True
+
+
+def _trace_requested(scope) -> bool:
+    for name, value in scope.get("headers", ()):
+        if name == b"x-trace":
+            return value not in (b"", b"0", b"false")
+    query = parse_qs(scope.get("query_string", b"").decode("latin-1"))
+    return query.get("trace", ["0"])[-1] not in ("", "0", "false")
+
+
+class TracingMiddleware:
+    """
+    ASGI中间件：追踪 TRACED_PATHS 下的请求
+    响应头加上 Server-Timing 和 X-Trace-Id；请求要求时把 span 树合并进JSON响应体的 trace 字段
+    """
+
+    def __init__(self, app, paths=TRACED_PATHS):
+        self.app = app
+        self.paths = set(paths)
+
+    async def __call__(self, scope, receive, send):
+        if not settings.TRACING_ENABLED or scope["type"] != "http" or scope["path"] not in self.paths:
+            await self.app(scope, receive, send)
+            return
+
+        trace = Trace(f"{scope['method']} {scope['path']}")
+        with_tree = _trace_requested(scope)
+        start_message = None
+        body_parts: List[bytes] = []
+
+        async def send_traced(message):
+            nonlocal start_message
+            if message["type"] == "http.response.start":
+                trace.close()
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", trace.server_timing().encode("latin-1")))
+                headers.append((b"x-trace-id", trace.trace_id.encode("latin-1")))
+                message = {**message, "headers": headers}
+                content_type = dict(headers).get(b"content-type", b"")
+                if not (with_tree and content_type.startswith(b"application/json")):
+                    await send(message)
+                    return
+                # 需要改写响应体：先缓存起来，收齐后一起发送
+                start_message = message
+                return
+
+            if message["type"] == "http.response.body" and start_message is not None:
+                body_parts.append(message.get("body", b""))
+                if message.get("more_body", False):
+                    return
+                body = _attach_tree(b"".join(body_parts), trace)
+                headers = [
+                    (name, value) for name, value in start_message["headers"]
+                    if name != b"content-length"
+                ]
+                headers.append((b"content-length", str(len(body)).encode("latin-1")))
+                await send({**start_message, "headers": headers})
+                start_message = None
+                await send({"type": "http.response.body", "body": body})
+                return
+
+            await send(message)
+
+        token = _current_span.set(trace.root)
+        try:
+            await self.app(scope, receive, send_traced)
+        finally:
+            _current_span.reset(token)
+
+
+def _attach_tree(body: bytes, trace: Trace) -> bytes:
+    try:
+        data = json.loads(body)
+    except ValueError:
+        return body
+    if not isinstance(data, dict):
+        return body
+    data["trace"] = trace.to_dict()
+    return json.dumps(data, ensure_ascii=False).encode("utf-8")
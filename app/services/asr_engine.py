@@ -1,64 +1,114 @@
 """
 ASR语音识别引擎模块
 """
+import asyncio
+import hashlib
 import logging
+import threading
+import time
+from dataclasses import dataclass
 from pathlib import Path
-from typing import Optional, List, Dict
+from typing import Any, Callable, Optional, List, Dict, Type
 from app.core.config import settings
+from app.core.optional import is_installed
 from app.api.models import Utterance
 
 logger = logging.getLogger(__name__)
 
-# 检查 ASR 引擎是否可用
-try:
-    from bcut_asr import BcutASR
-    BCUT_AVAILABLE = True
-except ImportError:
-    BCUT_AVAILABLE = False
+# 检查 ASR 引擎是否可用（只探测是否安装，faster_whisper 会带入 ctranslate2 等，识别时才导入）
+BCUT_AVAILABLE = is_installed("bcut_asr")
+if not BCUT_AVAILABLE:
     logger.warning("bcut-asr not installed. ASR functionality will be limited.")
 
-try:
-    from faster_whisper import WhisperModel
-    WHISPER_AVAILABLE = True
-except ImportError:
-    WHISPER_AVAILABLE = False
+WHISPER_AVAILABLE = is_installed("faster_whisper")
+if not WHISPER_AVAILABLE:
     logger.warning("faster-whisper not installed. Whisper fallback not available.")
 
 
-class ASREngine:
-    """ASR识别引擎类"""
+class ASRCancelled(Exception):
+    """识别被取消（线程池中运行的后端在检查点抛出）"""
 
-    def __init__(self):
-        self.provider = settings.ASR_PROVIDER
 
-    async def recognize(self, audio_path: str) -> List[Utterance]:
+@dataclass(frozen=True)
+class ASRCapabilities:
+    """ASR后端能力描述"""
+    streaming: bool = False  # 是否支持边下载边识别（增量输入音频窗口）
+    chunkable: bool = False  # 是否可以把音频切成窗口并行识别
+    max_duration: Optional[int] = None  # 单次可识别的最长音频（秒），None表示不限制
+
+
+class ASRBackend:
+    """
+    ASR后端基类
+    子类通过 @register_backend 注册到引擎
+    """
+
+    name: str = ""
+    capabilities: ASRCapabilities = ASRCapabilities()
+
+    @classmethod
+    def is_available(cls) -> bool:
+        """当前环境是否可以使用该后端"""
+        return True
+
+    async def recognize(self, audio_path: str, duration: Optional[float] = None) -> List[Utterance]:
         """
-        语音识别主接口
-        根据配置选择必剪ASR或Whisper
+        识别音频文件
+        duration 为音频时长（秒），未知时为 None
         """
-        try:
-            if self.provider == "bcut":
-                return await self.recognize_with_bcut(audio_path)
-            elif self.provider == "whisper":
-                return await self.recognize_with_whisper(audio_path)
-            else:
-                logger.warning(f"Unknown ASR provider: {self.provider}, using bcut")
-                return await self.recognize_with_bcut(audio_path)
-
-        except Exception as e:
-            logger.error(f"ASR recognition failed: {str(e)}", exc_info=True)
-            # 尝试备选方案
-            if self.provider == "bcut":
-                logger.info("Trying fallback to Whisper")
-                return await self.recognize_with_whisper(audio_path)
-            else:
-                return []
+        raise NotImplementedError
 
-    async def recognize_with_bcut(self, audio_path: str) -> List[Utterance]:
+    async def _run_in_thread(self, func: Callable[..., Any], *args) -> Any:
         """
-        使用必剪ASR识别
-        文档: https://github.com/SocialSisterYi/bcut-asr
+        在线程池中运行CPU密集的同步识别，func 的第一个参数为取消事件
+        协程被取消时设置事件，func 在下一个检查点抛出 ASRCancelled 退出，不再占用CPU
         """
+        cancelled = threading.Event()
+        loop = asyncio.get_running_loop()
+        try:
+            return await loop.run_in_executor(None, func, cancelled, *args)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+
+
+# 已注册的ASR后端: name -> 后端类
+_BACKENDS: Dict[str, Type[ASRBackend]] = {}
+
+
+def register_backend(backend_cls: Type[ASRBackend]) -> Type[ASRBackend]:
+    """注册ASR后端（可作为类装饰器使用）"""
+    if not backend_cls.name:
+        raise ValueError(f"ASR backend {backend_cls.__name__} must define a name")
+    _BACKENDS[backend_cls.name] = backend_cls
+    return backend_cls
+
+
+def get_backend_class(name: str) -> Optional[Type[ASRBackend]]:
+    """按名称获取已注册的后端类"""
+    return _BACKENDS.get(name)
+
+
+def available_backends() -> List[str]:
+    """返回当前环境可用的后端名称"""
+    return [name for name, cls in _BACKENDS.items() if cls.is_available()]
+
+
+@register_backend
+class BcutBackend(ASRBackend):
+    """
+    必剪ASR
+    文档: https://github.com/SocialSisterYi/bcut-asr
+    """
+
+    name = "bcut"
+    capabilities = ASRCapabilities(streaming=False, chunkable=False, max_duration=None)
+
+    @classmethod
+    def is_available(cls) -> bool:
+        return BCUT_AVAILABLE
+
+    async def recognize(self, audio_path: str, duration: Optional[float] = None) -> List[Utterance]:
         if not BCUT_AVAILABLE:
             raise Exception("bcut-asr未安装，请运行: pip install bcut-asr")
 
@@ -96,42 +146,30 @@ class ASREngine:
             logger.error(f"Bcut ASR error: {str(e)}", exc_info=True)
             raise
 
-    async def recognize_with_whisper(self, audio_path: str) -> List[Utterance]:
-        """
-        使用Faster-Whisper识别（备选方案）
-        文档: https://github.com/guillaumekln/faster-whisper
-        """
+
+@register_backend
+class WhisperBackend(ASRBackend):
+    """
+    Faster-Whisper本地识别
+    文档: https://github.com/guillaumekln/faster-whisper
+    """
+
+    name = "whisper"
+    capabilities = ASRCapabilities(streaming=False, chunkable=True, max_duration=None)
+
+    @classmethod
+    def is_available(cls) -> bool:
+        return WHISPER_AVAILABLE
+
+    async def recognize(self, audio_path: str, duration: Optional[float] = None) -> List[Utterance]:
         if not WHISPER_AVAILABLE:
             raise Exception("faster-whisper未安装，请运行: pip install faster-whisper")
 
         try:
             logger.info(f"Starting Whisper recognition: {audio_path}")
 
-            # 导入faster_whisper库
-            from faster_whisper import WhisperModel
-
-            # 初始化模型
-            model_size = settings.WHISPER_MODEL
-            model = WhisperModel(model_size, device="cpu", compute_type="int8")
-
-            # 识别
-            segments, info = model.transcribe(
-                audio_path,
-                language="zh",  # 中文
-                beam_size=5,
-                vad_filter=True,  # 使用VAD过滤
-            )
-
-            # 解析结果
-            utterances = []
-            for segment in segments:
-                utterance = Utterance(
-                    text=segment.text.strip(),
-                    start=float(segment.start),
-                    end=float(segment.end)
-                )
-                if utterance.text:
-                    utterances.append(utterance)
+            # 推理是CPU密集的同步调用，放到线程池避免阻塞事件循环
+            utterances = await self._run_in_thread(self._transcribe, audio_path)
 
             logger.info(f"Whisper completed, got {len(utterances)} utterances")
             return utterances
@@ -142,3 +180,176 @@ class ASREngine:
         except Exception as e:
             logger.error(f"Whisper error: {str(e)}", exc_info=True)
             raise
+
+    def _transcribe(self, cancelled: threading.Event, audio_path: str) -> List[Utterance]:
+        # 导入faster_whisper库
+        from faster_whisper import WhisperModel
+
+        # 初始化模型
+        model_size = settings.WHISPER_MODEL
+        model = WhisperModel(model_size, device="cpu", compute_type="int8")
+
+        # 识别
+        segments, info = model.transcribe(
+            audio_path,
+            language="zh",  # 中文
+            beam_size=5,
+            vad_filter=True,  # 使用VAD过滤
+        )
+
+        # 解析结果
+        # segments 是惰性生成的，每解码一段检查一次是否已取消
+        utterances = []
+        for segment in segments:
+            if cancelled.is_set():
+                raise ASRCancelled()
+            utterance = Utterance(
+                text=segment.text.strip(),
+                start=float(segment.start),
+                end=float(segment.end)
+            )
+            if utterance.text:
+                utterances.append(utterance)
+
+        return utterances
+
+
+@register_backend
+class StubBackend(ASRBackend):
+    """
+    确定性的本地桩引擎
+    不依赖必剪或模型权重，按配置的速度消耗CPU并根据音频内容生成固定的句子，
+    用于离线压测和性能分析整个 下载→识别→格式化 流程
+    """
+
+    name = "stub"
+    capabilities = ASRCapabilities(streaming=True, chunkable=True, max_duration=None)
+
+    # 句子由这些词确定性地拼出来
+    _VOCABULARY = [
+        "今天", "我们", "来聊", "一下", "这个", "视频", "里面", "提到的",
+        "问题", "首先", "然后", "其实", "大家", "可以", "看到", "结果",
+    ]
+
+    def __init__(self):
+        self.speed = settings.ASR_STUB_SPEED
+        self.segment_seconds = settings.ASR_STUB_SEGMENT_SECONDS
+        self.bytes_per_second = settings.ASR_STUB_BYTES_PER_SECOND
+
+    async def recognize(self, audio_path: str, duration: Optional[float] = None) -> List[Utterance]:
+        return await self._run_in_thread(self._recognize_sync, audio_path, duration)
+
+    def _recognize_sync(
+        self,
+        cancelled: threading.Event,
+        audio_path: str,
+        duration: Optional[float]
+    ) -> List[Utterance]:
+        # 用文件内容做种子，保证同一音频的输出完全一致
+        digest = hashlib.sha256()
+        size = 0
+        with open(audio_path, "rb") as f:
+            for block in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(block)
+                size += len(block)
+        seed = digest.digest()
+
+        if duration is None:
+            duration = size / self.bytes_per_second if self.bytes_per_second > 0 else 0.0
+
+        self._burn_cpu(cancelled, seed, duration)
+
+        utterances = []
+        start = 0.0
+        index = 0
+        while start < duration:
+            end = min(start + self.segment_seconds, duration)
+            utterances.append(Utterance(
+                text=self._make_sentence(seed, index),
+                start=round(start, 3),
+                end=round(end, 3)
+            ))
+            start = end
+            index += 1
+
+        logger.info(f"Stub ASR completed, {duration:.1f}s audio, got {len(utterances)} utterances")
+        return utterances
+
+    def _burn_cpu(self, cancelled: threading.Event, seed: bytes, duration: float):
+        """按 音频时长/速度 持续做哈希运算，模拟真实引擎的CPU占用"""
+        if self.speed <= 0:
+            return
+        deadline = time.perf_counter() + duration / self.speed
+        block = seed
+        while time.perf_counter() < deadline:
+            if cancelled.is_set():
+                raise ASRCancelled()
+            for _ in range(256):
+                block = hashlib.sha256(block).digest()
+
+    def _make_sentence(self, seed: bytes, index: int) -> str:
+        words = hashlib.sha256(seed + index.to_bytes(4, "big")).digest()
+        count = 4 + words[0] % 5
+        return "".join(self._VOCABULARY[b % len(self._VOCABULARY)] for b in words[1:count + 1])
+
+
+class ASREngine:
+    """ASR识别引擎类"""
+
+    def __init__(self, provider: Optional[str] = None):
+        self.provider = provider or settings.ASR_PROVIDER
+        if get_backend_class(self.provider) is None:
+            logger.warning(f"Unknown ASR provider: {self.provider}, using bcut")
+            self.provider = "bcut"
+        self._instances: Dict[str, ASRBackend] = {}
+
+    def get_backend(self, name: Optional[str] = None) -> ASRBackend:
+        """获取（并缓存）后端实例"""
+        name = name or self.provider
+        if name not in self._instances:
+            backend_cls = get_backend_class(name)
+            if backend_cls is None:
+                raise ValueError(f"Unknown ASR provider: {name}")
+            self._instances[name] = backend_cls()
+        return self._instances[name]
+
+    @property
+    def capabilities(self) -> ASRCapabilities:
+        """当前主后端的能力"""
+        return get_backend_class(self.provider).capabilities
+
+    def _fallback_provider(self) -> Optional[str]:
+        fallback = settings.ASR_FALLBACK_PROVIDER
+        if fallback and fallback != self.provider and get_backend_class(fallback):
+            return fallback
+        return None
+
+    def is_available(self) -> bool:
+        """主后端或备选后端是否可用"""
+        names = [self.provider, self._fallback_provider()]
+        return any(name and get_backend_class(name).is_available() for name in names)
+
+    async def recognize(self, audio_path: str, duration: Optional[float] = None) -> List[Utterance]:
+        """
+        语音识别主接口
+        使用配置的后端识别，失败时尝试备选后端
+        """
+        try:
+            return await self.get_backend().recognize(audio_path, duration)
+
+        except Exception as e:
+            logger.error(f"ASR recognition failed: {str(e)}", exc_info=True)
+            # 尝试备选方案
+            fallback = self._fallback_provider()
+            if fallback:
+                logger.info(f"Trying fallback to {fallback}")
+                return await self.get_backend(fallback).recognize(audio_path, duration)
+            return []
+
+    async def recognize_with_bcut(self, audio_path: str) -> List[Utterance]:
+        """使用必剪ASR识别"""
+        return await self.get_backend("bcut").recognize(audio_path)
+
+    async def recognize_with_whisper(self, audio_path: str) -> List[Utterance]:
+        """使用Faster-Whisper识别（备选方案）"""
+        return await self.get_backend("whisper").recognize(audio_path)
@@ -0,0 +1,204 @@
+"""
+ASR任务执行模块
+下载→识别→格式化 的完整流程，进度写入任务存储；
+API进程（inline模式）和独立的ASR worker进程共用
+"""
+import asyncio
+import logging
+from typing import Optional
+from app.api.models import TranscriptData
+from app.core.config import settings
+from app.core.metrics import track_stage, ASR_TASKS, ASR_RUNNING
+from app.core.task_store import TaskStore, FINISHED_STATUSES
+from app.services.asr_engine import ASREngine
+from app.services.streaming_pipeline import StreamingASRPipeline
+from app.services.subtitle_processor import SubtitleProcessor
+from app.services.transcript_store import TranscriptStore
+from app.services.video_downloader import VideoDownloader
+
+logger = logging.getLogger(__name__)
+
+
+class ASRTaskRunner:
+    """ASR任务执行器"""
+
+    def __init__(
+        self,
+        task_store: TaskStore,
+        video_downloader: Optional[VideoDownloader] = None,
+        asr_engine: Optional[ASREngine] = None,
+        subtitle_processor: Optional[SubtitleProcessor] = None,
+        transcript_store: Optional[TranscriptStore] = None
+    ):
+        self.task_store = task_store
+        self.video_downloader = video_downloader or VideoDownloader()
+        self.asr_engine = asr_engine or ASREngine()
+        self.subtitle_processor = subtitle_processor or SubtitleProcessor()
+        # 识别结果写入逐字稿存储，之后再提取同一视频时直接返回
+        if transcript_store is None and settings.TRANSCRIPT_CACHE_ENABLED:
+            transcript_store = TranscriptStore()
+        self.transcript_store = transcript_store
+        self.streaming_pipeline = StreamingASRPipeline(self.video_downloader, self.asr_engine)
+
+    async def run(
+        self,
+        task_id: str,
+        url: str,
+        bvid: str,
+        cid: int,
+        title: str,
+        duration: int,
+        output_format: str
+    ) -> bool:
+        """
+        下载视频并进行ASR识别
+        返回任务是否成功完成；任务被取消（DELETE /api/tasks/{task_id} 或无人查看被回收）时
+        立即中止下载和识别并返回 False
+        """
+        task = await self.task_store.aget(task_id, include_result=False)
+        if task is None or task["status"] in FINISHED_STATUSES:
+            logger.info(f"Task {task_id} is {task['status'] if task else 'gone'}, skipped")
+            return False
+
+        work = asyncio.ensure_future(
+            self._run(task_id, url, bvid, cid, title, duration, output_format)
+        )
+        watcher = asyncio.ensure_future(self._watch_cancellation(task_id, work))
+        ASR_RUNNING.inc()
+        try:
+            succeeded = await work
+            ASR_TASKS.inc(status="completed" if succeeded else "failed")
+            return succeeded
+        except asyncio.CancelledError:
+            if not watcher.done():
+                raise
+            logger.info(f"Task {task_id} cancelled")
+            ASR_TASKS.inc(status="cancelled")
+            return False
+        finally:
+            ASR_RUNNING.dec()
+            watcher.cancel()
+
+    async def _watch_cancellation(self, task_id: str, work: asyncio.Future):
+        """
+        任务被标记为 cancelled 或被删除时取消执行协程
+        同进程内的更新会立即唤醒，其他进程（API/其他worker）的更新按存储的轮询间隔发现
+        """
+        since = None
+        while not work.done():
+            task = await self.task_store.wait_for_update(task_id, since, settings.TASK_STREAM_KEEPALIVE)
+            if task is None or task["status"] == "cancelled":
+                work.cancel()
+                return
+            since = task["updated_at"]
+
+    async def _run(
+        self,
+        task_id: str,
+        url: str,
+        bvid: str,
+        cid: int,
+        title: str,
+        duration: int,
+        output_format: str
+    ) -> bool:
+        task_store = self.task_store
+        try:
+            # 更新进度：开始处理
+            await task_store.aupdate(
+                task_id,
+                status="processing",
+                progress=10,
+                message="开始下载视频..."
+            )
+
+            utterances = None
+
+            # 流式模式：下载、解码、识别重叠进行
+            if self.streaming_pipeline.is_available():
+
+                async def on_window(done: int, total: int, window_utterances):
+                    # 只追加本窗口的句子（窗口可能乱序完成，由客户端按时间排序），
+                    # partial_windows 记录已追加的批数，SSE 据此只推送新增部分
+                    windows = await task_store.aappend_partial(task_id, [u.model_dump() for u in window_utterances])
+                    await task_store.aupdate(
+                        task_id,
+                        progress=10 + int(80 * min(done, total) / total),
+                        message=f"边下载边识别中（{done}/{total}）...",
+                        partial_windows=windows
+                    )
+
+                try:
+                    with track_stage("asr_streaming"):
+                        utterances = await self.streaming_pipeline.run(bvid, cid, duration, on_window)
+                except Exception as e:
+                    logger.warning(f"Streaming ASR failed, falling back to sequential mode: {str(e)}")
+                    await task_store.aclear_partials(task_id)
+                    await task_store.aupdate(task_id, partial_windows=0)
+
+            if utterances is None:
+                # 下载音频
+                audio_path = await self.video_downloader.download_audio_only(url, bvid, cid)
+
+                # 检查下载是否成功
+                if not audio_path:
+                    raise Exception("视频下载失败，无法进行语音识别")
+
+                await task_store.aupdate(
+                    task_id,
+                    progress=50,
+                    message="下载完成，开始语音识别..."
+                )
+
+                # ASR识别（识别期间持有缓存引用，音频不会被淘汰）
+                async with self.video_downloader.cache.hold(audio_path):
+                    with track_stage("asr"):
+                        utterances = await self.asr_engine.recognize(audio_path, duration or None)
+
+            await task_store.aupdate(
+                task_id,
+                progress=90,
+                message="识别完成，格式化输出..."
+            )
+
+            # 格式化输出
+            with track_stage("format"):
+                transcript = self.subtitle_processor.format_transcript(utterances, output_format)
+
+            # 完成
+            await task_store.aupdate(
+                task_id,
+                status="completed",
+                progress=100,
+                message="处理完成",
+                result=TranscriptData(
+                    bvid=bvid,
+                    title=title,
+                    duration=duration,
+                    method="asr",
+                    transcript=transcript,
+                    utterances=utterances
+                ).model_dump()
+            )
+
+            # 完整结果已写入，部分结果不再需要
+            await task_store.aclear_partials(task_id)
+
+            if self.transcript_store is not None:
+                try:
+                    self.transcript_store.put(bvid, cid, title, duration, "asr", utterances)
+                except Exception as e:
+                    logger.warning(f"Failed to store transcript of {bvid}: {str(e)}")
+
+            logger.info(f"Task {task_id} completed successfully")
+            return True
+
+        except Exception as e:
+            logger.error(f"Task {task_id} failed: {str(e)}", exc_info=True)
+            await task_store.aupdate(
+                task_id,
+                status="failed",
+                progress=0,
+                message=f"处理失败: {str(e)}"
+            )
+            return False
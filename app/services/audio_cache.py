@@ -0,0 +1,258 @@
+"""
+音频缓存模块
+按 (bvid, cid) 复用已下载的音频，按字节预算做LRU淘汰。
+缓存索引就是目录本身：淘汰前重新扫描目录，按修改时间（命中时刷新）排序，
+共用 TEMP_DIR 的多个进程写入的音频合计不超过预算，其他进程下载的音频同样可以命中。
+正在被识别的文件用 .pins/<key>.pin 上的共享文件锁（flock）保护，
+淘汰前尝试加排他锁，其他进程正在使用的文件同样不会被淘汰
+"""
+import asyncio
+import fcntl
+import logging
+import os
+import stat
+import threading
+from collections import OrderedDict
+from contextlib import asynccontextmanager, contextmanager
+from pathlib import Path
+from typing import AsyncIterator, Dict, Iterator, List, Optional
+from app.core.config import settings, parse_size
+
+logger = logging.getLogger(__name__)
+
+# 下载中的临时文件（及其续传清单）带有该后缀，不计入缓存
+PART_SUFFIX = ".part"
+
+# 引用锁文件所在的子目录
+PIN_DIR = ".pins"
+# 等待淘汰方释放引用锁时的重试间隔（秒）
+PIN_RETRY_INTERVAL = 0.05
+
+# 计入缓存的音频文件后缀；yt-dlp 的 .ytdl 等辅助文件不计入
+AUDIO_SUFFIXES = frozenset((".m4s", ".m4a", ".mp3", ".aac", ".opus", ".webm", ".wav", ".flac"))
+
+
+def _is_partial(path: Path) -> bool:
+    return PART_SUFFIX in path.suffixes
+
+
+def _is_audio(path: Path) -> bool:
+    return path.suffix.lower() in AUDIO_SUFFIXES and not _is_partial(path)
+
+
+class AudioCache:
+    """基于磁盘预算的LRU音频缓存"""
+
+    def __init__(self, directory: Optional[str] = None, max_bytes: Optional[int] = None):
+        self.directory = Path(directory or settings.TEMP_DIR)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes if max_bytes is not None else parse_size(settings.AUDIO_CACHE_MAX_SIZE)
+        self.max_file_bytes = parse_size(settings.MAX_FILE_SIZE)
+
+        # key(文件名去掉后缀) -> 文件路径，顺序即LRU顺序（最近使用的在末尾）
+        self._entries: "OrderedDict[str, Path]" = OrderedDict()
+        self._sizes: Dict[str, int] = {}
+        # key -> [下载锁, 持有或等待该锁的协程数]，计数归零时删除
+        self._locks: Dict[str, List] = {}
+        self._mutex = threading.Lock()
+        self.pin_dir = self.directory / PIN_DIR
+        self.pin_dir.mkdir(exist_ok=True)
+        with self._mutex:
+            self._scan()
+        if self._entries:
+            logger.info(f"Audio cache loaded {len(self._entries)} files, {self.total_bytes} bytes")
+
+    @staticmethod
+    def make_key(bvid: str, cid: int) -> str:
+        return f"{bvid}_{cid}"
+
+    def _scan(self):
+        """
+        按目录内容重建索引（调用方持有 _mutex），按修改时间排出LRU顺序
+        其他进程写入或删除的文件也会反映出来
+        """
+        files = []
+        for f in self.directory.iterdir():
+            if not _is_audio(f):
+                continue
+            try:
+                info = f.stat()
+            except FileNotFoundError:
+                # 其他进程刚刚删除
+                continue
+            if stat.S_ISREG(info.st_mode):
+                files.append((info.st_mtime, f, info.st_size))
+        self._entries.clear()
+        self._sizes.clear()
+        for _, f, size in sorted(files, key=lambda item: item[0]):
+            self._entries[f.stem] = f
+            self._sizes[f.stem] = size
+
+    @property
+    def total_bytes(self) -> int:
+        return sum(self._sizes.values())
+
+    def path_for(self, bvid: str, cid: int, suffix: str) -> Path:
+        """缓存文件的最终路径（下载时应先写临时文件再 os.replace 到这里）"""
+        return self.directory / f"{self.make_key(bvid, cid)}{suffix}"
+
+    @asynccontextmanager
+    async def lock(self, bvid: str, cid: int):
+        """同一个音频的下载锁，避免并发请求重复下载、写同一个临时文件（async with 使用）"""
+        key = self.make_key(bvid, cid)
+        entry = self._locks.get(key)
+        if entry is None:
+            entry = self._locks[key] = [asyncio.Lock(), 0]
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                yield
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0:
+                del self._locks[key]
+
+    def lookup(self, bvid: str, cid: int) -> Optional[str]:
+        """命中时返回文件路径并刷新LRU顺序（修改时间），包括其他进程下载的文件"""
+        key = self.make_key(bvid, cid)
+        with self._mutex:
+            path = self._entries.get(key)
+            if path is None or not path.exists():
+                self._forget(key)
+                path = next((f for f in self.directory.glob(f"{key}.*") if _is_audio(f)), None)
+                if path is None:
+                    return None
+                self._entries[key] = path
+                self._sizes[key] = path.stat().st_size
+            self._entries.move_to_end(key)
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return str(path)
+
+    def store(self, path: str) -> bool:
+        """
+        登记一个已完整写入的文件
+        超过 MAX_FILE_SIZE 的文件直接删除并返回 False
+        """
+        path = Path(path)
+        size = path.stat().st_size
+        if size > self.max_file_bytes:
+            logger.warning(f"Audio file {path.name} is {size} bytes, exceeds MAX_FILE_SIZE, discarded")
+            path.unlink(missing_ok=True)
+            return False
+
+        with self._mutex:
+            self._entries[path.stem] = path
+            self._entries.move_to_end(path.stem)
+            self._sizes[path.stem] = size
+        # 刚写入的文件马上就要被使用，本轮不淘汰它
+        self.evict(keep=path.stem)
+        return True
+
+    def _pin_path(self, key: str) -> Path:
+        return self.pin_dir / f"{key}.pin"
+
+    def _open_pin(self, key: str, operation: int) -> Optional[int]:
+        """
+        打开引用锁文件并加锁（operation 需带 LOCK_NB），返回文件描述符；锁被占用时返回 None
+        淘汰方会在排他锁下删除锁文件，加锁后确认锁住的仍是当前路径上的文件，否则重新打开
+        """
+        pin_path = self._pin_path(key)
+        while True:
+            fd = os.open(pin_path, os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                fcntl.flock(fd, operation)
+            except BlockingIOError:
+                os.close(fd)
+                return None
+            except BaseException:
+                os.close(fd)
+                raise
+            try:
+                if os.fstat(fd).st_ino == os.stat(pin_path).st_ino:
+                    return fd
+            except FileNotFoundError:
+                pass
+            os.close(fd)
+
+    @asynccontextmanager
+    async def hold(self, path: str) -> AsyncIterator[str]:
+        """
+        使用期间持有引用（锁文件上的共享锁），保证文件不会被本进程或其他进程淘汰（async with 使用）
+        文件可以还不存在（边下载边识别）。淘汰方只在删除文件的瞬间持有排他锁，
+        加锁不阻塞事件循环，被占用时稍后重试
+        """
+        key = Path(path).stem
+        while True:
+            fd = self._open_pin(key, fcntl.LOCK_SH | fcntl.LOCK_NB)
+            if fd is not None:
+                break
+            await asyncio.sleep(PIN_RETRY_INTERVAL)
+        try:
+            yield path
+        finally:
+            os.close(fd)
+            self.evict()
+
+    @contextmanager
+    def _claim(self, key: str) -> Iterator[bool]:
+        """
+        尝试以排他锁占用一个缓存文件，产出是否成功（有进程持有引用时失败）
+        成功时退出前删除锁文件，调用方在此期间删除音频文件
+        """
+        fd = self._open_pin(key, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        if fd is None:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            self._pin_path(key).unlink(missing_ok=True)
+            os.close(fd)
+
+    def evict(self, keep: Optional[str] = None):
+        """重新扫描目录，按LRU顺序淘汰未被引用的文件，直到所有进程的缓存总大小不超过预算"""
+        with self._mutex:
+            self._scan()
+            total = self.total_bytes
+            if total <= self.max_bytes:
+                return
+            for key in list(self._entries):
+                if total <= self.max_bytes:
+                    break
+                if key == keep:
+                    continue
+                with self._claim(key) as claimed:
+                    if not claimed:
+                        continue
+                    self._entries[key].unlink(missing_ok=True)
+                total -= self._sizes.get(key, 0)
+                logger.info(f"Evicted cached audio: {self._entries[key].name}")
+                self._forget(key)
+
+    def clear(self):
+        """删除所有未被引用的缓存文件和残留的临时文件"""
+        with self._mutex:
+            self._scan()
+            for key in list(self._entries):
+                with self._claim(key) as claimed:
+                    if not claimed:
+                        continue
+                    self._entries[key].unlink(missing_ok=True)
+                self._forget(key)
+        for f in self.directory.glob(f"*{PART_SUFFIX}*"):
+            with self._claim(f.name.split(".")[0]) as claimed:
+                if claimed:
+                    f.unlink(missing_ok=True)
+
+    def discard_partial(self, bvid: str, cid: int):
+        """删除某个音频下载到一半的临时文件（下载被取消时调用，调用方需持有该音频的下载锁）"""
+        for f in self.directory.glob(f"{self.make_key(bvid, cid)}.*"):
+            if _is_partial(f):
+                f.unlink(missing_ok=True)
+
+    def _forget(self, key: str):
+        self._entries.pop(key, None)
+        self._sizes.pop(key, None)
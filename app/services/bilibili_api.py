@@ -1,11 +1,13 @@
 """
 B站API封装模块
 """
-import aiohttp
 import re
 import logging
 from typing import Optional, Dict, List
+from urllib.parse import urlsplit
 from app.core.config import settings
+from app.core.http import get_http_session
+from app.core.metrics import track_stage
 
 logger = logging.getLogger(__name__)
 
@@ -22,16 +24,6 @@ class BilibiliAPI:
         if settings.BILIBILI_COOKIE:
             self.headers["Cookie"] = settings.BILIBILI_COOKIE
 
-        # 创建SSL context（禁用验证）
-        import ssl
-        self.ssl_context = ssl.create_default_context()
-        self.ssl_context.check_hostname = False
-        self.ssl_context.verify_mode = ssl.CERT_NONE
-
-    def _get_connector(self):
-        """获取配置好的连接器"""
-        return aiohttp.TCPConnector(ssl=self.ssl_context)
-
     def extract_bvid(self, url: str) -> Optional[str]:
         """
         从URL中提取BV号
@@ -54,19 +46,43 @@ class BilibiliAPI:
 
         return None
 
-    async def get_video_info(self, bvid: str) -> Optional[Dict]:
+    @staticmethod
+    def _validators(response) -> Dict[str, str]:
+        """响应的 ETag / Last-Modified，用于之后的条件请求"""
+        validators = {}
+        if response.headers.get("ETag"):
+            validators["etag"] = response.headers["ETag"]
+        if response.headers.get("Last-Modified"):
+            validators["last_modified"] = response.headers["Last-Modified"]
+        return validators
+
+    def _conditional_headers(self, validators: Optional[Dict[str, str]]) -> Dict[str, str]:
+        headers = dict(self.headers)
+        if validators:
+            if validators.get("etag"):
+                headers["If-None-Match"] = validators["etag"]
+            if validators.get("last_modified"):
+                headers["If-Modified-Since"] = validators["last_modified"]
+        return headers
+
+    async def get_video_info(self, bvid: str, validators: Optional[Dict[str, str]] = None) -> Optional[Dict]:
         """
         获取视频基本信息
         API: https://api.bilibili.com/x/web-interface/view?bvid={bvid}
+        返回值带 validators（ETag/Last-Modified）；传入上次的 validators 时发条件请求，
+        未变化（304）时返回 {"bvid", "not_modified": True, "validators"}
         """
-        try:
-            url = f"{self.base_url}/x/web-interface/view"
-            params = {"bvid": bvid}
-
-            connector = self._get_connector()
+        stage = track_stage("video_info")
+        with stage:
+            try:
+                url = f"{self.base_url}/x/web-interface/view"
+                params = {"bvid": bvid}
 
-            async with aiohttp.ClientSession(connector=connector) as session:
-                async with session.get(url, params=params, headers=self.headers) as response:
+                session = get_http_session()
+                headers = self._conditional_headers(validators)
+                async with session.get(url, params=params, headers=headers) as response:
+                    if response.status == 304:
+                        return {"bvid": bvid, "not_modified": True, "validators": self._validators(response) or validators}
                     if response.status == 200:
                         data = await response.json()
                         if data.get("code") == 0:
@@ -79,102 +95,228 @@ class BilibiliAPI:
                                 "aid": video_data.get("aid"),
                                 "owner": video_data.get("owner", {}).get("name"),
                                 "desc": video_data.get("desc"),
+                                "validators": self._validators(response),
                             }
                         else:
                             logger.error(f"API error: {data.get('message')}")
+                            stage.fail("api_error")
                             return None
                     else:
                         logger.error(f"HTTP error: {response.status}")
+                        stage.fail(f"http_{response.status}")
                         return None
 
-        except Exception as e:
-            logger.error(f"Error getting video info: {str(e)}", exc_info=True)
-            return None
+            except Exception as e:
+                logger.error(f"Error getting video info: {str(e)}", exc_info=True)
+                stage.fail(type(e).__name__)
+                return None
 
     async def get_subtitle(self, bvid: str, cid: int) -> Optional[List[Dict]]:
         """
         获取CC字幕
         API: https://api.bilibili.com/x/player/v2?bvid={bvid}&cid={cid}
         """
-        try:
-            url = f"{self.base_url}/x/player/v2"
-            params = {"bvid": bvid, "cid": cid}
-
-            connector = self._get_connector()
+        track = await self.get_subtitle_track(bvid, cid)
+        return track["body"] if track else None
 
-            async with aiohttp.ClientSession(connector=connector) as session:
-                async with session.get(url, params=params, headers=self.headers) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        if data.get("code") == 0:
-                            subtitle_data = data.get("data", {}).get("subtitle", {})
-                            subtitles = subtitle_data.get("subtitles", [])
+    async def get_ai_subtitle(self, bvid: str, cid: int) -> Optional[List[Dict]]:
+        """
+        获取AI生成的字幕
+        需要先检查是否有AI字幕，然后下载
+        """
+        track = await self.get_subtitle_track(bvid, cid, ai=True)
+        return track["body"] if track else None
 
-                            if subtitles:
-                                # 获取第一个字幕（通常是中文）
-                                subtitle_url = subtitles[0].get("subtitle_url")
-                                if subtitle_url:
-                                    # 下载字幕JSON
-                                    if not subtitle_url.startswith("http"):
-                                        subtitle_url = "https:" + subtitle_url
+    async def get_subtitle_track(
+        self,
+        bvid: str,
+        cid: int,
+        ai: bool = False,
+        known: Optional[Dict] = None
+    ) -> Optional[Dict]:
+        """
+        获取字幕及其来源: {"url", "body", "validators", "not_modified"}
+        ai: 取AI生成的字幕，否则取第一个CC字幕
+        known: 上次获取的 {"url", "validators"}；字幕地址未变时发条件请求，
+               未变化（304）时 not_modified 为 True、body 为 None
+        """
+        try:
+            subtitle_data = await self._get_player_subtitle(bvid, cid) or {}
+            if ai:
+                # 检查是否有AI字幕标记
+                entry = subtitle_data.get("ai_subtitle")
+            else:
+                # 获取第一个字幕（通常是中文）
+                subtitles = subtitle_data.get("subtitles") or []
+                entry = subtitles[0] if subtitles else None
 
-                                    return await self._download_subtitle(subtitle_url)
+            subtitle_url = (entry or {}).get("subtitle_url")
+            if not subtitle_url:
+                return None
+            if not subtitle_url.startswith("http"):
+                subtitle_url = "https:" + subtitle_url
 
-            return None
+            validators = None
+            # 字幕地址可能带每次不同的签名参数，只比较路径
+            if known and known.get("url") and _url_path(known["url"]) == _url_path(subtitle_url):
+                validators = known.get("validators")
+            return await self._download_subtitle(subtitle_url, validators)
 
         except Exception as e:
-            logger.error(f"Error getting subtitle: {str(e)}", exc_info=True)
+            logger.error(f"Error getting {'AI ' if ai else ''}subtitle: {str(e)}", exc_info=True)
             return None
 
-    async def get_ai_subtitle(self, bvid: str, cid: int) -> Optional[List[Dict]]:
+    async def _get_player_subtitle(self, bvid: str, cid: int) -> Optional[Dict]:
         """
-        获取AI生成的字幕
-        需要先检查是否有AI字幕，然后下载
+        从player接口获取字幕元数据（data.subtitle）
+        API: https://api.bilibili.com/x/player/v2?bvid={bvid}&cid={cid}
         """
-        try:
-            # 先尝试从player接口获取AI字幕信息
-            url = f"{self.base_url}/x/player/v2"
-            params = {"bvid": bvid, "cid": cid}
+        url = f"{self.base_url}/x/player/v2"
+        params = {"bvid": bvid, "cid": cid}
+
+        with track_stage("player_metadata") as stage:
+            session = get_http_session()
+            async with session.get(url, params=params, headers=self.headers) as response:
+                if response.status != 200:
+                    stage.fail(f"http_{response.status}")
+                    return None
+                data = await response.json()
+                if data.get("code") != 0:
+                    stage.fail("api_error")
+                    return None
+                return data.get("data", {}).get("subtitle", {})
+
+    async def get_popular_videos(self, count: int = 20) -> List[Dict]:
+        """
+        获取热门视频列表
+        API: https://api.bilibili.com/x/web-interface/popular?ps={count}&pn=1
+        """
+        data = await self._get_list("popular_list", "/x/web-interface/popular", {"ps": count, "pn": 1})
+        return [
+            {
+                "bvid": item.get("bvid"),
+                "cid": item.get("cid"),
+                "title": item.get("title"),
+                "duration": item.get("duration"),
+                "owner": (item.get("owner") or {}).get("name"),
+            }
+            for item in (data or {}).get("list") or []
+            if item.get("bvid")
+        ]
+
+    async def get_uploader_videos(self, mid: int, count: int = 20) -> List[Dict]:
+        """
+        获取UP主最新投稿
+        API: https://api.bilibili.com/x/series/recArchivesByKeywords?mid={mid}&keywords=&ps={count}
+        （空间投稿接口 /x/space/wbi/arc/search 需要WBI签名，这个接口不需要）
+        """
+        params = {"mid": mid, "keywords": "", "ps": count, "pn": 1}
+        data = await self._get_list("uploader_videos", "/x/series/recArchivesByKeywords", params)
+        return [
+            {
+                "bvid": item.get("bvid"),
+                "cid": None,
+                "title": item.get("title"),
+                "duration": item.get("duration"),
+                "owner": None,
+            }
+            for item in (data or {}).get("archives") or []
+            if item.get("bvid")
+        ]
+
+    async def _get_list(self, stage_name: str, path: str, params: Dict) -> Optional[Dict]:
+        """请求返回视频列表的接口，返回 data 字段"""
+        stage = track_stage(stage_name)
+        with stage:
+            try:
+                session = get_http_session()
+                async with session.get(f"{self.base_url}{path}", params=params, headers=self.headers) as response:
+                    if response.status != 200:
+                        stage.fail(f"http_{response.status}")
+                        return None
+                    data = await response.json()
+                    if data.get("code") != 0:
+                        logger.error(f"List API error ({path}): {data.get('message')}")
+                        stage.fail("api_error")
+                        return None
+                    return data.get("data")
 
-            connector = self._get_connector()
+            except Exception as e:
+                logger.error(f"Error getting video list ({path}): {str(e)}", exc_info=True)
+                stage.fail(type(e).__name__)
+                return None
+
+    async def get_audio_streams(self, bvid: str, cid: int) -> Optional[List[Dict]]:
+        """
+        获取DASH音频流列表
+        API: https://api.bilibili.com/x/player/playurl?bvid={bvid}&cid={cid}&fnval=16
+        返回按码率从低到高排序的音频流
+        """
+        stage = track_stage("playurl")
+        with stage:
+            try:
+                url = f"{self.base_url}/x/player/playurl"
+                params = {"bvid": bvid, "cid": cid, "fnval": 16, "fourk": 0}
 
-            async with aiohttp.ClientSession(connector=connector) as session:
+                session = get_http_session()
                 async with session.get(url, params=params, headers=self.headers) as response:
                     if response.status == 200:
                         data = await response.json()
                         if data.get("code") == 0:
-                            # 检查是否有AI字幕标记
-                            subtitle_data = data.get("data", {}).get("subtitle", {})
-                            ai_subtitle = subtitle_data.get("ai_subtitle")
+                            dash = (data.get("data") or {}).get("dash") or {}
+                            streams = []
+                            for item in dash.get("audio") or []:
+                                stream_url = item.get("baseUrl") or item.get("base_url")
+                                if not stream_url:
+                                    continue
+                                streams.append({
+                                    "id": item.get("id"),
+                                    "url": stream_url,
+                                    "backup_urls": item.get("backupUrl") or item.get("backup_url") or [],
+                                    "bandwidth": item.get("bandwidth", 0),
+                                    "codecs": item.get("codecs"),
+                                    "mime_type": item.get("mimeType") or item.get("mime_type"),
+                                })
+                            return sorted(streams, key=lambda s: s["bandwidth"])
+                        else:
+                            logger.error(f"Playurl API error: {data.get('message')}")
+                            stage.fail("api_error")
+                    else:
+                        stage.fail(f"http_{response.status}")
 
-                            if ai_subtitle:
-                                subtitle_url = ai_subtitle.get("subtitle_url")
-                                if subtitle_url:
-                                    if not subtitle_url.startswith("http"):
-                                        subtitle_url = "https:" + subtitle_url
-                                    return await self._download_subtitle(subtitle_url)
+                return None
 
-            return None
+            except Exception as e:
+                logger.error(f"Error getting audio streams: {str(e)}", exc_info=True)
+                stage.fail(type(e).__name__)
+                return None
 
-        except Exception as e:
-            logger.error(f"Error getting AI subtitle: {str(e)}", exc_info=True)
-            return None
-
-    async def _download_subtitle(self, url: str) -> Optional[List[Dict]]:
+    async def _download_subtitle(self, url: str, validators: Optional[Dict[str, str]] = None) -> Optional[Dict]:
         """
-        下载字幕JSON文件
+        下载字幕JSON文件，带 validators 时发条件请求
         """
-        try:
-            connector = self._get_connector()
-
-            async with aiohttp.ClientSession(connector=connector) as session:
-                async with session.get(url, headers=self.headers) as response:
+        stage = track_stage("subtitle_download")
+        with stage:
+            try:
+                session = get_http_session()
+                async with session.get(url, headers=self._conditional_headers(validators)) as response:
+                    if response.status == 304:
+                        return {"url": url, "body": None, "validators": self._validators(response) or validators,
+                                "not_modified": True}
                     if response.status == 200:
                         subtitle_data = await response.json()
-                        return subtitle_data.get("body", [])
+                        return {"url": url, "body": subtitle_data.get("body", []),
+                                "validators": self._validators(response), "not_modified": False}
+                    stage.fail(f"http_{response.status}")
 
-            return None
+                return None
 
-        except Exception as e:
-            logger.error(f"Error downloading subtitle: {str(e)}", exc_info=True)
-            return None
+            except Exception as e:
+                logger.error(f"Error downloading subtitle: {str(e)}", exc_info=True)
+                stage.fail(type(e).__name__)
+                return None
+
+
+def _url_path(url: str) -> str:
+    parts = urlsplit(url)
+    return parts.netloc + parts.path
@@ -0,0 +1,135 @@
+"""
+无头浏览器池
+为 snapany 备选下载复用 Chromium 进程：按需启动最多 N 个浏览器，
+每个任务使用独立的 BrowserContext，浏览器用到一定次数或崩溃后回收重启，
+并限制同时打开的页面数，避免高负载时无限制地拉起浏览器进程
+"""
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, List, Optional
+from app.core.config import settings
+from app.core.optional import is_installed
+
+# Playwright 是可选依赖，启动浏览器时才导入
+PLAYWRIGHT_AVAILABLE = is_installed("playwright")
+
+logger = logging.getLogger(__name__)
+
+
+class _BrowserSlot:
+    """池中的一个浏览器及其使用情况"""
+
+    def __init__(self, browser):
+        self.browser = browser
+        self.uses = 0  # 已分配过的任务数
+        self.active = 0  # 正在使用的上下文数
+        self.retiring = False  # 达到使用上限或崩溃，不再分配新任务
+
+    @property
+    def healthy(self) -> bool:
+        return not self.retiring and self.browser.is_connected()
+
+
+class BrowserPool:
+    """Chromium 浏览器池"""
+
+    def __init__(
+        self,
+        size: Optional[int] = None,
+        max_uses: Optional[int] = None,
+        max_concurrency: Optional[int] = None
+    ):
+        self.size = size or settings.BROWSER_POOL_SIZE
+        self.max_uses = max_uses or settings.BROWSER_MAX_USES
+        self.max_concurrency = max_concurrency or settings.BROWSER_MAX_CONCURRENCY
+
+        self._playwright = None
+        self._slots: List[_BrowserSlot] = []
+        self._lock = asyncio.Lock()
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+
+    @asynccontextmanager
+    async def context(self) -> AsyncIterator["BrowserContext"]:
+        """
+        借出一个独立的浏览器上下文
+        超过并发上限时排队等待；退出时关闭上下文并归还浏览器
+        """
+        if not PLAYWRIGHT_AVAILABLE:
+            raise RuntimeError("playwright未安装，请运行: pip install playwright && playwright install chromium")
+
+        async with self._semaphore:
+            slot = await self._acquire()
+            browser_context = None
+            try:
+                browser_context = await slot.browser.new_context()
+                yield browser_context
+            except Exception:
+                if not slot.browser.is_connected():
+                    logger.warning("Browser crashed, it will be recycled")
+                    slot.retiring = True
+                raise
+            finally:
+                if browser_context is not None:
+                    try:
+                        await browser_context.close()
+                    except Exception:
+                        slot.retiring = True
+                await self._release(slot)
+
+    async def _acquire(self) -> _BrowserSlot:
+        async with self._lock:
+            # 清理已崩溃的浏览器，空闲的退役浏览器直接关闭
+            for slot in list(self._slots):
+                if not slot.browser.is_connected():
+                    slot.retiring = True
+                if slot.retiring and slot.active <= 0:
+                    self._slots.remove(slot)
+                    await self._close_browser(slot)
+
+            candidates = [slot for slot in self._slots if slot.healthy]
+            live = [slot for slot in self._slots if not slot.retiring]
+            if len(live) < self.size and (not candidates or min(s.active for s in candidates) > 0):
+                # 还没到池大小且现有浏览器都在忙：按需再启动一个
+                slot = _BrowserSlot(await self._launch())
+                self._slots.append(slot)
+            else:
+                slot = min(candidates, key=lambda s: s.active)
+
+            slot.uses += 1
+            slot.active += 1
+            if slot.uses >= self.max_uses:
+                # 这是该浏览器最后一个任务，用完即回收
+                slot.retiring = True
+            return slot
+
+    async def _release(self, slot: _BrowserSlot):
+        async with self._lock:
+            slot.active -= 1
+            if slot.retiring and slot.active <= 0:
+                self._slots.remove(slot)
+                await self._close_browser(slot)
+
+    async def _launch(self):
+        if self._playwright is None:
+            from playwright.async_api import async_playwright
+            self._playwright = await async_playwright().start()
+        logger.info("Launching pooled Chromium browser")
+        return await self._playwright.chromium.launch(headless=True)
+
+    @staticmethod
+    async def _close_browser(slot: _BrowserSlot):
+        try:
+            await slot.browser.close()
+        except Exception as e:
+            logger.warning(f"Error closing browser: {str(e)}")
+
+    async def close(self):
+        """关闭所有浏览器（应用关闭时调用）"""
+        async with self._lock:
+            for slot in self._slots:
+                await self._close_browser(slot)
+            self._slots.clear()
+            if self._playwright is not None:
+                await self._playwright.stop()
+                self._playwright = None
@@ -1,24 +1,135 @@
 """
 DeepSeek AI 总结服务
 """
+import re
+import time
+import asyncio
 import logging
-from typing import List, Dict
-from openai import OpenAI
+from typing import TYPE_CHECKING, Any, AsyncIterator, List, Dict, Optional, Tuple
 from app.core.config import settings
+from app.core import tracing
+from app.services.summary_cache import SummaryCache
+from app.services.text_chunker import chunk_transcript, estimate_tokens
+from app.services.transcript_compactor import RULES_VERSION, TranscriptCompactor
+
+if TYPE_CHECKING:
+    from openai import AsyncOpenAI
 
 logger = logging.getLogger(__name__)
 
+# 分段总结时最多做几轮 map（要点合并后仍然过长时再分段提炼一次）
+MAX_MAP_ROUNDS = 3
+
+# 总结逻辑（提示词之外的处理方式，如要点提取）变化、旧缓存不再适用时递增
+SUMMARY_VERSION = 1
+
+TEMPERATURE = 0.7
+
+USER_PROMPT = "以下是我视频逐字稿,请你总结成一个笔记形式,md 格式输出,一定要突出重点,去掉一些无意义的口语.:\n\n{transcript}"
+
+MAP_SYSTEM_PROMPT = """你是一个专业的视频内容总结助手。你会收到一个长视频逐字稿中的一段，请提炼这一段的要点。
+
+要求：
+1. 使用 Markdown 列表输出
+2. 保留关键信息、具体案例和数据
+3. 去掉无意义的口语、语气词
+4. 不要添加这一段之外的内容"""
+
+MAP_USER_PROMPT = "以下是视频逐字稿的第{index}/{total}部分,请提炼这一部分的要点:\n\n{chunk}"
+
+REDUCE_USER_PROMPT = "以下是一个长视频逐字稿按时间顺序分段提炼出的要点,请你合并总结成一个完整的笔记形式,md 格式输出,一定要突出重点,去掉重复的内容.:\n\n{notes}"
+
+
+class KeyPointExtractor:
+    """
+    从 Markdown 总结中增量提取关键要点
+    流式输出时每收到完整的一行就检查一次，要点可以在总结生成过程中陆续展示
+    """
+
+    max_points = 10
+
+    def __init__(self):
+        self.points: List[str] = []
+        self._lines: List[str] = []
+        self._buffer = ""
+
+    def feed(self, text: str) -> List[str]:
+        """追加一段输出，返回其中新出现的要点"""
+        self._buffer += text
+        *lines, self._buffer = self._buffer.split('\n')
+        return [point for point in map(self._add_line, lines) if point]
+
+    def finish(self) -> List[str]:
+        """输出结束，处理最后一行并返回全部要点"""
+        if self._buffer:
+            self._add_line(self._buffer)
+            self._buffer = ""
+
+        # 如果没有提取到要点，返回前几个较长的非标题行
+        if not self.points:
+            for line in self._lines:
+                line = line.strip()
+                if line and not line.startswith('#') and len(self.points) < 5:
+                    if len(line) > 10:  # 过滤太短的行
+                        self.points.append(line[:100])  # 限制长度
+
+        return self.points[:self.max_points]
+
+    def _add_line(self, line: str) -> str:
+        self._lines.append(line)
+        point = self._parse_line(line.strip())
+        if point and point not in self.points and len(self.points) < self.max_points:
+            self.points.append(point)
+            return point
+        return ""
+
+    @staticmethod
+    def _parse_line(line: str) -> str:
+        # 提取二级标题
+        if line.startswith('## ') and not line.startswith('###'):
+            return line.replace('## ', '').strip()
+        # 提取加粗的列表项
+        if line.startswith('- **') or line.startswith('* **'):
+            match = re.search(r'\*\*(.*?)\*\*', line)
+            if match:
+                return match.group(1).strip()
+        return ""
+
 
 class DeepSeekService:
     """DeepSeek AI 服务类"""
 
     def __init__(self):
-        """初始化 DeepSeek 客户端"""
-        self.client = OpenAI(
-            api_key=settings.DEEPSEEK_API_KEY,
-            base_url=settings.DEEPSEEK_API_URL
-        )
+        self._client: Optional["AsyncOpenAI"] = None
         self.model = "deepseek-chat"  # DeepSeek 模型名称
+        self.cache = SummaryCache() if settings.SUMMARY_CACHE_ENABLED else None
+        self.compactor = TranscriptCompactor() if settings.SUMMARY_COMPACT else None
+        # 进行中的总结: 缓存键 -> 结果，用于合并同时到达的相同请求
+        self._inflight: Dict[str, asyncio.Future] = {}
+
+    @property
+    def client(self) -> "AsyncOpenAI":
+        """
+        DeepSeek 客户端（异步，复用连接池）
+        第一次调用时才导入 openai/httpx 并创建，只处理字幕请求的进程不需要加载
+        """
+        if self._client is None:
+            import httpx
+            from openai import AsyncOpenAI
+
+            self._client = AsyncOpenAI(
+                api_key=settings.DEEPSEEK_API_KEY,
+                base_url=settings.DEEPSEEK_API_URL,
+                timeout=settings.DEEPSEEK_TIMEOUT,
+                http_client=httpx.AsyncClient(
+                    limits=httpx.Limits(
+                        max_connections=settings.DEEPSEEK_MAX_CONNECTIONS,
+                        max_keepalive_connections=settings.DEEPSEEK_MAX_CONNECTIONS
+                    ),
+                    timeout=settings.DEEPSEEK_TIMEOUT
+                )
+            )
+        return self._client
 
     async def summarize_transcript(self, transcript: str, style: str = "brief") -> Dict[str, any]:
         """
@@ -32,40 +143,237 @@ class DeepSeekService:
             包含 summary 和 key_points 的字典
         """
         try:
-            logger.info(f"Starting DeepSeek summarization, style: {style}, text length: {len(transcript)}")
-
-            # 构建提示词
-            system_prompt = self._build_system_prompt(style)
-            user_prompt = f"以下是我视频逐字稿,请你总结成一个笔记形式,md 格式输出,一定要突出重点,去掉一些无意义的口语.:\n\n{transcript}"
-
-            # 调用 DeepSeek API
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt}
-                ],
-                temperature=0.7,
-                max_tokens=4000,
-                stream=False
-            )
+            result = None
+            async for event, data in self.summarize_stream(transcript, style):
+                if event == "done":
+                    result = data
+            return result
 
-            # 提取响应
-            summary_text = response.choices[0].message.content.strip()
+        except Exception as e:
+            logger.error(f"DeepSeek API error: {str(e)}", exc_info=True)
+            raise Exception(f"DeepSeek 总结失败: {str(e)}")
 
-            # 解析关键要点（从 markdown 中提取）
-            key_points = self._extract_key_points(summary_text)
+    async def summarize_stream(self, transcript: str, style: str = "brief") -> AsyncIterator[Tuple[str, Any]]:
+        """
+        流式总结视频逐字稿
 
-            logger.info(f"DeepSeek summarization completed, summary length: {len(summary_text)}")
+        估算token数超过 SUMMARY_SINGLE_SHOT_TOKENS 的长逐字稿自动改用分段总结（map-reduce）：
+        按字幕/句子边界切块，并发提炼各块要点，再把要点合并成最终笔记
 
-            return {
-                "summary": summary_text,
-                "key_points": key_points
-            }
+        依次产出:
+            ("stage", {"stage": "map"/"reduce", ...}) —— 分段总结的进度（仅分段模式）
+            ("delta", 文本片段) —— 模型输出的增量文本
+            ("key_point", 要点) —— 输出中新识别出的关键要点
+            ("done", {"summary": ..., "key_points": [...]}) —— 完整结果
 
+        相同请求（原始逐字稿、风格、模型、提示词、分段和压缩配置都相同）直接返回缓存结果，只产出 done；
+        同时进行的相同请求只调用一次 DeepSeek，其余请求等待它的结果。
+        需要调用 DeepSeek 时先在本地压缩逐字稿（去语气词、合并重复字幕、拼句），产出 ("stage", {"stage": "compact", ...})
+        """
+        key = SummaryCache.make_key(transcript, style, self.model, self._generation_config(style))
+        if self.cache is not None:
+            # SQLite 读写可能等待其他进程的写锁，不放在事件循环里
+            cached = await asyncio.to_thread(self.cache.get, key)
+            tracing.mark("summary_cache", hit=cached is not None)
+            if cached is not None:
+                logger.info(f"Summary cache hit, style: {style}, text length: {len(transcript)}")
+                yield "done", cached
+                return
+
+        leader = self._inflight.get(key)
+        if leader is not None:
+            logger.info("Identical summarization in progress, waiting for its result")
+            yield "stage", {"stage": "waiting"}
+            started = time.perf_counter()
+            try:
+                result = await asyncio.shield(leader)
+                tracing.record("deepseek_wait", started)
+                yield "done", result
+                return
+            except asyncio.CancelledError:
+                # 正在执行的请求被其客户端中途放弃时，自己重新生成
+                if not leader.cancelled():
+                    raise
+
+        future = asyncio.get_running_loop().create_future()
+        # 没有等待者时也不要报告 "exception was never retrieved"
+        future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        self._inflight[key] = future
+        started = time.perf_counter()
+        try:
+            if self.compactor is not None:
+                with tracing.span("compact"):
+                    # 长逐字稿的正则处理是纯CPU操作，放到线程池里避免阻塞事件循环
+                    compaction = await asyncio.to_thread(self.compactor.compact, transcript)
+                transcript = compaction.text
+                report = compaction.report
+                logger.info(
+                    f"Transcript compacted: {report.original_tokens} -> {report.compacted_tokens} tokens "
+                    f"({report.token_reduction:.1%} less), fillers removed: {report.fillers_removed} chars, "
+                    f"duplicates removed: {report.duplicates_removed}"
+                )
+                yield "stage", {"stage": "compact", **report.to_dict()}
+
+            async for event, data in self._generate(transcript, style):
+                if event == "done":
+                    if self.cache is not None:
+                        await asyncio.to_thread(self.cache.put, key, data)
+                    future.set_result(data)
+                yield event, data
         except Exception as e:
-            logger.error(f"DeepSeek API error: {str(e)}", exc_info=True)
-            raise Exception(f"DeepSeek 总结失败: {str(e)}")
+            if not future.done():
+                future.set_exception(e)
+            raise
+        finally:
+            # 生成过程跨越多次 yield，结束后补记为一个阶段
+            tracing.record("deepseek", started)
+            if not future.done():
+                future.cancel()
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
+
+    async def _generate(self, transcript: str, style: str) -> AsyncIterator[Tuple[str, Any]]:
+        """调用 DeepSeek 生成总结（事件同 summarize_stream）"""
+        tokens = estimate_tokens(transcript)
+        logger.info(
+            f"Starting DeepSeek summarization, style: {style}, text length: {len(transcript)}, "
+            f"estimated tokens: {tokens}"
+        )
+
+        if tokens <= settings.SUMMARY_SINGLE_SHOT_TOKENS:
+            messages = self._build_messages(transcript, style)
+        else:
+            text = transcript
+            for round_index in range(1, MAX_MAP_ROUNDS + 1):
+                chunks = chunk_transcript(text, settings.SUMMARY_CHUNK_TOKENS)
+                notes: List[Optional[str]] = [None] * len(chunks)
+                async for done in self._map_chunks(chunks, notes):
+                    yield "stage", {"stage": "map", "round": round_index, "done": done, "total": len(chunks)}
+                text = "\n\n".join(f"## 第{i + 1}部分\n{note}" for i, note in enumerate(notes))
+                if estimate_tokens(text) <= settings.SUMMARY_SINGLE_SHOT_TOKENS:
+                    break
+            logger.info(f"Map phase completed, {len(chunks)} chunks, notes tokens: {estimate_tokens(text)}")
+            yield "stage", {"stage": "reduce"}
+            messages = self._build_reduce_messages(text, style)
+
+        extractor = KeyPointExtractor()
+        parts = []
+        async for delta in self._stream_completion(messages):
+            parts.append(delta)
+            yield "delta", delta
+            for point in extractor.feed(delta):
+                yield "key_point", point
+
+        summary_text = "".join(parts).strip()
+        logger.info(f"DeepSeek summarization completed, summary length: {len(summary_text)}")
+
+        yield "done", {
+            "summary": summary_text,
+            "key_points": extractor.finish()
+        }
+
+    async def close(self):
+        """关闭HTTP连接池"""
+        if self._client is not None:
+            await self._client.close()
+            self._client = None
+
+    async def _map_chunks(self, chunks: List[str], notes: List[Optional[str]]) -> AsyncIterator[int]:
+        """
+        并发提炼各块要点（最多 SUMMARY_MAP_CONCURRENCY 个请求同时进行），结果按顺序写入 notes
+        每完成一块产出一次已完成的块数
+        """
+        semaphore = asyncio.Semaphore(settings.SUMMARY_MAP_CONCURRENCY)
+
+        async def summarize_chunk(index: int):
+            async with semaphore:
+                notes[index] = await self._complete(
+                    self._build_map_messages(chunks[index], index, len(chunks)),
+                    max_tokens=settings.SUMMARY_MAP_MAX_TOKENS
+                )
+
+        tasks = [asyncio.ensure_future(summarize_chunk(i)) for i in range(len(chunks))]
+        try:
+            for done, task in enumerate(asyncio.as_completed(tasks), 1):
+                await task
+                yield done
+        finally:
+            # 某一块失败或客户端断开时，取消其余请求
+            for task in tasks:
+                task.cancel()
+
+    async def _complete(self, messages: List[Dict[str, str]], max_tokens: int = 4000) -> str:
+        """调用 DeepSeek API 并返回完整文本"""
+        parts = [delta async for delta in self._stream_completion(messages, max_tokens)]
+        return "".join(parts).strip()
+
+    async def _stream_completion(self, messages: List[Dict[str, str]], max_tokens: int = 4000) -> AsyncIterator[str]:
+        """调用 DeepSeek API（stream=True），逐段产出文本"""
+        stream = await self.client.chat.completions.create(
+            model=self.model,
+            messages=messages,
+            temperature=TEMPERATURE,
+            max_tokens=max_tokens,
+            stream=True
+        )
+        try:
+            async for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+        finally:
+            # 客户端中途断开时也要释放连接
+            await stream.close()
+
+    def _build_messages(self, transcript: str, style: str) -> List[Dict[str, str]]:
+        """构建提示词"""
+        system_prompt = self._build_system_prompt(style)
+        user_prompt = USER_PROMPT.format(transcript=transcript)
+        return [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_prompt}
+        ]
+
+    def _build_map_messages(self, chunk: str, index: int, total: int) -> List[Dict[str, str]]:
+        """分段总结：提炼单个分块要点的提示词"""
+        user_prompt = MAP_USER_PROMPT.format(index=index + 1, total=total, chunk=chunk)
+        return [
+            {"role": "system", "content": MAP_SYSTEM_PROMPT},
+            {"role": "user", "content": user_prompt}
+        ]
+
+    def _build_reduce_messages(self, notes: str, style: str) -> List[Dict[str, str]]:
+        """分段总结：把各分块要点合并成最终笔记的提示词"""
+        system_prompt = self._build_system_prompt(style)
+        user_prompt = REDUCE_USER_PROMPT.format(notes=notes)
+        return [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_prompt}
+        ]
+
+    def _generation_config(self, style: str) -> str:
+        """
+        影响总结结果的全部配置（作为缓存键的一部分，缓存键按压缩前的逐字稿计算）：
+        各阶段提示词、分段阈值和块大小、输出长度、温度、逐字稿压缩配置以及 SUMMARY_VERSION，
+        任一变化都不会命中旧结果
+        """
+        compaction = (
+            (RULES_VERSION, self.compactor.similarity, self.compactor.max_sentence_chars)
+            if self.compactor is not None else None
+        )
+        return "\n".join(map(str, (
+            SUMMARY_VERSION,
+            self._build_system_prompt(style),
+            USER_PROMPT,
+            MAP_SYSTEM_PROMPT,
+            MAP_USER_PROMPT,
+            REDUCE_USER_PROMPT,
+            settings.SUMMARY_SINGLE_SHOT_TOKENS,
+            settings.SUMMARY_CHUNK_TOKENS,
+            settings.SUMMARY_MAP_MAX_TOKENS,
+            MAX_MAP_ROUNDS,
+            TEMPERATURE,
+            compaction,
+        )))
 
     def _build_system_prompt(self, style: str) -> str:
         """
@@ -93,32 +401,6 @@ class DeepSeekService:
         从 Markdown 文本中提取关键要点
         提取所有二级标题和重要列表项
         """
-        key_points = []
-        lines = markdown_text.split('\n')
-
-        for line in lines:
-            line = line.strip()
-            # 提取二级标题
-            if line.startswith('## ') and not line.startswith('###'):
-                point = line.replace('## ', '').strip()
-                if point:
-                    key_points.append(point)
-            # 提取加粗的列表项
-            elif line.startswith('- **') or line.startswith('* **'):
-                # 提取加粗内容
-                import re
-                match = re.search(r'\*\*(.*?)\*\*', line)
-                if match:
-                    point = match.group(1).strip()
-                    if point and point not in key_points:
-                        key_points.append(point)
-
-        # 如果没有提取到要点，返回前3个非空行
-        if not key_points:
-            for line in lines:
-                line = line.strip()
-                if line and not line.startswith('#') and len(key_points) < 5:
-                    if len(line) > 10:  # 过滤太短的行
-                        key_points.append(line[:100])  # 限制长度
-
-        return key_points[:10]  # 最多返回10个要点
+        extractor = KeyPointExtractor()
+        extractor.feed(markdown_text)
+        return extractor.finish()
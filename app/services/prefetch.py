@@ -0,0 +1,248 @@
+"""
+后台预取模块
+定期拉取关注的UP主最新投稿和热门视频，提前提取字幕写入逐字稿存储，
+用户请求这些视频时直接命中；可选地在空闲时为没有字幕的视频排队低优先级ASR。
+
+每轮有处理视频数和ASR音频时长预算；前台繁忙（提取请求多、有用户的ASR任务、CPU负载高）时暂停，
+空闲后继续
+"""
+import asyncio
+import logging
+import time
+import uuid
+from typing import Any, Callable, Dict, List, Optional
+from app.core.admission import AdmissionController
+from app.core.config import settings
+from app.core.job_queue import JobQueue
+from app.core.task_store import TaskStore, ACTIVE_STATUSES
+from app.services.bilibili_api import BilibiliAPI
+from app.services.revalidation import TranscriptRevalidator
+from app.services.subtitle_processor import SubtitleProcessor
+from app.services.transcript_store import TranscriptStore
+
+logger = logging.getLogger(__name__)
+
+# 前台繁忙时隔多久重新检查一次（秒）
+PAUSE_POLL_INTERVAL = 5.0
+
+
+def parse_uploaders(value: str) -> List[int]:
+    """解析逗号分隔的UP主 mid 列表"""
+    return [int(item) for item in value.replace(" ", "").split(",") if item.isdigit()]
+
+
+class PrefetchScheduler:
+    """预取调度器"""
+
+    def __init__(
+        self,
+        bilibili_api: BilibiliAPI,
+        subtitle_processor: SubtitleProcessor,
+        transcript_store: TranscriptStore,
+        task_store: TaskStore,
+        admission: AdmissionController,
+        job_queue: Optional[JobQueue] = None,
+        asr_runner_factory: Optional[Callable[[], Any]] = None,
+        foreground_requests: Optional[Callable[[], int]] = None,
+        revalidator: Optional[TranscriptRevalidator] = None
+    ):
+        """
+        job_queue: queue 模式下ASR任务低优先级入队；为 None 时用 asr_runner_factory() 在本进程逐个执行
+        foreground_requests: 返回本进程正在处理的前台提取请求数
+        revalidator: 已过期的字幕条目先发条件请求，未变化时不重新下载
+        """
+        self.bilibili_api = bilibili_api
+        self.subtitle_processor = subtitle_processor
+        self.transcript_store = transcript_store
+        self.task_store = task_store
+        self.admission = admission
+        self.job_queue = job_queue
+        self.asr_runner_factory = asr_runner_factory
+        self.foreground_requests = foreground_requests or (lambda: 0)
+        self.revalidator = revalidator
+        self.last_report: Optional[Dict[str, Any]] = None
+        self._stopping = asyncio.Event()
+
+    def stop(self):
+        self._stopping.set()
+
+    async def run_forever(self):
+        """每 PREFETCH_INTERVAL 秒预取一轮，直到 stop()"""
+        logger.info("Prefetch scheduler started")
+        while not self._stopping.is_set():
+            try:
+                await self.run_once()
+            except Exception as e:
+                logger.error(f"Prefetch run failed: {str(e)}", exc_info=True)
+            try:
+                await asyncio.wait_for(self._stopping.wait(), settings.PREFETCH_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+        logger.info("Prefetch scheduler stopped")
+
+    def busy_reason(self) -> Optional[str]:
+        """前台繁忙时返回原因，空闲时返回 None"""
+        if self.foreground_requests() >= settings.PREFETCH_MAX_INFLIGHT:
+            return "foreground requests"
+        # 准入快照只统计用户的ASR任务（不含预取任务）
+        snapshot = self.admission.snapshot()
+        if snapshot["active_tasks"] >= settings.PREFETCH_MAX_ACTIVE_TASKS:
+            return "foreground ASR tasks"
+        # queue 模式下识别不在本机执行，快照里没有本机负载
+        load = snapshot["cpu_load"]
+        if settings.PREFETCH_MAX_CPU_LOAD > 0 and load is not None and load > settings.PREFETCH_MAX_CPU_LOAD:
+            return f"CPU load {load:.2f}"
+        return None
+
+    async def _wait_until_idle(self, report: Dict[str, Any]) -> bool:
+        """前台繁忙时等待，返回 False 表示调度器已停止"""
+        reason = await asyncio.to_thread(self.busy_reason)
+        if reason is None:
+            return not self._stopping.is_set()
+        logger.info(f"Prefetch paused: {reason}")
+        started = time.monotonic()
+        while reason is not None and not self._stopping.is_set():
+            try:
+                await asyncio.wait_for(self._stopping.wait(), PAUSE_POLL_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+            reason = await asyncio.to_thread(self.busy_reason)
+        report["paused_seconds"] += round(time.monotonic() - started, 1)
+        return not self._stopping.is_set()
+
+    async def collect_candidates(self) -> List[Dict]:
+        """关注的UP主最新投稿在前，热门视频在后，按 bvid 去重"""
+        candidates: List[Dict] = []
+        for mid in parse_uploaders(settings.PREFETCH_UPLOADERS):
+            candidates.extend(await self.bilibili_api.get_uploader_videos(mid, settings.PREFETCH_UPLOADER_VIDEOS))
+        if settings.PREFETCH_TRENDING > 0:
+            candidates.extend(await self.bilibili_api.get_popular_videos(settings.PREFETCH_TRENDING))
+
+        seen = set()
+        unique = []
+        for video in candidates:
+            if video["bvid"] not in seen:
+                seen.add(video["bvid"])
+                unique.append(video)
+        return unique
+
+    async def run_once(self) -> Dict[str, Any]:
+        """预取一轮，返回本轮统计"""
+        started = time.monotonic()
+        report = {
+            "candidates": 0,
+            "already_cached": 0,
+            "subtitles": 0,
+            "revalidated": 0,
+            "asr_submitted": 0,
+            "asr_seconds": 0,
+            "no_subtitle": 0,
+            "errors": 0,
+            "paused_seconds": 0.0,
+        }
+        self.transcript_store.evict()
+
+        if not await self._wait_until_idle(report):
+            return report
+        candidates = await self.collect_candidates()
+        report["candidates"] = len(candidates)
+
+        processed = 0
+        for video in candidates:
+            if processed >= settings.PREFETCH_MAX_VIDEOS:
+                break
+            if self.transcript_store.contains(video["bvid"]):
+                report["already_cached"] += 1
+                continue
+            if not await self._wait_until_idle(report):
+                break
+
+            processed += 1
+            try:
+                await self._prefetch_video(video, report)
+            except Exception as e:
+                report["errors"] += 1
+                logger.warning(f"Prefetch of {video['bvid']} failed: {str(e)}")
+            # 控制请求速度，避免触发B站风控
+            try:
+                await asyncio.wait_for(self._stopping.wait(), settings.PREFETCH_REQUEST_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+
+        report["seconds"] = round(time.monotonic() - started, 1)
+        report["finished_at"] = time.time()
+        self.last_report = report
+        logger.info(f"Prefetch run finished: {report}")
+        return report
+
+    async def _prefetch_video(self, video: Dict, report: Dict[str, Any]):
+        bvid = video["bvid"]
+        if self.revalidator is not None:
+            entry = self.transcript_store.get(bvid)
+            if entry and await self.revalidator.revalidate(entry):
+                report["revalidated"] += 1
+                return
+
+        info = await self.bilibili_api.get_video_info(bvid)
+        if not info:
+            report["errors"] += 1
+            return
+        cid, title, duration = info.get("cid"), info.get("title", ""), info.get("duration", 0)
+
+        for method, ai in (("subtitle", False), ("ai_subtitle", True)):
+            track = await self.bilibili_api.get_subtitle_track(bvid, cid, ai=ai)
+            if track and track["body"]:
+                utterances = self.subtitle_processor.parse_bilibili_subtitle(track["body"])
+                validators = {"info": info.get("validators") or {}, "subtitle": track["validators"]}
+                self.transcript_store.put(
+                    bvid, cid, title, duration, method, utterances, track["url"], validators, owner=info.get("owner")
+                )
+                report["subtitles"] += 1
+                return
+
+        report["no_subtitle"] += 1
+        if not duration or report["asr_seconds"] + duration > settings.PREFETCH_ASR_BUDGET:
+            return
+        if not self._asr_available() or await self._has_active_task(bvid):
+            return
+        report["asr_submitted"] += 1
+        report["asr_seconds"] += duration
+        await self._submit_asr(bvid, cid, title, duration)
+
+    def _asr_available(self) -> bool:
+        if self.job_queue is not None:
+            return True
+        return self.asr_runner_factory is not None and self.asr_runner_factory().asr_engine.is_available()
+
+    async def _has_active_task(self, bvid: str) -> bool:
+        tasks = await self.task_store.alist(statuses=list(ACTIVE_STATUSES))
+        return any(task.get("bvid") == bvid for task in tasks)
+
+    async def _submit_asr(self, bvid: str, cid: int, title: str, duration: int):
+        """创建预取ASR任务：queue 模式低优先级入队，inline 模式在本进程直接执行"""
+        task_id = str(uuid.uuid4())
+        await self.task_store.acreate(task_id, {
+            "status": "pending",
+            "progress": 0,
+            "message": "预取任务已创建",
+            "bvid": bvid,
+            "title": title,
+            "duration": duration,
+            # 没有客户端关注预取任务，不参与无人查看回收和准入计数
+            "source": "prefetch"
+        })
+        payload = {
+            "task_id": task_id,
+            "url": f"https://www.bilibili.com/video/{bvid}",
+            "bvid": bvid,
+            "cid": cid,
+            "title": title,
+            "duration": duration,
+            "output_format": "txt"
+        }
+        if self.job_queue is not None:
+            await asyncio.to_thread(self.job_queue.enqueue, task_id, payload, priority=settings.PREFETCH_ASR_PRIORITY)
+            logger.info(f"Prefetch ASR queued for {bvid} ({duration}s)")
+        elif self.asr_runner_factory is not None:
+            logger.info(f"Prefetch ASR running for {bvid} ({duration}s)")
+            await self.asr_runner_factory().run(**payload)
@@ -0,0 +1,355 @@
+"""
+可断点续传的分块下载模块
+边下载边写盘（不在内存中缓存整个文件），用 sidecar 清单记录已完成的字节区间及各区间的 SHA-256，
+失败后用 Range 请求只补齐缺失部分。续传前按清单重新校验磁盘上已有的数据，
+哈希不符（进程崩溃、磁盘写坏）的区间丢弃重下；清单只在数据 fsync 之后写入。
+完成后校验大小，调用方提供 expected_sha256 时再校验整个文件
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import os
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+from app.core.config import settings
+from app.core.http import get_http_session
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 64 * 1024
+# 累计写入这么多字节后刷新一次清单
+MANIFEST_FLUSH_BYTES = 4 * 1024 * 1024
+
+
+class DownloadIntegrityError(Exception):
+    """下载完成后大小或哈希校验失败"""
+
+
+class DownloadManifest:
+    """
+    下载清单（sidecar文件: <目标文件>.part.json）
+    记录文件总大小、服务端校验标识（ETag/Last-Modified）和已写入的数据块 [start, end) 及其 SHA-256，
+    数据块互不重叠，同一分段写到一半时以更长的块覆盖（起点相同）
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.total: Optional[int] = None
+        self.validator: Optional[str] = None
+        # 起始偏移 -> (结束偏移, sha256)
+        self.blocks: Dict[int, Tuple[int, str]] = {}
+
+    def load(self) -> bool:
+        """读取清单；旧版清单没有分段哈希，无法校验已有数据，视为没有清单"""
+        try:
+            data = json.loads(self.path.read_text(encoding="utf-8"))
+            if "blocks" not in data:
+                return False
+            self.total = data.get("total")
+            self.validator = data.get("validator")
+            self.blocks = {start: (end, sha256) for start, end, sha256 in data["blocks"]}
+            return True
+        except (OSError, ValueError, TypeError):
+            return False
+
+    def reset(self, total: Optional[int], validator: Optional[str]):
+        self.total = total
+        self.validator = validator
+        self.blocks = {}
+
+    def add(self, start: int, end: int, sha256: str):
+        """登记一个已写入（并已 fsync）的数据块"""
+        if end > start:
+            self.blocks[start] = (end, sha256)
+
+    @property
+    def ranges(self) -> List[Tuple[int, int]]:
+        """已完成的区间（相邻数据块合并）"""
+        merged = []
+        for start, (end, _) in sorted(self.blocks.items()):
+            if merged and start <= merged[-1][1]:
+                merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+            else:
+                merged.append((start, end))
+        return merged
+
+    def verify(self, part_path: Path) -> List[Tuple[int, int]]:
+        """重新计算磁盘上各数据块的哈希，丢弃不符的块，返回被丢弃的区间"""
+        bad = []
+        with open(part_path, "rb") as f:
+            for start, (end, expected) in sorted(self.blocks.items()):
+                f.seek(start)
+                sha256 = hashlib.sha256()
+                remaining = end - start
+                while remaining > 0:
+                    block = f.read(min(remaining, 1024 * 1024))
+                    if not block:
+                        break
+                    sha256.update(block)
+                    remaining -= len(block)
+                if remaining or sha256.hexdigest() != expected:
+                    bad.append((start, end))
+        for start, _ in bad:
+            del self.blocks[start]
+        return bad
+
+    def completed_bytes(self) -> int:
+        return sum(end - start for start, (end, _) in self.blocks.items())
+
+    def missing(self) -> List[Tuple[int, int]]:
+        """尚未下载的区间"""
+        gaps = []
+        cursor = 0
+        for start, end in self.ranges:
+            if start > cursor:
+                gaps.append((cursor, start))
+            cursor = max(cursor, end)
+        if self.total is not None and cursor < self.total:
+            gaps.append((cursor, self.total))
+        return gaps
+
+    def save(self):
+        tmp_path = self.path.with_name(self.path.name + ".tmp")
+        tmp_path.write_text(json.dumps({
+            "total": self.total,
+            "validator": self.validator,
+            "blocks": [[start, end, sha256] for start, (end, sha256) in sorted(self.blocks.items())],
+        }), encoding="utf-8")
+        os.replace(tmp_path, self.path)
+
+    def delete(self):
+        self.path.unlink(missing_ok=True)
+
+
+class ResumableDownloader:
+    """断点续传下载器"""
+
+    def __init__(self, segment_size: Optional[int] = None, concurrency: Optional[int] = None):
+        # 未指定时每次下载读取当前配置
+        self._segment_size = segment_size
+        self._concurrency = concurrency
+        self.retries = settings.MAX_RETRY
+
+    @property
+    def segment_size(self) -> int:
+        return self._segment_size or settings.DOWNLOAD_SEGMENT_SIZE
+
+    @property
+    def concurrency(self) -> int:
+        return self._concurrency or settings.DOWNLOAD_CONCURRENCY
+
+    async def fetch(
+        self,
+        url: str,
+        dest: Path,
+        headers: Optional[Dict[str, str]] = None,
+        max_size: Optional[int] = None,
+        expected_size: Optional[int] = None,
+        expected_sha256: Optional[str] = None
+    ) -> Path:
+        """
+        下载 url 到 dest
+        中途失败会保留 .part 文件和清单，下次调用（或本次重试）从断点继续
+        expected_sha256: 已知的整个文件的 SHA-256（可选），下载完成后校验
+        """
+        headers = headers or {}
+        part_path = dest.with_name(dest.name + ".part")
+        manifest = DownloadManifest(dest.with_name(dest.name + ".part.json"))
+
+        last_error: Optional[Exception] = None
+        for attempt in range(1, self.retries + 1):
+            try:
+                await self._fetch_once(url, part_path, manifest, headers, max_size)
+                break
+            except DownloadIntegrityError:
+                raise
+            except Exception as e:
+                last_error = e
+                logger.warning(
+                    f"Download attempt {attempt}/{self.retries} failed for {dest.name} "
+                    f"({manifest.completed_bytes()} bytes kept): {str(e)}"
+                )
+                if attempt < self.retries:
+                    await asyncio.sleep(min(2 ** attempt, 10))
+        else:
+            raise last_error
+
+        await self._verify(part_path, manifest, expected_size, expected_sha256)
+        os.replace(part_path, dest)
+        manifest.delete()
+        return dest
+
+    async def _fetch_once(
+        self,
+        url: str,
+        part_path: Path,
+        manifest: DownloadManifest,
+        headers: Dict[str, str],
+        max_size: Optional[int]
+    ):
+        total, validator = await self.probe(url, headers)
+        if max_size is not None and total is not None and total > max_size:
+            raise DownloadIntegrityError(f"File is {total} bytes, exceeds limit of {max_size}")
+
+        # 远端文件变化（或没有可用清单）时从头开始
+        resumable = (
+            total is not None
+            and part_path.exists()
+            and manifest.load()
+            and manifest.total == total
+            and manifest.validator == validator
+        )
+        if not resumable:
+            manifest.reset(total, validator)
+            with open(part_path, "wb") as f:
+                if total is not None:
+                    f.truncate(total)
+        elif manifest.blocks:
+            loop = asyncio.get_running_loop()
+            bad = await loop.run_in_executor(None, manifest.verify, part_path)
+            if bad:
+                logger.warning(f"Discarding {len(bad)} corrupt blocks of {part_path.name}: {bad}")
+                manifest.save()
+            logger.info(f"Resuming {part_path.name}: {manifest.completed_bytes()}/{total} bytes on disk")
+
+        if total is None:
+            # 服务端不支持Range，只能整体顺序下载
+            await self._fetch_sequential(url, part_path, manifest, headers, max_size)
+            return
+
+        segments = []
+        for start, end in manifest.missing():
+            segments.extend(
+                (offset, min(offset + self.segment_size, end))
+                for offset in range(start, end, self.segment_size)
+            )
+        if not segments:
+            return
+
+        semaphore = asyncio.Semaphore(self.concurrency)
+        fd = os.open(part_path, os.O_WRONLY)
+        unflushed = [0]
+
+        async def fetch_segment(start: int, end: int):
+            async with semaphore:
+                range_headers = {**headers, "Range": f"bytes={start}-{end - 1}"}
+                offset = start
+                sha256 = hashlib.sha256()
+                try:
+                    session = get_http_session()
+                    async with session.get(url, headers=range_headers) as response:
+                        if response.status != 206:
+                            raise Exception(f"Range request not honored: HTTP {response.status}")
+                        async for chunk in response.content.iter_chunked(CHUNK_SIZE):
+                            chunk = chunk[:end - offset]
+                            os.pwrite(fd, chunk, offset)
+                            sha256.update(chunk)
+                            offset += len(chunk)
+                            unflushed[0] += len(chunk)
+                            if unflushed[0] >= MANIFEST_FLUSH_BYTES:
+                                # 先落盘数据再写清单，清单里登记的数据块崩溃后一定还在
+                                os.fsync(fd)
+                                manifest.add(start, offset, sha256.hexdigest())
+                                manifest.save()
+                                unflushed[0] = 0
+                    if offset != end:
+                        raise Exception(f"Incomplete segment {start}-{end}: got {offset - start} bytes")
+                finally:
+                    # 失败时也记录已经写入的部分，续传时不再重复下载（下面 fsync 后才保存清单）
+                    manifest.add(start, offset, sha256.hexdigest())
+
+        tasks = [asyncio.ensure_future(fetch_segment(start, end)) for start, end in segments]
+        try:
+            await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+        finally:
+            try:
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+            manifest.save()
+
+    async def _fetch_sequential(
+        self,
+        url: str,
+        part_path: Path,
+        manifest: DownloadManifest,
+        headers: Dict[str, str],
+        max_size: Optional[int]
+    ):
+        session = get_http_session()
+        size = 0
+        sha256 = hashlib.sha256()
+        async with session.get(url, headers=headers) as response:
+            if response.status != 200:
+                raise Exception(f"HTTP error: {response.status}")
+            with open(part_path, "wb") as f:
+                async for chunk in response.content.iter_chunked(CHUNK_SIZE):
+                    size += len(chunk)
+                    if max_size is not None and size > max_size:
+                        raise DownloadIntegrityError(f"File exceeds limit of {max_size} bytes")
+                    f.write(chunk)
+                    sha256.update(chunk)
+                f.flush()
+                os.fsync(f.fileno())
+            expected = response.content_length if "Content-Encoding" not in response.headers else None
+            if expected is not None and size != expected:
+                raise Exception(f"Incomplete download: got {size} of {expected} bytes")
+        manifest.reset(size, manifest.validator)
+        manifest.add(0, size, sha256.hexdigest())
+
+    async def probe(self, url: str, headers: Dict[str, str]) -> Tuple[Optional[int], Optional[str]]:
+        """
+        用 bytes=0-0 探测文件大小、Range支持和校验标识
+        返回 (总大小, ETag/Last-Modified)，不支持Range时总大小为 None
+        """
+        session = get_http_session()
+        async with session.get(url, headers={**headers, "Range": "bytes=0-0"}) as response:
+            validator = response.headers.get("ETag") or response.headers.get("Last-Modified")
+            if response.status == 206:
+                total = int(response.headers["Content-Range"].rsplit("/", 1)[-1])
+                return total, validator
+            elif response.status == 200:
+                return None, validator
+            else:
+                raise Exception(f"HTTP error: {response.status}")
+
+    async def _verify(
+        self,
+        part_path: Path,
+        manifest: DownloadManifest,
+        expected_size: Optional[int],
+        expected_sha256: Optional[str]
+    ):
+        """校验大小、清单完整性以及调用方提供的整个文件的 SHA-256"""
+        size = part_path.stat().st_size
+        problems = []
+        if manifest.total is not None and (size != manifest.total or manifest.missing()):
+            problems.append(f"size {size}, expected {manifest.total}, missing {manifest.missing()}")
+        if expected_size is not None and size != expected_size:
+            problems.append(f"size {size}, expected {expected_size}")
+
+        if expected_sha256:
+            loop = asyncio.get_running_loop()
+            sha256 = await loop.run_in_executor(None, self._hash_file, part_path)
+            if sha256 != expected_sha256.lower():
+                problems.append(f"sha256 {sha256}, expected {expected_sha256}")
+
+        if problems:
+            # 数据已经不可信，丢弃后下次从头下载
+            part_path.unlink(missing_ok=True)
+            manifest.delete()
+            raise DownloadIntegrityError(f"Integrity check failed for {part_path.name}: {'; '.join(problems)}")
+
+    @staticmethod
+    def _hash_file(path: Path) -> str:
+        sha256 = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1024 * 1024), b""):
+                sha256.update(block)
+        return sha256.hexdigest()
@@ -0,0 +1,91 @@
+"""
+逐字稿重新验证模块
+逐字稿存储中过期的字幕条目用保存的 ETag/Last-Modified 发条件请求：
+视频信息和字幕都未变化（304）时只刷新有效期，不重新下载字幕；
+UP主修改了字幕时解析新字幕并更新存储，搜索索引只更新变化的句子
+"""
+import logging
+from typing import Any, Dict, Optional
+from app.core import tracing
+from app.core.metrics import TRANSCRIPT_REVALIDATIONS
+from app.services.bilibili_api import BilibiliAPI
+from app.services.subtitle_processor import SubtitleProcessor
+from app.services.transcript_store import TranscriptStore
+
+logger = logging.getLogger(__name__)
+
+SUBTITLE_METHODS = ("subtitle", "ai_subtitle")
+
+
+class TranscriptRevalidator:
+    """过期逐字稿的条件请求重新验证"""
+
+    def __init__(
+        self,
+        bilibili_api: BilibiliAPI,
+        subtitle_processor: SubtitleProcessor,
+        transcript_store: TranscriptStore
+    ):
+        self.bilibili_api = bilibili_api
+        self.subtitle_processor = subtitle_processor
+        self.transcript_store = transcript_store
+
+    async def revalidate(self, entry: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        返回重新验证后的条目；ASR结果、没有字幕地址、视频或字幕已不存在、请求失败时返回 None，
+        由调用方走完整的提取流程
+        """
+        bvid = entry["bvid"]
+        if entry["method"] not in SUBTITLE_METHODS or not entry.get("subtitle_url"):
+            TRANSCRIPT_REVALIDATIONS.inc(result="unsupported")
+            return None
+
+        validators = entry.get("validators") or {}
+        info = await self.bilibili_api.get_video_info(bvid, validators=validators.get("info"))
+        if not info:
+            TRANSCRIPT_REVALIDATIONS.inc(result="failed")
+            return None
+        if not info.get("not_modified") and info.get("cid") != entry["cid"]:
+            # 视频重新上传过，按新视频处理
+            TRANSCRIPT_REVALIDATIONS.inc(result="replaced")
+            return None
+
+        track = await self.bilibili_api.get_subtitle_track(
+            bvid, entry["cid"],
+            ai=entry["method"] == "ai_subtitle",
+            known={"url": entry["subtitle_url"], "validators": validators.get("subtitle")}
+        )
+        if not track or not (track["not_modified"] or track["body"]):
+            TRANSCRIPT_REVALIDATIONS.inc(result="failed")
+            return None
+
+        if info.get("not_modified"):
+            title, duration = entry["title"], entry["duration"]
+        else:
+            title, duration = info.get("title", entry["title"]), info.get("duration", entry["duration"])
+        new_validators = {"info": info.get("validators") or {}, "subtitle": track["validators"] or {}}
+
+        if track["not_modified"]:
+            self.transcript_store.mark_validated(bvid, new_validators, title=title, duration=duration)
+            TRANSCRIPT_REVALIDATIONS.inc(result="not_modified")
+            tracing.mark("revalidate", modified=False)
+            logger.info(f"Transcript of {bvid} revalidated, not modified")
+            return {**entry, "title": title, "duration": duration, "validators": new_validators, "stale": False}
+
+        utterances = self.subtitle_processor.parse_bilibili_subtitle(track["body"])
+        self.transcript_store.put(
+            bvid, entry["cid"], title, duration, entry["method"], utterances, track["url"], new_validators,
+            owner=entry.get("owner") if info.get("not_modified") else info.get("owner")
+        )
+        TRANSCRIPT_REVALIDATIONS.inc(result="modified")
+        tracing.mark("revalidate", modified=True)
+        logger.info(f"Transcript of {bvid} changed upstream, updated")
+        return {
+            **entry,
+            "title": title,
+            "duration": duration,
+            "utterances": utterances,
+            "subtitle_url": track["url"],
+            "validators": new_validators,
+            "stale": False,
+        }
@@ -0,0 +1,167 @@
+"""
+流式 下载→解码→识别 流水线
+下载的字节直接送进 ffmpeg 增量解码，每凑满一个音频窗口就交给ASR并行识别，
+总耗时约为 max(下载, 识别) 而不是两者之和
+"""
+import asyncio
+import logging
+import shutil
+import tempfile
+import wave
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from app.api.models import Utterance
+from app.core.config import settings
+from app.services.asr_engine import ASREngine
+from app.services.video_downloader import VideoDownloader
+
+logger = logging.getLogger(__name__)
+
+# ffmpeg 输出的PCM格式：16kHz 单声道 16bit
+SAMPLE_RATE = 16000
+SAMPLE_WIDTH = 2
+BYTES_PER_SECOND = SAMPLE_RATE * SAMPLE_WIDTH
+
+# 每识别完一个窗口的回调: (已完成窗口数, 预计总窗口数, 该窗口的识别结果)
+WindowCallback = Callable[[int, int, List[Utterance]], Awaitable[None]]
+
+
+class StreamingASRPipeline:
+    """流式ASR流水线"""
+
+    def __init__(self, downloader: VideoDownloader, asr_engine: ASREngine):
+        self.downloader = downloader
+        self.asr_engine = asr_engine
+        self.window_seconds = settings.ASR_STREAM_WINDOW_SECONDS
+        self.workers = settings.ASR_STREAM_WORKERS
+
+    def is_available(self) -> bool:
+        """需要 ffmpeg，且当前ASR后端支持按窗口切分识别"""
+        if not settings.ASR_STREAMING:
+            return False
+        if shutil.which("ffmpeg") is None:
+            return False
+        return self.asr_engine.capabilities.chunkable and self.asr_engine.get_backend().is_available()
+
+    async def run(
+        self,
+        bvid: str,
+        cid: int,
+        duration: Optional[float] = None,
+        on_window: Optional[WindowCallback] = None
+    ) -> List[Utterance]:
+        """
+        流式识别一个视频的音频
+        duration 仅用于估算进度
+        """
+        cache = self.downloader.cache
+        tee_path = cache.path_for(bvid, cid, ".m4s")
+
+        # 与普通下载共用缓存锁；识别期间持有引用，音频不会被淘汰
+        async with cache.lock(bvid, cid):
+            async with cache.hold(str(tee_path)):
+                return await self._run(bvid, cid, duration, on_window, tee_path)
+
+    async def _run(
+        self,
+        bvid: str,
+        cid: int,
+        duration: Optional[float],
+        on_window: Optional[WindowCallback],
+        tee_path: Path
+    ) -> List[Utterance]:
+        cache = self.downloader.cache
+        backend = self.asr_engine.get_backend()
+        window_bytes = int(self.window_seconds * BYTES_PER_SECOND)
+        expected_windows = max(1, int(-(-(duration or 0) // self.window_seconds)))
+        semaphore = asyncio.Semaphore(self.workers)
+        results: Dict[int, List[Utterance]] = {}
+        recognitions: List[asyncio.Future] = []
+        work_dir = Path(tempfile.mkdtemp(prefix=f"{bvid}_", dir=settings.TEMP_DIR))
+
+        process = await asyncio.create_subprocess_exec(
+            "ffmpeg", "-loglevel", "error", "-i", "pipe:0",
+            "-f", "s16le", "-ac", "1", "-ar", str(SAMPLE_RATE), "pipe:1",
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+        )
+
+        async def feed():
+            """把音频字节写入 ffmpeg 的 stdin：缓存命中时读本地文件，否则边下载边写"""
+            try:
+                cached_path = cache.lookup(bvid, cid)
+                if cached_path:
+                    logger.info(f"Audio cache hit: {cached_path}")
+                    with open(cached_path, "rb") as f:
+                        for chunk in iter(lambda: f.read(256 * 1024), b""):
+                            process.stdin.write(chunk)
+                            await process.stdin.drain()
+                else:
+                    async for chunk in self.downloader.stream_audio(bvid, cid, tee_path):
+                        process.stdin.write(chunk)
+                        await process.stdin.drain()
+                    cache.store(str(tee_path))
+            finally:
+                process.stdin.close()
+
+        async def recognize(index: int, pcm: bytes):
+            offset = index * self.window_seconds
+            wav_path = work_dir / f"window_{index:05d}.wav"
+            with wave.open(str(wav_path), "wb") as wav:
+                wav.setnchannels(1)
+                wav.setsampwidth(SAMPLE_WIDTH)
+                wav.setframerate(SAMPLE_RATE)
+                wav.writeframes(pcm)
+
+            async with semaphore:
+                utterances = await backend.recognize(str(wav_path), len(pcm) / BYTES_PER_SECOND)
+            wav_path.unlink(missing_ok=True)
+
+            # 把窗口内的时间戳换算成整段音频的时间
+            shifted = [
+                Utterance(text=u.text, start=round(u.start + offset, 3), end=round(u.end + offset, 3))
+                for u in utterances
+            ]
+            results[index] = shifted
+            if on_window:
+                await on_window(len(results), max(expected_windows, len(recognitions)), shifted)
+
+        feeder = asyncio.ensure_future(feed())
+        try:
+            index = 0
+            while True:
+                try:
+                    pcm = await process.stdout.readexactly(window_bytes)
+                except asyncio.IncompleteReadError as e:
+                    pcm = e.partial
+                if not pcm:
+                    break
+                recognitions.append(asyncio.ensure_future(recognize(index, pcm)))
+                index += 1
+                if len(pcm) < window_bytes:
+                    break
+
+            await feeder
+            return_code = await process.wait()
+            if return_code != 0:
+                raise Exception(f"ffmpeg exited with code {return_code}")
+
+            await asyncio.gather(*recognitions)
+
+        except BaseException:
+            feeder.cancel()
+            for task in recognitions:
+                task.cancel()
+            if process.returncode is None:
+                process.kill()
+                await process.wait()
+            await asyncio.gather(feeder, *recognitions, return_exceptions=True)
+            raise
+
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+        utterances = [u for i in sorted(results) for u in results[i]]
+        logger.info(f"Streaming ASR completed for {bvid}: {len(recognitions)} windows, {len(utterances)} utterances")
+        return utterances
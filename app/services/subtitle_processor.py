@@ -2,9 +2,10 @@
 字幕处理模块
 """
 import logging
-from typing import List, Dict
+from typing import List, Dict, Optional
 from datetime import timedelta
 from app.api.models import Utterance
+from app.services.transcript_codec import encode_utterances, decode_utterances
 
 logger = logging.getLogger(__name__)
 
@@ -100,6 +101,19 @@ class SubtitleProcessor:
             indent=2
         )
 
+    def to_binary(self, utterances: List[Utterance], compression: Optional[str] = None) -> bytes:
+        """
+        转换为紧凑的二进制格式（application/octet-stream）
+        格式见 app.services.transcript_codec；compression: None / "zlib" / "zstd"
+        """
+        return encode_utterances(utterances, compression)
+
+    def from_binary(self, data: bytes) -> List[Utterance]:
+        """
+        解析 to_binary 的输出
+        """
+        return decode_utterances(data)
+
     def _format_timestamp(self, seconds: float) -> str:
         """
         格式化时间戳
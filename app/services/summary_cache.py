@@ -0,0 +1,108 @@
+"""
+AI总结缓存模块
+按 (逐字稿sha256, 总结风格, 模型, 提示词和分段配置hash) 缓存 DeepSeek 的总结结果，
+SQLite持久化（多进程共享），超过 TTL 的条目失效，总大小超出预算时淘汰最久未访问的条目
+"""
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
+from app.core.config import settings, parse_size
+
+logger = logging.getLogger(__name__)
+
+
+class SummaryCache:
+    """SQLite总结缓存"""
+
+    def __init__(
+        self,
+        db_path: Optional[str] = None,
+        ttl: Optional[int] = None,
+        max_bytes: Optional[int] = None
+    ):
+        self.db_path = db_path or settings.SUMMARY_CACHE_DB_PATH
+        self.ttl = ttl if ttl is not None else settings.SUMMARY_CACHE_TTL
+        self.max_bytes = max_bytes if max_bytes is not None else parse_size(settings.SUMMARY_CACHE_MAX_SIZE)
+        Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
+        # sqlite3 连接不能跨线程使用，每个线程各自持有一个
+        self._local = threading.local()
+        with self._conn() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS summaries (
+                    cache_key TEXT PRIMARY KEY,
+                    result TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    created_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_summaries_accessed ON summaries(accessed_at)")
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def make_key(transcript: str, style: str, model: str, config: str) -> str:
+        """
+        缓存键：逐字稿内容、风格、模型或生成配置任一变化都不会命中旧结果
+        config: 影响结果的提示词和参数拼成的文本（DeepSeekService._generation_config）
+        """
+        transcript_hash = hashlib.sha256(transcript.encode("utf-8")).hexdigest()
+        prompt_hash = hashlib.sha256(config.encode("utf-8")).hexdigest()[:16]
+        return f"{transcript_hash}:{style}:{model}:{prompt_hash}"
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """命中且未过期时返回缓存的结果并刷新访问时间"""
+        now = time.time()
+        with self._conn() as conn:
+            row = conn.execute(
+                "UPDATE summaries SET accessed_at = ? WHERE cache_key = ? AND created_at >= ? RETURNING result",
+                (now, key, now - self.ttl)
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def put(self, key: str, result: Dict[str, Any]):
+        """写入结果，并按大小预算淘汰"""
+        now = time.time()
+        data = json.dumps(result, ensure_ascii=False)
+        with self._conn() as conn:
+            conn.execute(
+                """
+                INSERT OR REPLACE INTO summaries (cache_key, result, size, created_at, accessed_at)
+                VALUES (?, ?, ?, ?, ?)
+                """,
+                (key, data, len(data.encode("utf-8")), now, now)
+            )
+        self.evict()
+
+    def evict(self) -> int:
+        """删除过期条目；总大小超过预算时按最近访问时间淘汰，返回删除的条目数"""
+        with self._conn() as conn:
+            removed = conn.execute(
+                "DELETE FROM summaries WHERE created_at < ?", (time.time() - self.ttl,)
+            ).rowcount
+
+            excess = conn.execute("SELECT COALESCE(SUM(size), 0) FROM summaries").fetchone()[0] - self.max_bytes
+            if excess > 0:
+                evict = []
+                for key, size in conn.execute("SELECT cache_key, size FROM summaries ORDER BY accessed_at ASC"):
+                    if excess <= 0:
+                        break
+                    evict.append((key,))
+                    excess -= size
+                conn.executemany("DELETE FROM summaries WHERE cache_key = ?", evict)
+                removed += len(evict)
+        if removed:
+            logger.info(f"Summary cache evicted {removed} entries")
+        return removed
@@ -0,0 +1,70 @@
+"""
+逐字稿分块模块
+估算文本的token数，并按句子/字幕条边界把长逐字稿切成不超过token预算的块，
+供长视频的分段（map-reduce）总结使用
+"""
+import math
+import re
+from typing import List
+
+# 中日韩字符（含全角标点），DeepSeek 的分词大约 1 个汉字 ≈ 0.6 token
+_CJK_PATTERN = re.compile(r"[　-〿㐀-䶿一-鿿＀-￯]")
+CJK_TOKENS_PER_CHAR = 0.6
+# 其他字符（英文、数字、空白）大约 1 个字符 ≈ 0.3 token
+OTHER_TOKENS_PER_CHAR = 0.3
+
+# 纯文本逐字稿中句子之间的分隔：句末标点之后，或空格（txt 格式用空格连接各条字幕）
+_SENTENCE_BOUNDARY = re.compile(r"(?<=[。！？!?；;])|(?<= )")
+
+
+def estimate_tokens(text: str) -> int:
+    """按字符类型粗略估算token数（不依赖分词器，误差在10%~20%左右）"""
+    cjk = len(_CJK_PATTERN.findall(text))
+    return math.ceil(cjk * CJK_TOKENS_PER_CHAR + (len(text) - cjk) * OTHER_TOKENS_PER_CHAR)
+
+
+def split_units(transcript: str) -> List[str]:
+    """
+    把逐字稿拆成不可再分的最小单元（字幕条/句子），拼接回去与原文一致
+    - srt：空行分隔的字幕块
+    - 带换行的文本：每一行
+    - txt（空格连接的字幕）：句子或字幕条
+    """
+    if "\n\n" in transcript:
+        blocks = transcript.split("\n\n")
+        return [block + "\n\n" for block in blocks[:-1]] + [blocks[-1]]
+    if "\n" in transcript:
+        return transcript.splitlines(keepends=True)
+    return [unit for unit in _SENTENCE_BOUNDARY.split(transcript) if unit]
+
+
+def chunk_transcript(transcript: str, max_tokens: int) -> List[str]:
+    """
+    按边界贪心地把单元装进块，每块估算不超过 max_tokens
+    单个单元超过预算时（很长的一句话）才按字符硬切
+    """
+    chunks: List[str] = []
+    current: List[str] = []
+    current_tokens = 0
+
+    for unit in split_units(transcript):
+        tokens = estimate_tokens(unit)
+        if tokens > max_tokens:
+            # 先结束当前块，再把超长单元按比例切开
+            if current:
+                chunks.append("".join(current))
+                current, current_tokens = [], 0
+            pieces = math.ceil(tokens / max_tokens)
+            size = math.ceil(len(unit) / pieces)
+            chunks.extend(unit[i:i + size] for i in range(0, len(unit), size))
+            continue
+
+        if current and current_tokens + tokens > max_tokens:
+            chunks.append("".join(current))
+            current, current_tokens = [], 0
+        current.append(unit)
+        current_tokens += tokens
+
+    if current:
+        chunks.append("".join(current))
+    return [chunk for chunk in chunks if chunk.strip()]
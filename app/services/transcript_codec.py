@@ -0,0 +1,152 @@
+"""
+逐字稿二进制编码
+比JSON紧凑得多的句子列表编码，用于逐字稿存储和 application/octet-stream 输出:
+
+    头部（4字节）: b"BT" + 版本(1) + 压缩方式(0 不压缩 / 1 zlib / 2 zstd)
+    内容（按压缩方式整体压缩）:
+        varint 句子数 n
+        n 组时间戳: zigzag varint(开始时间 - 上一句开始时间), zigzag varint(结束时间 - 开始时间)，单位毫秒
+        n 个 varint 文本字节长度
+        所有句子的 UTF-8 文本依次拼接
+
+时间戳精确到毫秒。文本集中存放，压缩效果比逐句交错存放更好；
+zstd 需要安装 zstandard，未安装时 "zstd" 退化为 zlib
+"""
+import zlib
+from typing import List, Optional
+from app.api.models import Utterance
+from app.core.optional import is_installed
+
+MAGIC = b"BT"
+VERSION = 1
+MEDIA_TYPE = "application/octet-stream"
+
+COMPRESSION_NONE = 0
+COMPRESSION_ZLIB = 1
+COMPRESSION_ZSTD = 2
+_COMPRESSIONS = {None: COMPRESSION_NONE, "none": COMPRESSION_NONE, "zlib": COMPRESSION_ZLIB, "zstd": COMPRESSION_ZSTD}
+
+ZSTD_AVAILABLE = is_installed("zstandard")
+
+
+def _write_varint(out: bytearray, value: int):
+    while value > 0x7F:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _read_varint(data: bytes, pos: int):
+    result = 0
+    shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        result |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return result, pos
+        shift += 7
+
+
+def _zigzag(value: int) -> int:
+    return value << 1 if value >= 0 else (-value << 1) - 1
+
+
+def _unzigzag(value: int) -> int:
+    return value >> 1 if not value & 1 else -((value + 1) >> 1)
+
+
+def _compression_id(compression: Optional[str]) -> int:
+    if compression not in _COMPRESSIONS:
+        raise ValueError(f"Unknown compression: {compression}")
+    method = _COMPRESSIONS[compression]
+    if method == COMPRESSION_ZSTD and not ZSTD_AVAILABLE:
+        return COMPRESSION_ZLIB
+    return method
+
+
+def encode_utterances(utterances: List[Utterance], compression: Optional[str] = None) -> bytes:
+    """编码句子列表；compression: None / "none" / "zlib" / "zstd" """
+    method = _compression_id(compression)
+    texts = [u.text.encode("utf-8") for u in utterances]
+
+    body = bytearray()
+    _write_varint(body, len(utterances))
+    previous_start = 0
+    for u in utterances:
+        start = round(u.start * 1000)
+        end = round(u.end * 1000)
+        _write_varint(body, _zigzag(start - previous_start))
+        _write_varint(body, _zigzag(end - start))
+        previous_start = start
+    for text in texts:
+        _write_varint(body, len(text))
+    payload = bytes(body) + b"".join(texts)
+
+    if method == COMPRESSION_ZLIB:
+        payload = zlib.compress(payload, 6)
+    elif method == COMPRESSION_ZSTD:
+        import zstandard
+        payload = zstandard.ZstdCompressor(level=3).compress(payload)
+    return MAGIC + bytes((VERSION, method)) + payload
+
+
+def decode_utterances(data: bytes) -> List[Utterance]:
+    """解码 encode_utterances 的输出，格式不对时抛出 ValueError"""
+    if len(data) < 4 or data[:2] != MAGIC:
+        raise ValueError("Not a binary transcript")
+    if data[2] != VERSION:
+        raise ValueError(f"Unsupported binary transcript version: {data[2]}")
+
+    method = data[3]
+    payload = data[4:]
+    try:
+        if method == COMPRESSION_ZLIB:
+            payload = zlib.decompress(payload)
+        elif method == COMPRESSION_ZSTD:
+            payload = _zstd_decompress(payload)
+        elif method != COMPRESSION_NONE:
+            raise ValueError(f"Unknown compression id: {method}")
+
+        count, pos = _read_varint(payload, 0)
+        # 3 * count 个 varint 依次为各句的开始时间差、时长（按句交错）和文本长度
+        # 逐个调用 _read_varint 的开销比解码本身还大，这里内联展开
+        values = []
+        append = values.append
+        for _ in range(3 * count):
+            byte = payload[pos]
+            pos += 1
+            value = byte & 0x7F
+            shift = 7
+            while byte >= 0x80:
+                byte = payload[pos]
+                pos += 1
+                value |= (byte & 0x7F) << shift
+                shift += 7
+            append(value)
+
+        utterances = []
+        start = 0
+        for index in range(count):
+            start += _unzigzag(values[2 * index])
+            end = start + _unzigzag(values[2 * index + 1])
+            length = values[2 * count + index]
+            text = payload[pos:pos + length]
+            if len(text) != length:
+                raise ValueError("Truncated binary transcript")
+            pos += length
+            utterances.append(Utterance(text=text.decode("utf-8"), start=start / 1000, end=end / 1000))
+        return utterances
+    except (IndexError, UnicodeDecodeError, zlib.error) as e:
+        raise ValueError(f"Corrupt binary transcript: {str(e)}")
+
+
+def _zstd_decompress(payload: bytes) -> bytes:
+    if not ZSTD_AVAILABLE:
+        raise ValueError("Binary transcript is zstd-compressed but zstandard is not installed")
+    import zstandard
+    try:
+        # 压缩时写入了原始长度，一次性解压
+        return zstandard.ZstdDecompressor().decompress(payload)
+    except zstandard.ZstdError as e:
+        raise ValueError(f"Corrupt binary transcript: {str(e)}")
@@ -0,0 +1,209 @@
+"""
+逐字稿压缩模块
+在发送给大模型总结之前做本地清理：去掉语气词和口吃重复、合并相邻的近似重复字幕（滚动字幕、ASR重复识别），
+再把零碎的字幕条拼成句子，减少输入token数，让总结更快更便宜
+"""
+import json
+import re
+from dataclasses import dataclass, asdict
+from difflib import SequenceMatcher
+from typing import Dict, List
+from app.services.text_chunker import estimate_tokens, split_units
+
+# 单字语气词
+_FILLER_CHARS = "嗯啊呃额哦噢唔诶欸"
+# 中文标点和空白（语气词前后的边界）
+_BOUNDARY = r"，,。.！!？?、；;：:…~～\s"
+# 句末标点
+_SENTENCE_END = "。！？!?.…"
+
+# 独立出现的语气词（前后都是边界），如 "嗯，" "啊！"
+_STANDALONE_FILLER = re.compile(rf"(?:^|(?<=[{_BOUNDARY}]))[{_FILLER_CHARS}]+(?:[{_BOUNDARY}]+|$)")
+# 句首的语气词，如 "嗯今天我们"（"额" 常作词首，如 "额度" "额外"，只按独立语气词处理）
+_LEADING_FILLER = re.compile(r"^[嗯呃唔]+[，,、\s]*")
+# 后面带停顿的口头禅，如 "那个，" "就是说，"
+_PHRASE_FILLER = re.compile(rf"(?:^|(?<=[{_BOUNDARY}]))(?:那个|这个|就是说|然后呢|对吧|怎么说呢|你知道吗)[，,、]")
+# 英文语气词
+_ENGLISH_FILLER = re.compile(r"\b(?:u+m+|u+h+|erm)\b,?\s*", re.IGNORECASE)
+# 作插入语的 "you know"（句首或前面是逗号，后面跟逗号）；"Do you know the answer?" 中的不动
+_ENGLISH_PHRASE_FILLER = re.compile(r"(?:^|(?<=,)|(?<=, ))you know,\s*", re.IGNORECASE)
+# 口吃重复：同一个汉字连续出现3次及以上（"我我我"），2~4个汉字的词连续出现3次及以上（"就是就是就是"），
+# 常见口头禅连续出现2次及以上（"就是就是"）。只处理汉字，数字、字母和标点不动（"2000000" "www"），
+# 连说两遍的叠词（"研究研究" "看看"）保留
+_STUTTER_CHAR = re.compile(r"([一-鿿])\1{2,}")
+_STUTTER_WORD = re.compile(r"([一-鿿]{2,4})\1{2,}")
+_STUTTER_FILLER_WORD = re.compile(r"(就是|然后|那个|这个|所以|其实|但是)\1+")
+# 比较近似重复时忽略标点和空白
+_NORMALIZE = re.compile(rf"[{_BOUNDARY}\"'“”‘’《》（）()【】\[\]-]+")
+
+_CJK = re.compile(r"[一-鿿]")
+
+# 清理规则的版本：规则变化、压缩结果不同时递增（总结缓存键包含该版本）
+RULES_VERSION = 2
+
+
+@dataclass
+class CompactionReport:
+    """压缩统计"""
+    original_chars: int = 0
+    compacted_chars: int = 0
+    original_tokens: int = 0
+    compacted_tokens: int = 0
+    utterances: int = 0  # 原始字幕条数
+    sentences: int = 0  # 合并后的句子数
+    fillers_removed: int = 0  # 删除的语气词/口吃重复字符数
+    duplicates_removed: int = 0  # 合并掉的近似重复字幕条数
+
+    @property
+    def token_reduction(self) -> float:
+        """输入token减少的比例"""
+        if not self.original_tokens:
+            return 0.0
+        return 1 - self.compacted_tokens / self.original_tokens
+
+    def to_dict(self) -> Dict:
+        return {**asdict(self), "token_reduction": round(self.token_reduction, 4)}
+
+
+@dataclass
+class CompactionResult:
+    text: str
+    report: CompactionReport
+
+
+class TranscriptCompactor:
+    """逐字稿压缩器"""
+
+    def __init__(self, similarity: float = 0.85, max_sentence_chars: int = 120):
+        """
+        similarity: 相邻字幕的相似度不低于该值时视为重复，只保留较长的一条
+        max_sentence_chars: 合并句子的最大长度，超过后强制断句
+        """
+        self.similarity = similarity
+        self.max_sentence_chars = max_sentence_chars
+
+    def compact(self, transcript: str) -> CompactionResult:
+        """压缩逐字稿；压缩后token数没有减少时原样返回"""
+        report = CompactionReport(
+            original_chars=len(transcript),
+            original_tokens=estimate_tokens(transcript)
+        )
+
+        utterances = self.extract_utterances(transcript)
+        report.utterances = len(utterances)
+
+        cleaned = []
+        for text in utterances:
+            stripped = self.remove_fillers(text)
+            report.fillers_removed += len(text) - len(stripped)
+            cleaned.append(stripped)
+
+        deduplicated = self.remove_duplicates(cleaned)
+        report.duplicates_removed = len([u for u in cleaned if u]) - len(deduplicated)
+
+        # 拼句会补上逗号句号，字幕本来就很干净时可能反而更长，此时保留按条分隔的结果
+        sentences = self.merge_sentences(deduplicated)
+        text = "\n".join(sentences)
+        unmerged = " ".join(deduplicated)
+        if estimate_tokens(unmerged) < estimate_tokens(text):
+            sentences, text = deduplicated, unmerged
+        report.sentences = len(sentences)
+        report.compacted_chars = len(text)
+        report.compacted_tokens = estimate_tokens(text)
+
+        if report.compacted_tokens >= report.original_tokens:
+            report.compacted_chars = report.original_chars
+            report.compacted_tokens = report.original_tokens
+            return CompactionResult(text=transcript, report=report)
+        return CompactionResult(text=text, report=report)
+
+    def extract_utterances(self, transcript: str) -> List[str]:
+        """从 txt / srt / json 格式的逐字稿中取出各条字幕的文本"""
+        stripped = transcript.strip()
+        if stripped.startswith("["):
+            try:
+                items = json.loads(stripped)
+                return [str(item.get("text", "")) for item in items if isinstance(item, dict)]
+            except ValueError:
+                pass
+
+        if "-->" in transcript:
+            # srt：去掉序号行和时间轴行
+            return [
+                line.strip() for line in transcript.splitlines()
+                if line.strip() and "-->" not in line and not line.strip().isdigit()
+            ]
+
+        return [unit.strip() for unit in split_units(transcript) if unit.strip()]
+
+    def remove_fillers(self, text: str) -> str:
+        """去掉语气词、口头禅和口吃重复"""
+        text = _LEADING_FILLER.sub("", text)
+        text = _STANDALONE_FILLER.sub("", text)
+        text = _PHRASE_FILLER.sub("", text)
+        text = _ENGLISH_FILLER.sub("", text)
+        text = _ENGLISH_PHRASE_FILLER.sub("", text)
+        text = _STUTTER_CHAR.sub(r"\1", text)
+        text = _STUTTER_WORD.sub(r"\1", text)
+        text = _STUTTER_FILLER_WORD.sub(r"\1", text)
+        # 去掉删除语气词后残留在开头的标点
+        return text.lstrip("，,、；;：: ").strip()
+
+    def remove_duplicates(self, utterances: List[str]) -> List[str]:
+        """
+        合并相邻的近似重复字幕
+        - 完全相同、或一条是另一条的开头/结尾（滚动字幕）：保留较长的一条
+        - 相似度不低于 similarity：保留较长的一条
+        """
+        kept: List[str] = []
+        kept_norm: List[str] = []
+        for text in utterances:
+            norm = _NORMALIZE.sub("", text).lower()
+            if not norm:
+                continue
+            if kept_norm:
+                previous = kept_norm[-1]
+                if self._is_duplicate(previous, norm):
+                    if len(norm) > len(previous):
+                        kept[-1], kept_norm[-1] = text, norm
+                    continue
+            kept.append(text)
+            kept_norm.append(norm)
+        return kept
+
+    def _is_duplicate(self, a: str, b: str) -> bool:
+        if a == b:
+            return True
+        shorter, longer = (a, b) if len(a) <= len(b) else (b, a)
+        if len(shorter) >= 2 and (longer.startswith(shorter) or longer.endswith(shorter)):
+            return True
+        if len(shorter) < 6:
+            return False
+        matcher = SequenceMatcher(None, a, b, autojunk=False)
+        # quick_ratio 是 ratio 的上界，先用它排除大多数不相似的情况
+        return matcher.quick_ratio() >= self.similarity and matcher.ratio() >= self.similarity
+
+    def merge_sentences(self, utterances: List[str]) -> List[str]:
+        """把零碎的字幕条拼成句子：遇到句末标点或超过最大长度时断句"""
+        sentences: List[str] = []
+        buffer = ""
+        for text in utterances:
+            if buffer:
+                buffer += self._separator(buffer, text) + text
+            else:
+                buffer = text
+            if buffer[-1] in _SENTENCE_END or len(buffer) >= self.max_sentence_chars:
+                sentences.append(buffer)
+                buffer = ""
+        if buffer:
+            sentences.append(buffer)
+        return sentences
+
+    @staticmethod
+    def _separator(left: str, right: str) -> str:
+        if left[-1] in _SENTENCE_END or left[-1] in "，,、；;：:":
+            return ""
+        if _CJK.match(left[-1]) or _CJK.match(right[0]):
+            return "，"
+        return " "
+
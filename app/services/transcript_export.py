@@ -0,0 +1,149 @@
+"""
+逐字稿批量导出模块
+从逐字稿存储中逐条读出、边读边编码（GET /api/export），内存占用与导出的条目数无关:
+- ndjson: 每行一个视频（视频信息 + utterances）
+- zip: 每个视频一个 SRT/TXT 文件，ZIP 以数据描述符方式流式写出，不需要回写文件头
+- parquet / arrow: 每句话一行的列式文件（Parquet 或 Arrow IPC 流），
+  按 EXPORT_BATCH_ROWS 行一批写出行组/记录批次；需要安装 pyarrow
+"""
+import json
+import logging
+import time
+import zipfile
+from typing import Any, Dict, Iterable, Iterator
+from app.core.optional import is_installed
+from app.services.subtitle_processor import SubtitleProcessor
+
+logger = logging.getLogger(__name__)
+
+PYARROW_AVAILABLE = is_installed("pyarrow")
+
+# 列式导出每批（Parquet 行组 / Arrow 记录批次）的句子数
+EXPORT_BATCH_ROWS = 10000
+
+EXPORT_FORMATS = {
+    "ndjson": ("application/x-ndjson", "ndjson"),
+    "zip": ("application/zip", "zip"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+    "arrow": ("application/vnd.apache.arrow.stream", "arrow"),
+}
+
+
+class _ChunkBuffer:
+    """只追加的写入目标：编码器写入的字节由生成器分批取走"""
+
+    def __init__(self):
+        self._chunks = []
+        self.closed = False
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+class TranscriptExporter:
+    """逐字稿导出编码器"""
+
+    def __init__(self, subtitle_processor: SubtitleProcessor):
+        self.subtitle_processor = subtitle_processor
+
+    def export(self, export_format: str, entries: Iterable[Dict[str, Any]], file_format: str = "srt") -> Iterator[bytes]:
+        """
+        把 TranscriptStore.iter_entries() 的条目编码为 export_format，逐块产出字节
+        file_format: zip 中每个文件的格式（srt / txt）
+        """
+        started = time.monotonic()
+        count = 0
+
+        def counted():
+            nonlocal count
+            for entry in entries:
+                count += 1
+                yield entry
+
+        if export_format == "ndjson":
+            chunks = self._ndjson(counted())
+        elif export_format == "zip":
+            chunks = self._zip(counted(), file_format)
+        else:
+            chunks = self._columnar(counted(), export_format)
+        yield from chunks
+        logger.info(f"Exported {count} transcripts as {export_format} in {time.monotonic() - started:.1f}s")
+
+    def _ndjson(self, entries: Iterable[Dict[str, Any]]) -> Iterator[bytes]:
+        for entry in entries:
+            record = {**entry, "utterances": [u.model_dump() for u in entry["utterances"]]}
+            yield (json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8")
+
+    def _zip(self, entries: Iterable[Dict[str, Any]], file_format: str) -> Iterator[bytes]:
+        buffer = _ChunkBuffer()
+        # 写入目标不可 seek，zipfile 自动改用数据描述符
+        with zipfile.ZipFile(buffer, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+            for entry in entries:
+                info = zipfile.ZipInfo(
+                    f"{entry['bvid']}.{file_format}",
+                    date_time=time.localtime(entry["fetched_at"])[:6]
+                )
+                info.compress_type = zipfile.ZIP_DEFLATED
+                text = self.subtitle_processor.format_transcript(entry["utterances"], file_format)
+                archive.writestr(info, text.encode("utf-8"))
+                yield buffer.drain()
+        yield buffer.drain()
+
+    def _columnar(self, entries: Iterable[Dict[str, Any]], export_format: str) -> Iterator[bytes]:
+        import pyarrow as pa
+
+        schema = pa.schema([
+            ("bvid", pa.string()),
+            ("title", pa.string()),
+            ("owner", pa.string()),
+            ("method", pa.string()),
+            ("index", pa.int32()),
+            ("start", pa.float64()),
+            ("end", pa.float64()),
+            ("text", pa.string()),
+        ])
+        buffer = _ChunkBuffer()
+        if export_format == "parquet":
+            import pyarrow.parquet as pq
+            writer = pq.ParquetWriter(buffer, schema, compression="zstd")
+        else:
+            writer = pa.ipc.new_stream(buffer, schema)
+
+        columns = {name: [] for name in schema.names}
+
+        def flush_batch():
+            writer.write_batch(pa.RecordBatch.from_pydict(columns, schema=schema))
+            for values in columns.values():
+                values.clear()
+
+        try:
+            for entry in entries:
+                for index, u in enumerate(entry["utterances"]):
+                    columns["bvid"].append(entry["bvid"])
+                    columns["title"].append(entry["title"])
+                    columns["owner"].append(entry["owner"])
+                    columns["method"].append(entry["method"])
+                    columns["index"].append(index)
+                    columns["start"].append(u.start)
+                    columns["end"].append(u.end)
+                    columns["text"].append(u.text)
+                if len(columns["bvid"]) >= EXPORT_BATCH_ROWS:
+                    flush_batch()
+                    yield buffer.drain()
+            if columns["bvid"]:
+                flush_batch()
+        finally:
+            writer.close()
+        yield buffer.drain()
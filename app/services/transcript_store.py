@@ -0,0 +1,327 @@
+"""
+逐字稿存储模块
+按 bvid 保存已提取的逐字稿（字幕或ASR结果）和视频基本信息，SQLite持久化（多进程共享）。
+/api/extract 命中时不再请求B站接口；后台预取（app.services.prefetch）提前把常看的视频写进来。
+
+字幕条目同时保存字幕地址和 ETag/Last-Modified，过期后用条件请求重新验证
+（app.services.revalidation），未变化时只刷新有效期。
+每句话另存一行并建 FTS5 全文索引（trigram 分词，支持中文子串搜索），
+逐字稿更新时只增删有变化的行。
+句子列表以二进制格式（app.services.transcript_codec）保存，旧版本写入的JSON仍可读取
+"""
+import json
+import logging
+import sqlite3
+import threading
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+from app.api.models import Utterance
+from app.core.config import settings
+from app.services.transcript_codec import encode_utterances, decode_utterances
+
+logger = logging.getLogger(__name__)
+
+
+class TranscriptStore:
+    """SQLite逐字稿存储"""
+
+    def __init__(self, db_path: Optional[str] = None, ttl: Optional[int] = None, stale_ttl: Optional[int] = None):
+        """
+        ttl: 有效期（秒），过期的条目需要重新验证
+        stale_ttl: 过期后继续保留的时间（秒），超过后删除
+        """
+        self.db_path = db_path or settings.TRANSCRIPT_DB_PATH
+        self.ttl = ttl if ttl is not None else settings.TRANSCRIPT_CACHE_TTL
+        self.stale_ttl = stale_ttl if stale_ttl is not None else settings.TRANSCRIPT_STALE_TTL
+        Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
+        # sqlite3 连接不能跨线程使用，每个线程各自持有一个
+        self._local = threading.local()
+        with self._conn() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS transcripts (
+                    bvid TEXT PRIMARY KEY,
+                    cid INTEGER,
+                    title TEXT,
+                    duration INTEGER,
+                    owner TEXT,
+                    method TEXT NOT NULL,
+                    utterances BLOB NOT NULL,
+                    subtitle_url TEXT,
+                    validators TEXT NOT NULL DEFAULT '{}',
+                    fetched_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL
+                )
+            """)
+            # 兼容旧版本创建的表（没有后来增加的列）
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(transcripts)")}
+            if "subtitle_url" not in columns:
+                conn.execute("ALTER TABLE transcripts ADD COLUMN subtitle_url TEXT")
+                conn.execute("ALTER TABLE transcripts ADD COLUMN validators TEXT NOT NULL DEFAULT '{}'")
+            if "owner" not in columns:
+                conn.execute("ALTER TABLE transcripts ADD COLUMN owner TEXT")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_transcripts_fetched ON transcripts(fetched_at)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_transcripts_owner ON transcripts(owner)")
+        self.search_enabled = self._create_search_index()
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _create_search_index(self) -> bool:
+        """创建逐句表和全文索引（外部内容表，由触发器同步）；SQLite 不支持 FTS5/trigram 时返回 False"""
+        try:
+            with self._conn() as conn:
+                conn.execute("""
+                    CREATE TABLE IF NOT EXISTS transcript_lines (
+                        id INTEGER PRIMARY KEY,
+                        bvid TEXT NOT NULL,
+                        start REAL NOT NULL,
+                        end REAL NOT NULL,
+                        text TEXT NOT NULL
+                    )
+                """)
+                conn.execute("CREATE INDEX IF NOT EXISTS idx_transcript_lines_bvid ON transcript_lines(bvid)")
+                conn.execute("""
+                    CREATE VIRTUAL TABLE IF NOT EXISTS transcript_index USING fts5(
+                        text, content='transcript_lines', content_rowid='id', tokenize='trigram'
+                    )
+                """)
+                conn.execute("""
+                    CREATE TRIGGER IF NOT EXISTS transcript_lines_ai AFTER INSERT ON transcript_lines BEGIN
+                        INSERT INTO transcript_index(rowid, text) VALUES (new.id, new.text);
+                    END
+                """)
+                conn.execute("""
+                    CREATE TRIGGER IF NOT EXISTS transcript_lines_ad AFTER DELETE ON transcript_lines BEGIN
+                        INSERT INTO transcript_index(transcript_index, rowid, text) VALUES ('delete', old.id, old.text);
+                    END
+                """)
+            return True
+        except sqlite3.OperationalError as e:
+            logger.warning(f"Transcript search disabled, SQLite lacks FTS5 trigram support: {str(e)}")
+            return False
+
+    def get(self, bvid: str) -> Optional[Dict[str, Any]]:
+        """
+        返回视频信息和逐字稿（utterances 为 Utterance 列表），并刷新访问时间；
+        超过有效期但仍在保留期内的条目 stale 为 True，需要重新验证后再使用
+        """
+        now = time.time()
+        with self._conn() as conn:
+            row = conn.execute(
+                """
+                UPDATE transcripts SET accessed_at = ?
+                WHERE bvid = ? AND fetched_at >= ?
+                RETURNING cid, title, duration, owner, method, utterances, subtitle_url, validators, fetched_at
+                """,
+                (now, bvid, now - self.ttl - self.stale_ttl)
+            ).fetchone()
+        if row is None:
+            return None
+        cid, title, duration, owner, method, utterances, subtitle_url, validators, fetched_at = row
+        return {
+            "bvid": bvid,
+            "cid": cid,
+            "title": title,
+            "duration": duration,
+            "owner": owner,
+            "method": method,
+            "utterances": _decode(utterances),
+            "subtitle_url": subtitle_url,
+            "validators": json.loads(validators),
+            "fetched_at": fetched_at,
+            "stale": fetched_at < now - self.ttl,
+        }
+
+    def contains(self, bvid: str) -> bool:
+        """是否已有未过期的逐字稿（不解码内容、不刷新访问时间）"""
+        row = self._conn().execute(
+            "SELECT 1 FROM transcripts WHERE bvid = ? AND fetched_at >= ?",
+            (bvid, time.time() - self.ttl)
+        ).fetchone()
+        return row is not None
+
+    def put(
+        self,
+        bvid: str,
+        cid: Optional[int],
+        title: Optional[str],
+        duration: Optional[int],
+        method: str,
+        utterances: List[Utterance],
+        subtitle_url: Optional[str] = None,
+        validators: Optional[Dict[str, Dict[str, str]]] = None,
+        owner: Optional[str] = None
+    ):
+        """
+        写入（覆盖）一个视频的逐字稿
+        subtitle_url / validators: 字幕地址和视频信息、字幕的 ETag/Last-Modified，用于之后重新验证
+        owner: UP主名称，用于按UP主导出
+        """
+        now = time.time()
+        data = encode_utterances(utterances, settings.TRANSCRIPT_COMPRESSION)
+        with self._conn() as conn:
+            conn.execute(
+                """
+                INSERT OR REPLACE INTO transcripts
+                    (bvid, cid, title, duration, owner, method, utterances, subtitle_url, validators,
+                     fetched_at, accessed_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                (bvid, cid, title, duration, owner, method, data, subtitle_url,
+                 json.dumps(validators or {}), now, now)
+            )
+            if self.search_enabled:
+                self._reindex(conn, bvid, utterances)
+
+    def _reindex(self, conn: sqlite3.Connection, bvid: str, utterances: List[Utterance]):
+        """只删除不再存在的句子、插入新增的句子，未变化的句子保留原有索引"""
+        existing = defaultdict(list)
+        for line_id, start, end, text in conn.execute(
+            "SELECT id, start, end, text FROM transcript_lines WHERE bvid = ?", (bvid,)
+        ):
+            existing[(start, end, text)].append(line_id)
+
+        added = []
+        for u in utterances:
+            # 和二进制编码一致，时间精确到毫秒
+            start, end = round(u.start, 3), round(u.end, 3)
+            ids = existing.get((start, end, u.text))
+            if ids:
+                ids.pop()
+            else:
+                added.append((bvid, start, end, u.text))
+        removed = [(line_id,) for ids in existing.values() for line_id in ids]
+
+        conn.executemany("DELETE FROM transcript_lines WHERE id = ?", removed)
+        conn.executemany("INSERT INTO transcript_lines (bvid, start, end, text) VALUES (?, ?, ?, ?)", added)
+        if removed or added:
+            logger.debug(f"Reindexed {bvid}: -{len(removed)} +{len(added)} lines")
+
+    def mark_validated(
+        self,
+        bvid: str,
+        validators: Dict[str, Dict[str, str]],
+        title: Optional[str] = None,
+        duration: Optional[int] = None
+    ) -> bool:
+        """重新验证后内容未变化：刷新有效期和验证信息（视频信息有更新时一并写入）"""
+        with self._conn() as conn:
+            updated = conn.execute(
+                """
+                UPDATE transcripts
+                SET fetched_at = ?, validators = ?, title = COALESCE(?, title), duration = COALESCE(?, duration)
+                WHERE bvid = ?
+                """,
+                (time.time(), json.dumps(validators), title, duration, bvid)
+            ).rowcount
+        return updated > 0
+
+    def search(self, query: str, limit: int = 20) -> List[Dict[str, Any]]:
+        """全文搜索逐字稿中的句子，返回所在视频和时间点"""
+        if not self.search_enabled or not query.strip():
+            return []
+        query = query.strip()
+        if len(query) >= 3:
+            # trigram 分词下按短语匹配即子串匹配
+            condition = "transcript_index MATCH ?"
+            pattern = '"' + query.replace('"', '""') + '"'
+            order = "transcript_index.rank"
+        else:
+            # 不足3个字符无法使用 trigram 索引，退化为扫描
+            condition = "l.text LIKE ? ESCAPE '\\'"
+            pattern = "%" + query.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+            order = "l.id"
+        rows = self._conn().execute(
+            f"""
+            SELECT l.bvid, t.title, l.start, l.end, l.text
+            FROM transcript_index
+            JOIN transcript_lines l ON l.id = transcript_index.rowid
+            JOIN transcripts t ON t.bvid = l.bvid
+            WHERE {condition}
+            ORDER BY {order}
+            LIMIT ?
+            """,
+            (pattern, limit)
+        ).fetchall()
+        return [
+            {"bvid": bvid, "title": title, "start": start, "end": end, "text": text}
+            for bvid, title, start, end, text in rows
+        ]
+
+    def iter_entries(
+        self,
+        owner: Optional[str] = None,
+        method: Optional[str] = None,
+        since: Optional[float] = None,
+        until: Optional[float] = None,
+        limit: Optional[int] = None
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        按条件逐条读出逐字稿（按提取时间排序，不刷新访问时间），用于批量导出
+        since / until: 提取时间范围（时间戳，左闭右开）
+
+        使用单独的连接并逐行读取游标，内存占用与条目总数无关；
+        生成器可能在不同线程中被推进（Starlette 在线程池里迭代同步生成器），连接不限定线程
+        """
+        conditions, params = [], []
+        for column, op, value in (
+            ("owner", "=", owner), ("method", "=", method), ("fetched_at", ">=", since), ("fetched_at", "<", until)
+        ):
+            if value is not None:
+                conditions.append(f"{column} {op} ?")
+                params.append(value)
+        sql = "SELECT bvid, cid, title, duration, owner, method, utterances, fetched_at FROM transcripts"
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        sql += " ORDER BY fetched_at"
+        if limit:
+            sql += " LIMIT ?"
+            params.append(limit)
+
+        conn = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False)
+        try:
+            for bvid, cid, title, duration, owner, method, utterances, fetched_at in conn.execute(sql, params):
+                yield {
+                    "bvid": bvid,
+                    "cid": cid,
+                    "title": title,
+                    "duration": duration,
+                    "owner": owner,
+                    "method": method,
+                    "utterances": _decode(utterances),
+                    "fetched_at": fetched_at,
+                }
+        finally:
+            conn.close()
+
+    def evict(self) -> int:
+        """删除超过保留期的条目（连同搜索索引），返回删除的条目数"""
+        deadline = time.time() - self.ttl - self.stale_ttl
+        with self._conn() as conn:
+            if self.search_enabled:
+                conn.execute(
+                    "DELETE FROM transcript_lines WHERE bvid IN (SELECT bvid FROM transcripts WHERE fetched_at < ?)",
+                    (deadline,)
+                )
+            removed = conn.execute("DELETE FROM transcripts WHERE fetched_at < ?", (deadline,)).rowcount
+        if removed:
+            logger.info(f"Transcript store evicted {removed} entries")
+        return removed
+
+    def count(self) -> int:
+        return self._conn().execute("SELECT COUNT(*) FROM transcripts").fetchone()[0]
+
+
+def _decode(value) -> List[Utterance]:
+    # 旧版本以JSON文本保存
+    if isinstance(value, str):
+        return [Utterance(**u) for u in json.loads(value)]
+    return decode_utterances(value)
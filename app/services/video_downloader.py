@@ -3,17 +3,18 @@
 """
 import logging
 import asyncio
+import os
+import threading
 from pathlib import Path
-from typing import Optional
+from typing import Optional, List, Dict, AsyncIterator
 from app.core.config import settings
-
-# Playwright 是可选依赖
-try:
-    from playwright.async_api import async_playwright, TimeoutError as PlaywrightTimeoutError
-    PLAYWRIGHT_AVAILABLE = True
-except ImportError:
-    PLAYWRIGHT_AVAILABLE = False
-    PlaywrightTimeoutError = Exception  # 占位符
+from app.core.http import get_http_session
+from app.core.metrics import track_stage, AUDIO_CACHE_REQUESTS
+from app.core import tracing
+from app.services.bilibili_api import BilibiliAPI
+from app.services.audio_cache import AudioCache
+from app.services.resumable_download import ResumableDownloader
+from app.services.browser_pool import BrowserPool, PLAYWRIGHT_AVAILABLE
 
 logger = logging.getLogger(__name__)
 
@@ -24,38 +25,97 @@ class VideoDownloader:
     def __init__(self):
         self.download_dir = Path(settings.TEMP_DIR)
         self.download_dir.mkdir(parents=True, exist_ok=True)
-
-    async def download_audio_only(self, video_url: str) -> Optional[str]:
+        self.bilibili_api = BilibiliAPI()
+        self.cache = AudioCache(str(self.download_dir))
+        self.resumable = ResumableDownloader()
+        self.browser_pool = BrowserPool()
+
+    async def download_audio_only(
+        self,
+        video_url: str,
+        bvid: Optional[str] = None,
+        cid: Optional[int] = None
+    ) -> Optional[str]:
         """
         优先下载音频文件
-        使用 yt-dlp 直接下载（更可靠）
+        有 bvid/cid 时先查音频缓存，未命中再直接从 playurl 下载DASH音频流（不转码），
+        失败再用 yt-dlp
         """
         try:
             logger.info(f"Starting audio download for: {video_url}")
 
-            # 优先使用 yt-dlp（更可靠）
-            audio_path = await self._download_with_ytdlp(video_url)
-
-            if audio_path:
-                logger.info(f"Audio downloaded successfully: {audio_path}")
+            if not (bvid and cid):
+                return await self._download_any(video_url)
+
+            # 同一个音频只下载一次，并发请求等待后直接命中缓存
+            async with self.cache.lock(bvid, cid):
+                cached_path = self.cache.lookup(bvid, cid)
+                if cached_path:
+                    logger.info(f"Audio cache hit: {cached_path}")
+                    AUDIO_CACHE_REQUESTS.inc(result="hit")
+                    tracing.mark("audio_cache", hit=True)
+                    return cached_path
+                AUDIO_CACHE_REQUESTS.inc(result="miss")
+                tracing.mark("audio_cache", hit=False)
+
+                try:
+                    audio_path = await self._download_any(video_url, bvid, cid)
+                except asyncio.CancelledError:
+                    # 任务被取消：不保留续传数据
+                    self.cache.discard_partial(bvid, cid)
+                    raise
+                if audio_path and not self.cache.store(audio_path):
+                    return None
                 return audio_path
 
-            # 备选：使用 Playwright 自动化 snapany
-            if PLAYWRIGHT_AVAILABLE:
-                logger.info("yt-dlp failed, trying snapany...")
-                audio_path = await self._download_with_snapany(video_url)
-                if audio_path:
-                    logger.info(f"Audio downloaded successfully via snapany: {audio_path}")
-                    return audio_path
-
-            logger.error("All download methods failed")
-            return None
-
         except Exception as e:
             logger.error(f"Error downloading audio: {str(e)}", exc_info=True)
             return None
 
-    async def _download_with_ytdlp(self, video_url: str) -> Optional[str]:
+    async def _download_any(
+        self,
+        video_url: str,
+        bvid: Optional[str] = None,
+        cid: Optional[int] = None
+    ) -> Optional[str]:
+        """依次尝试各种下载方式"""
+        # 优先直接下载DASH音频流（最快，无需转码）
+        if bvid and cid:
+            with track_stage("dash_download") as stage:
+                audio_path = await self._download_with_bilibili_api(bvid, cid)
+                if not audio_path:
+                    stage.fail("no_audio")
+            if audio_path:
+                logger.info(f"Audio downloaded successfully via playurl: {audio_path}")
+                return audio_path
+
+        # 其次使用 yt-dlp
+        output_path = self.cache.path_for(bvid, cid, ".m4a") if bvid and cid else None
+        with track_stage("ytdlp_download") as stage:
+            audio_path = await self._download_with_ytdlp(video_url, output_path)
+            if not audio_path:
+                stage.fail("no_audio")
+
+        if audio_path:
+            logger.info(f"Audio downloaded successfully: {audio_path}")
+            return audio_path
+
+        # 备选：使用 Playwright 自动化 snapany
+        if PLAYWRIGHT_AVAILABLE:
+            logger.info("yt-dlp failed, trying snapany...")
+            output_path = self.cache.path_for(bvid, cid, ".mp3") if bvid and cid else None
+            with track_stage("snapany_download") as stage:
+                audio_path = await self._download_with_snapany(video_url, output_path)
+                if not audio_path:
+                    stage.fail("no_audio")
+            if audio_path:
+                logger.info(f"Audio downloaded successfully via snapany: {audio_path}")
+                return audio_path
+
+        logger.error("All download methods failed")
+        return None
+
+    async def _download_with_ytdlp(self, video_url: str, output_path: Optional[Path] = None) -> Optional[str]:
         """
         使用 yt-dlp 直接下载音频
         这是最可靠的方法，支持 B站
@@ -65,19 +125,22 @@ class VideoDownloader:
             import hashlib
 
             # 生成唯一文件名
-            file_hash = hashlib.md5(video_url.encode()).hexdigest()
-            output_path = self.download_dir / f"{file_hash}.m4a"
+            if output_path is None:
+                file_hash = hashlib.md5(video_url.encode()).hexdigest()
+                output_path = self.download_dir / f"{file_hash}.m4a"
 
+            # 不做 FFmpegExtractAudio 后处理：B站的 bestaudio 本身就是 m4a 音频流，
+            # 解码器可以直接读取，重新封装/转码只会浪费时间
             ydl_opts = {
                 'format': 'bestaudio/best',
                 'outtmpl': str(output_path),
                 'quiet': True,
                 'no_warnings': True,
-                'extract_audio': True,
-                'postprocessors': [{
-                    'key': 'FFmpegExtractAudio',
-                    'preferredcodec': 'm4a',
-                }],
+                'noprogress': True,
+                # 失败后保留 .part 文件，下次从断点继续
+                'continuedl': True,
+                'retries': settings.MAX_RETRY,
+                'fragment_retries': settings.MAX_RETRY,
             }
 
             logger.info(f"Downloading with yt-dlp: {video_url}")
@@ -86,11 +149,24 @@ class VideoDownloader:
             import asyncio
             loop = asyncio.get_event_loop()
 
+            # 任务被取消时，由进度回调在下载线程里中止 yt-dlp
+            cancelled = threading.Event()
+
+            def check_cancelled(_progress):
+                if cancelled.is_set():
+                    raise yt_dlp.utils.DownloadCancelled("task cancelled")
+
+            ydl_opts['progress_hooks'] = [check_cancelled]
+
             def download():
                 with yt_dlp.YoutubeDL(ydl_opts) as ydl:
                     ydl.download([video_url])
 
-            await loop.run_in_executor(None, download)
+            try:
+                await loop.run_in_executor(None, download)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
 
             if output_path.exists():
                 logger.info(f"yt-dlp download successful: {output_path}")
@@ -106,16 +182,18 @@ class VideoDownloader:
             logger.error(f"yt-dlp download error: {str(e)}", exc_info=True)
             return None
 
-    async def _download_with_snapany(self, video_url: str) -> Optional[str]:
+    async def _download_with_snapany(self, video_url: str, output_path: Optional[Path] = None) -> Optional[str]:
         """
         使用Playwright自动化snapany网站下载
         网站: https://snapany.com/zh/bilibili
         """
+        # 只有安装了 Playwright 才会走到这里
+        from playwright.async_api import TimeoutError as PlaywrightTimeoutError
+
         try:
-            async with async_playwright() as p:
-                # 启动浏览器（无头模式）
-                browser = await p.chromium.launch(headless=True)
-                page = await browser.new_page()
+            # 从浏览器池借一个独立上下文，只在页面操作期间占用浏览器
+            async with self.browser_pool.context() as context:
+                page = await context.new_page()
 
                 # 访问snapany
                 await page.goto("https://snapany.com/zh/bilibili", timeout=30000)
@@ -137,23 +215,18 @@ class VideoDownloader:
                 # 获取下载链接
                 download_link = await page.locator('.download-link').get_attribute('href')
 
-                if download_link:
-                    # 下载文件
-                    download_path = self.download_dir / f"{hash(video_url)}.mp3"
-
-                    # 使用aiohttp下载
-                    import aiohttp
-                    async with aiohttp.ClientSession() as session:
-                        async with session.get(download_link) as response:
-                            if response.status == 200:
-                                with open(download_path, 'wb') as f:
-                                    f.write(await response.read())
+            if not download_link:
+                return None
 
-                                await browser.close()
-                                return str(download_path)
+            # 下载文件
+            if output_path is None:
+                import hashlib
+                file_hash = hashlib.md5(video_url.encode()).hexdigest()
+                output_path = self.download_dir / f"{file_hash}.mp3"
 
-                await browser.close()
-                return None
+            # 分块流式写盘，支持断点续传，完成后才改名为最终文件
+            await self.resumable.fetch(download_link, output_path, max_size=self.cache.max_file_bytes)
+            return str(output_path)
 
         except PlaywrightTimeoutError:
             logger.error("Playwright timeout while downloading")
@@ -162,23 +235,136 @@ class VideoDownloader:
             logger.error(f"Error in snapany download: {str(e)}", exc_info=True)
             return None
 
-    async def _download_with_bilibili_api(self, video_url: str) -> Optional[str]:
+    async def _download_with_bilibili_api(self, bvid: str, cid: int) -> Optional[str]:
         """
-        直接使用B站API下载（备选方案）
-        需要处理鉴权和防盗链
+        直接使用B站playurl接口下载DASH音频流
+        选择满足最低码率要求的最小音频流，并行Range分段下载，
+        得到的 m4s 直接交给解码器，不做转码
         """
-        # TODO: 实现B站API直接下载
-        logger.warning("Direct Bilibili API download not implemented yet")
-        return None
+        try:
+            streams = await self.bilibili_api.get_audio_streams(bvid, cid)
+            if not streams:
+                logger.warning(f"No DASH audio stream found for {bvid}")
+                return None
+
+            stream = self._select_audio_stream(streams)
+            output_path = self.cache.path_for(bvid, cid, ".m4s")
+
+            logger.info(
+                f"Downloading DASH audio {stream['id']} "
+                f"({stream['bandwidth'] // 1000}kbps) for {bvid}"
+            )
+
+            for url in [stream["url"]] + list(stream["backup_urls"]):
+                try:
+                    await self.resumable.fetch(
+                        url, output_path, self.bilibili_api.headers,
+                        max_size=self.cache.max_file_bytes
+                    )
+                    return str(output_path)
+                except Exception as e:
+                    logger.warning(f"DASH download failed from {url}: {str(e)}")
+
+            return None
+
+        except Exception as e:
+            logger.error(f"Direct Bilibili API download error: {str(e)}", exc_info=True)
+            return None
+
+    def _select_audio_stream(self, streams: List[Dict]) -> Dict:
+        """
+        选择音频流
+        ASR不需要高码率：取满足最低码率的最小流，都不满足时取码率最高的
+        """
+        adequate = [s for s in streams if s["bandwidth"] >= settings.DASH_AUDIO_MIN_BANDWIDTH]
+        if adequate:
+            return min(adequate, key=lambda s: s["bandwidth"])
+        return max(streams, key=lambda s: s["bandwidth"])
+
+    async def stream_audio(
+        self,
+        bvid: str,
+        cid: int,
+        tee_path: Optional[Path] = None
+    ) -> AsyncIterator[bytes]:
+        """
+        边下载边按顺序产出DASH音频字节流
+        分段仍然并行下载，但最多提前 DOWNLOAD_CONCURRENCY 段，内存占用有上限；
+        指定 tee_path 时同时把完整音频落盘，供之后复用
+        """
+        streams = await self.bilibili_api.get_audio_streams(bvid, cid)
+        if not streams:
+            raise Exception(f"No DASH audio stream found for {bvid}")
+
+        stream = self._select_audio_stream(streams)
+        url = stream["url"]
+        headers = self.bilibili_api.headers
+        session = get_http_session()
+
+        part_path = tee_path.with_name(tee_path.name + ".part") if tee_path else None
+        tee = open(part_path, "wb") if part_path else None
+
+        async def fetch(start: int, end: int) -> bytes:
+            range_headers = {**headers, "Range": f"bytes={start}-{end}"}
+            async with session.get(url, headers=range_headers) as response:
+                if response.status != 206:
+                    raise Exception(f"Range request not honored: HTTP {response.status}")
+                data = await response.read()
+                if len(data) != end - start + 1:
+                    raise Exception(f"Incomplete segment {start}-{end}: got {len(data)} bytes")
+                return data
+
+        pending: List[asyncio.Future] = []
+        try:
+            total, _ = await self.resumable.probe(url, headers)
+            if total is None:
+                async with session.get(url, headers=headers) as response:
+                    if response.status != 200:
+                        raise Exception(f"HTTP error: {response.status}")
+                    async for chunk in response.content.iter_chunked(64 * 1024):
+                        if tee:
+                            tee.write(chunk)
+                        yield chunk
+            else:
+                segment_size = settings.DOWNLOAD_SEGMENT_SIZE
+                ranges = [
+                    (start, min(start + segment_size, total) - 1)
+                    for start in range(0, total, segment_size)
+                ]
+                next_index = 0
+                while next_index < len(ranges) or pending:
+                    # 保持最多 DOWNLOAD_CONCURRENCY 个分段在下载中
+                    while next_index < len(ranges) and len(pending) < settings.DOWNLOAD_CONCURRENCY:
+                        pending.append(asyncio.ensure_future(fetch(*ranges[next_index])))
+                        next_index += 1
+                    data = await pending.pop(0)
+                    if tee:
+                        tee.write(data)
+                    yield data
+
+            if tee:
+                tee.close()
+                os.replace(part_path, tee_path)
+                tee = None
+
+        finally:
+            for task in pending:
+                task.cancel()
+            if tee:
+                tee.close()
+                part_path.unlink(missing_ok=True)
+
+    async def close(self):
+        """释放下载器持有的资源（浏览器池）"""
+        await self.browser_pool.close()
 
     def cleanup_temp_files(self):
         """
         清理临时文件
+        只删除没有被使用的缓存音频
         """
         try:
-            for file in self.download_dir.glob("*"):
-                if file.is_file():
-                    file.unlink()
+            self.cache.clear()
             logger.info("Temp files cleaned up")
         except Exception as e:
             logger.error(f"Error cleaning up temp files: {str(e)}")
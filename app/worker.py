@@ -0,0 +1,148 @@
+"""
+ASR worker 进程
+从本地任务队列领取ASR任务执行，进度和结果写回共享的任务存储。
+同一台机器上可以启动多个worker，ASR吞吐与Web层独立扩展。
+队列和任务存储是WAL模式的SQLite（依赖同一主机上的共享内存），只支持与API进程在同一台机器上运行，
+不能放在NFS等网络/共享文件系统上供多台机器使用
+
+用法:
+    python -m app.worker [--concurrency N]
+"""
+import argparse
+import asyncio
+import logging
+import os
+import signal
+import socket
+from pathlib import Path
+from typing import Optional, Set
+from app.core.config import settings
+from app.core.logger import setup_logging
+from app.core.http import close_http_session
+from app.core.job_queue import Job, JobQueue
+from app.core.task_store import create_task_store, run_sweeper
+from app.services.asr_task import ASRTaskRunner
+
+logger = logging.getLogger(__name__)
+
+
+class ASRWorker:
+    """ASR worker：领取任务、续约、执行"""
+
+    def __init__(self, concurrency: Optional[int] = None):
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self.concurrency = max(1, concurrency or settings.WORKER_CONCURRENCY)
+        self.task_store = create_task_store()
+        self.job_queue = JobQueue()
+        self.runner = ASRTaskRunner(self.task_store)
+        self._stopping = asyncio.Event()
+        self._active: Set[asyncio.Task] = set()
+
+    def stop(self):
+        """停止领取新任务，正在执行的任务完成后退出"""
+        if not self._stopping.is_set():
+            logger.info(f"Worker {self.worker_id} stopping, waiting for {len(self._active)} running job(s)")
+            self._stopping.set()
+
+    async def run(self):
+        logger.info(f"Worker {self.worker_id} started (concurrency={self.concurrency})")
+        if not self.runner.asr_engine.is_available():
+            logger.warning("No ASR backend available, jobs will fail until one is installed")
+
+        loop = asyncio.get_running_loop()
+        try:
+            while not self._stopping.is_set():
+                if len(self._active) >= self.concurrency:
+                    await asyncio.wait(self._active, return_when=asyncio.FIRST_COMPLETED)
+                    continue
+
+                await loop.run_in_executor(None, self._fail_exhausted)
+                job = await loop.run_in_executor(None, self.job_queue.claim, self.worker_id)
+                if job is None:
+                    try:
+                        await asyncio.wait_for(self._stopping.wait(), settings.WORKER_POLL_INTERVAL)
+                    except asyncio.TimeoutError:
+                        pass
+                    continue
+
+                task = asyncio.create_task(self._process(job))
+                self._active.add(task)
+                task.add_done_callback(self._active.discard)
+
+            if self._active:
+                await asyncio.gather(*self._active, return_exceptions=True)
+        finally:
+            await self.runner.video_downloader.close()
+            await close_http_session()
+            logger.info(f"Worker {self.worker_id} stopped")
+
+    async def _process(self, job: Job):
+        logger.info(f"Worker {self.worker_id} picked job {job.job_id} (task {job.task_id})")
+        work = asyncio.create_task(self.runner.run(**job.payload))
+        heartbeat = asyncio.create_task(self._heartbeat(job))
+        lease_lost = False
+        try:
+            await asyncio.wait((work, heartbeat), return_when=asyncio.FIRST_COMPLETED)
+            if not work.done():
+                # 租约已被其他worker接手：立即中止，进度和结果交给新的worker写
+                lease_lost = True
+                logger.warning(f"Lease of job {job.job_id} lost, aborting task {job.task_id}")
+                work.cancel()
+                await asyncio.gather(work, return_exceptions=True)
+            else:
+                await work
+        finally:
+            work.cancel()
+            heartbeat.cancel()
+            if not lease_lost:
+                await asyncio.to_thread(self.job_queue.finish, job.job_id, self.worker_id)
+
+    async def _heartbeat(self, job: Job):
+        """每 1/3 租约时长续约一次，续约失败（租约已被其他worker接手）时返回"""
+        interval = max(1.0, settings.WORKER_LEASE_SECONDS / 3)
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(interval)
+            renewed = await loop.run_in_executor(None, self.job_queue.heartbeat, job.job_id, self.worker_id)
+            if not renewed:
+                return
+
+    def _fail_exhausted(self):
+        """重试次数用尽的任务（执行它的worker反复崩溃）标记为失败"""
+        for task_id in self.job_queue.reap_exhausted():
+            logger.error(f"Task {task_id} abandoned after {self.job_queue.max_attempts} attempts")
+            self.task_store.update(
+                task_id,
+                status="failed",
+                progress=0,
+                message="处理失败: ASR worker 多次异常退出"
+            )
+
+
+async def _main(concurrency: Optional[int]):
+    Path(settings.TEMP_DIR).mkdir(parents=True, exist_ok=True)
+    worker = ASRWorker(concurrency)
+
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, worker.stop)
+
+    # 只有worker运行时（API在其他机器上），同样需要清理过期任务
+    sweeper = asyncio.create_task(run_sweeper(worker.task_store))
+    try:
+        await worker.run()
+    finally:
+        sweeper.cancel()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ASR worker")
+    parser.add_argument("--concurrency", type=int, default=None, help="同时处理的ASR任务数")
+    args = parser.parse_args()
+
+    setup_logging()
+    asyncio.run(_main(args.concurrency))
+
+
+if __name__ == "__main__":
+    main()
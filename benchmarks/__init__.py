@@ -0,0 +1,4 @@
+"""
+性能基准测试
+在项目根目录运行: python -m benchmarks.<脚本名>
+"""
@@ -0,0 +1,99 @@
+"""
+ASR流程离线压测
+
+使用桩ASR引擎（ASR_PROVIDER=stub）跑 识别→格式化 流程，
+不需要必剪、模型权重或网络，可用于压测和 cProfile 分析。
+
+用法:
+    python -m benchmarks.bench_asr_stub --jobs 8 --concurrency 4 --duration 600 --speed 20
+    python -m benchmarks.bench_asr_stub --profile
+"""
+import argparse
+import asyncio
+import cProfile
+import json
+import pstats
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+from app.core.config import settings
+from app.services.asr_engine import ASREngine
+from app.services.subtitle_processor import SubtitleProcessor
+
+
+def make_fake_audio(directory: Path, index: int, duration: float) -> Path:
+    """按桩引擎的码率估算生成指定时长的伪音频文件（内容确定）"""
+    path = directory / f"fake_{index}.m4a"
+    size = int(duration * settings.ASR_STUB_BYTES_PER_SECOND)
+    block = (f"bench-{index}-".encode() * 4096)[:65536]
+    with open(path, "wb") as f:
+        while size > 0:
+            f.write(block[:size])
+            size -= len(block)
+    return path
+
+
+async def run_job(engine: ASREngine, processor: SubtitleProcessor, audio_path: Path, output_format: str) -> float:
+    started = time.perf_counter()
+    utterances = await engine.recognize(str(audio_path))
+    processor.format_transcript(utterances, output_format)
+    return time.perf_counter() - started
+
+
+async def run(args) -> dict:
+    settings.ASR_STUB_SPEED = args.speed
+    engine = ASREngine("stub")
+    processor = SubtitleProcessor()
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        files = [make_fake_audio(Path(tmp), i, args.duration) for i in range(args.jobs)]
+
+        async def bounded(path: Path) -> float:
+            async with semaphore:
+                return await run_job(engine, processor, path, args.format)
+
+        started = time.perf_counter()
+        latencies = await asyncio.gather(*(bounded(f) for f in files))
+        elapsed = time.perf_counter() - started
+
+    latencies = sorted(latencies)
+    return {
+        "jobs": args.jobs,
+        "concurrency": args.concurrency,
+        "audio_seconds_per_job": args.duration,
+        "stub_speed": args.speed,
+        "wall_seconds": round(elapsed, 3),
+        "jobs_per_second": round(args.jobs / elapsed, 3),
+        "audio_seconds_per_second": round(args.jobs * args.duration / elapsed, 1),
+        "latency_p50": round(statistics.median(latencies), 3),
+        "latency_max": round(latencies[-1], 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ASR stub pipeline benchmark")
+    parser.add_argument("--jobs", type=int, default=8)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--duration", type=float, default=300.0, help="每个任务的音频时长（秒）")
+    parser.add_argument("--speed", type=float, default=settings.ASR_STUB_SPEED)
+    parser.add_argument("--format", default="srt", choices=["txt", "srt", "json"])
+    parser.add_argument("--profile", action="store_true", help="输出 cProfile 统计")
+    args = parser.parse_args()
+
+    if args.profile:
+        profiler = cProfile.Profile()
+        profiler.enable()
+        result = asyncio.run(run(args))
+        profiler.disable()
+        pstats.Stats(profiler).sort_stats("cumulative").print_stats(20)
+    else:
+        result = asyncio.run(run(args))
+
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+逐字稿编码大小和编解码耗时
+
+同一份逐字稿分别编码为:
+- json_indent: SubtitleProcessor 的 json 输出格式（缩进2）
+- json_compact: 紧凑JSON（旧版逐字稿存储的格式）
+- binary / binary_zlib / binary_zstd: app.services.transcript_codec 的二进制编码（zstd 需要安装 zstandard）
+
+对每种编码统计字节数、相对 json_compact 的比例、编码和解码（还原为 Utterance 列表）耗时的中位数
+
+用法:
+    python -m benchmarks.bench_codec --lines 400 --runs 50
+"""
+import argparse
+import json
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import Callable, Dict, List
+
+from app.api.models import Utterance
+from app.services import transcript_codec
+from app.services.subtitle_processor import SubtitleProcessor
+from benchmarks.stub_bilibili import make_subtitle_body
+
+
+def asr_like_utterances(lines: int, seed: int = 0) -> List[Utterance]:
+    """ASR风格的逐字稿：句长不一、时间戳带多位小数"""
+    rng = random.Random(seed)
+    processor = SubtitleProcessor()
+    utterances = []
+    position = 0.0
+    for item in processor.parse_bilibili_subtitle(make_subtitle_body(lines, f"asr-{seed}")):
+        start = position + rng.uniform(0.0, 0.8)
+        end = start + rng.uniform(0.8, 6.0)
+        utterances.append(Utterance(text=item.text * rng.randint(1, 3), start=start, end=end))
+        position = end
+    return utterances
+
+
+def _time_median(func: Callable, runs: int) -> float:
+    samples = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - started)
+    return statistics.median(samples)
+
+
+def measure(utterances: List[Utterance], runs: int) -> Dict[str, Dict]:
+    processor = SubtitleProcessor()
+    codecs = {
+        "json_indent": (
+            lambda: processor.format_transcript(utterances, "json").encode("utf-8"),
+            lambda data: [Utterance(**u) for u in json.loads(data)],
+        ),
+        "json_compact": (
+            lambda: json.dumps([u.model_dump() for u in utterances], ensure_ascii=False).encode("utf-8"),
+            lambda data: [Utterance(**u) for u in json.loads(data)],
+        ),
+        "binary": (lambda: processor.to_binary(utterances), processor.from_binary),
+        "binary_zlib": (lambda: processor.to_binary(utterances, "zlib"), processor.from_binary),
+    }
+    if transcript_codec.ZSTD_AVAILABLE:
+        codecs["binary_zstd"] = (lambda: processor.to_binary(utterances, "zstd"), processor.from_binary)
+
+    results = {}
+    for name, (encode, decode) in codecs.items():
+        data = encode()
+        assert len(decode(data)) == len(utterances)
+        results[name] = {
+            "bytes": len(data),
+            "encode_ms": round(_time_median(encode, runs) * 1000, 3),
+            "decode_ms": round(_time_median(lambda: decode(data), runs) * 1000, 3),
+        }
+    baseline = results["json_compact"]["bytes"]
+    for result in results.values():
+        result["ratio"] = round(result["bytes"] / baseline, 3)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Transcript encoding size and speed benchmark")
+    parser.add_argument("--lines", type=int, default=400, help="每份逐字稿的句子数")
+    parser.add_argument("--runs", type=int, default=50, help="每项耗时的重复次数（取中位数）")
+    parser.add_argument("--output", help="结果JSON路径")
+    args = parser.parse_args()
+
+    processor = SubtitleProcessor()
+    report = {
+        "benchmark": "codec",
+        "python": sys.version.split()[0],
+        "lines": args.lines,
+        "runs": args.runs,
+        "zstd_available": transcript_codec.ZSTD_AVAILABLE,
+        "results": {
+            "subtitle": measure(processor.parse_bilibili_subtitle(make_subtitle_body(args.lines)), args.runs),
+            "asr": measure(asr_like_utterances(args.lines), args.runs),
+        },
+    }
+
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        Path(args.output).write_text(text, encoding="utf-8")
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
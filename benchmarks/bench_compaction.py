@@ -0,0 +1,161 @@
+"""
+逐字稿压缩效果评测
+
+对字幕语料逐个执行本地压缩，统计压缩前后的估算token数和耗时。
+语料可以是B站字幕JSON（/x/player/v2 返回的字幕文件，含 body[].content）、srt 或 txt 文件；
+不指定时使用内置的确定性合成语料（模拟ASR输出：语气词、滚动字幕、重复识别）
+
+每次运行前先检查清理规则（REGRESSION_CASES）：数字、网址、英文和正常的叠词不能被改动，
+语气词和口吃重复要被去掉；不符合时以状态1退出，--check-only 时只做这项检查，可直接用作CI检查
+
+用法:
+    python -m benchmarks.bench_compaction path/to/subtitles/ other.srt
+    python -m benchmarks.bench_compaction --synthetic 20 --minutes 30
+    python -m benchmarks.bench_compaction --check-only
+"""
+import argparse
+import hashlib
+import json
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+from app.services.transcript_compactor import TranscriptCompactor
+
+_WORDS = ["今天", "我们", "来聊", "一下", "这个", "视频", "里面", "提到的", "问题", "首先", "然后", "其实", "大家", "结果"]
+_FILLERS = ["嗯", "啊", "呃", "那个，", "就是说，", "然后呢，"]
+
+# (输入, remove_fillers 的期望输出)
+REGRESSION_CASES = [
+    # 数字、网址、英文不能被当作口吃
+    ("这个项目花了2000000元", "这个项目花了2000000元"),
+    ("价格从1999降到了1000", "价格从1999降到了1000"),
+    ("网址是www.example.com", "网址是www.example.com"),
+    ("Hmm... good!!!", "Hmm... good!!!"),
+    ("Do you know the answer?", "Do you know the answer?"),
+    # "额" 开头的正常词
+    ("额度不够用了", "额度不够用了"),
+    ("额外的成本是1000块", "额外的成本是1000块"),
+    # 正常的叠词
+    ("我们回去研究研究", "我们回去研究研究"),
+    ("你看看这个", "你看看这个"),
+    ("大家讨论讨论吧", "大家讨论讨论吧"),
+    # 应该去掉的语气词和口吃
+    ("嗯今天我们聊一下", "今天我们聊一下"),
+    ("额，这个问题", "这个问题"),
+    ("我我我觉得不对", "我觉得不对"),
+    ("就是就是这样", "就是这样"),
+    ("研究研究研究一下", "研究一下"),
+    ("um, so this is it", "so this is it"),
+    ("You know, it works", "it works"),
+    ("I mean, you know, it works", "I mean, it works"),
+]
+
+
+def check_rules() -> List[str]:
+    """返回不符合期望的用例说明，全部通过时为空列表"""
+    compactor = TranscriptCompactor()
+    failures = []
+    for text, expected in REGRESSION_CASES:
+        actual = compactor.remove_fillers(text)
+        if actual != expected:
+            failures.append(f"{text!r}: expected {expected!r}, got {actual!r}")
+    return failures
+
+
+def load_corpus(paths: List[str]) -> List[Tuple[str, str]]:
+    """读取语料，返回 (名称, 逐字稿文本)；B站字幕JSON按 txt 格式（空格连接）拼接"""
+    files: List[Path] = []
+    for path in map(Path, paths):
+        if path.is_dir():
+            files.extend(sorted(p for p in path.rglob("*") if p.suffix in (".json", ".srt", ".txt")))
+        else:
+            files.append(path)
+
+    corpus = []
+    for path in files:
+        text = path.read_text(encoding="utf-8")
+        if path.suffix == ".json":
+            data = json.loads(text)
+            body = data.get("body", []) if isinstance(data, dict) else data
+            text = " ".join(item.get("content") or item.get("text", "") for item in body)
+        corpus.append((path.name, text))
+    return corpus
+
+
+def make_synthetic(index: int, minutes: int) -> str:
+    """生成确定性的类ASR逐字稿：约每3秒一条字幕，夹杂语气词、口吃和滚动重复"""
+    utterances = []
+    for i in range(minutes * 20):
+        digest = hashlib.sha256(f"{index}-{i}".encode()).digest()
+        sentence = "".join(_WORDS[b % len(_WORDS)] for b in digest[:6])
+        if digest[6] % 4 == 0:
+            sentence = _FILLERS[digest[7] % len(_FILLERS)] + sentence
+        if digest[8] % 8 == 0:
+            sentence = sentence[:2] * 3 + sentence[2:]
+        if digest[9] % 5 == 0:
+            # 滚动字幕：先出现前半句，再出现整句
+            utterances.append(sentence[:len(sentence) // 2])
+        utterances.append(sentence)
+        if digest[10] % 10 == 0:
+            utterances.append(sentence)
+    return " ".join(utterances)
+
+
+def run(corpus: List[Tuple[str, str]]) -> Dict:
+    compactor = TranscriptCompactor()
+    files = []
+    total_before = total_after = 0
+    total_seconds = 0.0
+    for name, text in corpus:
+        started = time.perf_counter()
+        result = compactor.compact(text)
+        elapsed = time.perf_counter() - started
+        report = result.report
+        total_before += report.original_tokens
+        total_after += report.compacted_tokens
+        total_seconds += elapsed
+        files.append({"name": name, "milliseconds": round(elapsed * 1000, 2), **report.to_dict()})
+
+    return {
+        "files": len(files),
+        "original_tokens": total_before,
+        "compacted_tokens": total_after,
+        "token_reduction": round(1 - total_after / total_before, 4) if total_before else 0.0,
+        "compaction_seconds": round(total_seconds, 3),
+        "results": files,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Transcript compaction benchmark")
+    parser.add_argument("paths", nargs="*", help="字幕文件或目录（.json/.srt/.txt）")
+    parser.add_argument("--synthetic", type=int, default=10, help="未指定语料时生成的合成逐字稿数量")
+    parser.add_argument("--minutes", type=int, default=30, help="每篇合成逐字稿对应的视频时长（分钟）")
+    parser.add_argument("--summary-only", action="store_true", help="只输出汇总，不输出每个文件的结果")
+    parser.add_argument("--check-only", action="store_true", help="只检查清理规则，不做压缩评测")
+    args = parser.parse_args()
+
+    failures = check_rules()
+    for failure in failures:
+        print(f"Compaction rule regression: {failure}", file=sys.stderr)
+    if failures:
+        sys.exit(1)
+    if args.check_only:
+        print(f"{len(REGRESSION_CASES)} compaction rule cases passed")
+        return
+
+    if args.paths:
+        corpus = load_corpus(args.paths)
+    else:
+        corpus = [(f"synthetic-{i}", make_synthetic(i, args.minutes)) for i in range(args.synthetic)]
+
+    result = run(corpus)
+    if args.summary_only:
+        result.pop("results")
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
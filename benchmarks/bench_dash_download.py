@@ -0,0 +1,87 @@
+"""
+DASH音频直接下载 vs yt-dlp 下载对比
+
+启动本地桩CDN（单连接限速），分别测量:
+- playurl + 并行Range分段下载
+- playurl + 单连接下载（DOWNLOAD_CONCURRENCY=1）
+- yt-dlp 下载同一文件（未安装 yt-dlp 时跳过）
+
+用法:
+    python -m benchmarks.bench_dash_download --duration 600 --bandwidth 1048576 --concurrency 8
+"""
+import argparse
+import asyncio
+import json
+import tempfile
+import time
+from pathlib import Path
+
+from app.core.config import settings
+from app.core.http import close_http_session
+from app.services.video_downloader import VideoDownloader
+from benchmarks.stub_cdn import StubCDN
+
+
+async def time_native(downloader: VideoDownloader, concurrency: int) -> dict:
+    settings.DOWNLOAD_CONCURRENCY = concurrency
+    started = time.perf_counter()
+    path = await downloader._download_with_bilibili_api("BV1stub", 1)
+    elapsed = time.perf_counter() - started
+    size = Path(path).stat().st_size if path else 0
+    Path(path).unlink(missing_ok=True) if path else None
+    return {"seconds": round(elapsed, 3), "bytes": size, "ok": bool(path)}
+
+
+async def time_ytdlp(downloader: VideoDownloader, url: str) -> dict:
+    try:
+        import yt_dlp  # noqa: F401
+    except ImportError:
+        return {"skipped": "yt-dlp not installed"}
+    started = time.perf_counter()
+    path = await downloader._download_with_ytdlp(url)
+    elapsed = time.perf_counter() - started
+    size = Path(path).stat().st_size if path else 0
+    return {"seconds": round(elapsed, 3), "bytes": size, "ok": bool(path)}
+
+
+async def run(args) -> dict:
+    cdn = StubCDN(duration=args.duration, latency=args.latency, bandwidth=args.bandwidth)
+    base_url = await cdn.start()
+    settings.BILIBILI_API_BASE = base_url
+
+    with tempfile.TemporaryDirectory() as tmp:
+        settings.TEMP_DIR = tmp
+        downloader = VideoDownloader()
+        try:
+            results = {
+                "native_parallel": await time_native(downloader, args.concurrency),
+                "native_single": await time_native(downloader, 1),
+                # yt-dlp 只能下载最高码率，这里给它最小的流以便公平比较
+                "ytdlp": await time_ytdlp(downloader, f"{base_url}/cdn/audio-30216.m4a"),
+            }
+        finally:
+            await close_http_session()
+            await cdn.stop()
+
+    return {
+        "audio_seconds": args.duration,
+        "per_connection_bandwidth": args.bandwidth,
+        "latency": args.latency,
+        "segment_size": settings.DOWNLOAD_SEGMENT_SIZE,
+        "concurrency": args.concurrency,
+        "results": results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="DASH audio download benchmark")
+    parser.add_argument("--duration", type=int, default=600, help="模拟音频时长（秒）")
+    parser.add_argument("--bandwidth", type=int, default=1024 * 1024, help="单连接带宽（字节/秒）")
+    parser.add_argument("--latency", type=float, default=0.02)
+    parser.add_argument("--concurrency", type=int, default=8)
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(run(args)), ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,262 @@
+"""
+/api/extract 端到端压测
+
+在子进程中启动桩B站接口（view / player / 字幕CDN，可配置延迟和字幕大小），
+按指定并发通过真实的 FastAPI 应用（进程内 ASGI 调用，不经过网络栈）请求 /api/extract，统计:
+- 吞吐量（请求/秒）
+- 延迟 p50 / p95 / p99 / 最大值
+- 本进程内存（开始/结束 RSS、峰值 RSS）
+
+结果保存为JSON（默认 benchmarks/results/extract-<时间>.json），带 --baseline 时输出与上次结果的对比
+
+用法:
+    python -m benchmarks.bench_extract --requests 2000 --concurrency 32 --latency 0.03 --subtitle-lines 400
+    python -m benchmarks.bench_extract --baseline benchmarks/results/extract-20240101-120000.json
+"""
+import argparse
+import asyncio
+import json
+import logging
+import math
+import multiprocessing
+import os
+import platform
+import resource
+import subprocess
+import tempfile
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from app.core.config import settings
+
+RESULTS_DIR = Path(__file__).parent / "results"
+
+
+def _serve_stub(options: dict, port_queue):
+    """子进程：运行桩B站服务，直到被终止"""
+    from benchmarks.stub_bilibili import StubBilibili
+
+    async def serve():
+        stub = StubBilibili(**options)
+        port_queue.put(await stub.start())
+        await asyncio.Event().wait()
+
+    asyncio.run(serve())
+
+
+def start_stub(options: dict) -> Tuple[multiprocessing.Process, str]:
+    """在子进程中启动桩B站服务（不和被测应用争用事件循环），返回进程和服务地址"""
+    context = multiprocessing.get_context("spawn")
+    port_queue = context.Queue()
+    process = context.Process(target=_serve_stub, args=(options, port_queue), daemon=True)
+    process.start()
+    return process, port_queue.get(timeout=30)
+
+
+def use_temp_dirs(tmp: str):
+    """任务库、缓存和日志都放到临时目录，不影响本地数据"""
+    settings.TASK_DB_PATH = str(Path(tmp) / "tasks.db")
+    settings.SUMMARY_CACHE_DB_PATH = str(Path(tmp) / "summaries.db")
+    settings.TRANSCRIPT_DB_PATH = str(Path(tmp) / "transcripts.db")
+    settings.TEMP_DIR = str(Path(tmp) / "temp")
+    settings.UPLOAD_DIR = str(Path(tmp) / "uploads")
+    settings.LOG_FILE = str(Path(tmp) / "logs" / "app.log")
+    settings.DEEPSEEK_API_KEY = settings.DEEPSEEK_API_KEY or "stub"
+
+
+def _rss_mb() -> float:
+    """当前常驻内存（MB）"""
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return round(pages * os.sysconf("SC_PAGE_SIZE") / 1024 / 1024, 1)
+    except (OSError, ValueError):
+        return 0.0
+
+
+def _peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux 单位是KB，macOS 是字节
+    return round(peak / 1024 / (1024 if platform.system() == "Darwin" else 1), 1)
+
+
+def _git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, check=True, cwd=Path(__file__).parent
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """最近秩法百分位数"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(pct / 100 * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+async def drive(client, total: int, concurrency: int, videos: int) -> Dict:
+    """以固定并发发出 total 个请求，返回每个请求的延迟和状态码"""
+    latencies: List[float] = []
+    statuses: Counter = Counter()
+    methods: Counter = Counter()
+    next_index = 0
+
+    async def worker():
+        nonlocal next_index
+        while next_index < total:
+            index = next_index
+            next_index += 1
+            bvid = f"BV1stub{index % videos:06d}"
+            started = time.perf_counter()
+            response = await client.post("/api/extract", json={"url": bvid, "format": "txt"})
+            latencies.append(time.perf_counter() - started)
+            statuses[response.status_code] += 1
+            if response.status_code == 200:
+                methods[response.json()["data"]["method"]] += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return {
+        "seconds": time.perf_counter() - started,
+        "latencies": latencies,
+        "statuses": statuses,
+        "methods": methods,
+    }
+
+
+def summarize(run: Dict) -> Dict:
+    latencies = sorted(run["latencies"])
+    ms = lambda value: round(value * 1000, 2)  # noqa: E731
+    return {
+        "requests": len(latencies),
+        "seconds": round(run["seconds"], 3),
+        "throughput_rps": round(len(latencies) / run["seconds"], 1) if run["seconds"] else None,
+        "latency_ms": {
+            "mean": ms(sum(latencies) / len(latencies)) if latencies else 0,
+            "p50": ms(percentile(latencies, 50)),
+            "p95": ms(percentile(latencies, 95)),
+            "p99": ms(percentile(latencies, 99)),
+            "max": ms(latencies[-1]) if latencies else 0,
+        },
+        "status_codes": {str(code): count for code, count in sorted(run["statuses"].items())},
+        "methods": dict(run["methods"]),
+    }
+
+
+def compare(current: Dict, baseline: Dict) -> Dict:
+    """与基线结果对比：正数表示比基线慢/少"""
+    def change(new, old):
+        if not old:
+            return None
+        return f"{(new - old) / old:+.1%}"
+
+    cur, base = current["results"], baseline["results"]
+    return {
+        "baseline_revision": baseline.get("revision"),
+        "throughput_rps": change(cur["throughput_rps"], base["throughput_rps"]),
+        **{
+            f"latency_{key}": change(cur["latency_ms"][key], base["latency_ms"][key])
+            for key in ("p50", "p95", "p99")
+        },
+        "peak_rss_mb": change(current["memory"]["peak_rss_mb"], baseline["memory"]["peak_rss_mb"]),
+    }
+
+
+async def run(args, base_url: str) -> Dict:
+    import httpx
+
+    settings.BILIBILI_API_BASE = base_url
+    # 默认不启用逐字稿存储，每个请求都走完整的提取流程
+    settings.TRANSCRIPT_CACHE_ENABLED = args.transcript_cache
+    # 在修改配置之后再导入，应用使用桩服务地址和临时目录
+    import main
+    from app.core.http import close_http_session
+
+    logging.getLogger().setLevel(args.log_level)
+
+    transport = httpx.ASGITransport(app=main.app)
+    rss_start = _rss_mb()
+    try:
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+            if args.warmup:
+                await drive(client, args.warmup, min(args.concurrency, args.warmup), args.videos)
+            result = await drive(client, args.requests, args.concurrency, args.videos)
+    finally:
+        await close_http_session()
+
+    return {
+        "benchmark": "extract",
+        "revision": _git_revision(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "config": {
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "videos": args.videos,
+            "latency": args.latency,
+            "cdn_latency": args.cdn_latency,
+            "subtitle_lines": args.subtitle_lines,
+            "ai_subtitle_ratio": args.ai_subtitle_ratio,
+            "tracing": settings.TRACING_ENABLED,
+            "transcript_cache": settings.TRANSCRIPT_CACHE_ENABLED,
+        },
+        "results": summarize(result),
+        "memory": {
+            "rss_start_mb": rss_start,
+            "rss_end_mb": _rss_mb(),
+            "peak_rss_mb": _peak_rss_mb(),
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="/api/extract end-to-end benchmark")
+    parser.add_argument("--requests", type=int, default=1000, help="请求总数")
+    parser.add_argument("--concurrency", type=int, default=32, help="并发请求数")
+    parser.add_argument("--warmup", type=int, default=20, help="预热请求数（不计入结果）")
+    parser.add_argument("--videos", type=int, default=200, help="不同视频的数量（请求按序轮换）")
+    parser.add_argument("--latency", type=float, default=0.03, help="view/player 接口延迟（秒）")
+    parser.add_argument("--cdn-latency", type=float, default=0.02, help="字幕CDN延迟（秒）")
+    parser.add_argument("--subtitle-lines", type=int, default=400, help="每个视频的字幕条数")
+    parser.add_argument("--ai-subtitle-ratio", type=float, default=0.0, help="只有AI字幕的视频比例")
+    parser.add_argument("--log-level", default="WARNING", help="压测期间的日志级别")
+    parser.add_argument(
+        "--transcript-cache", action="store_true",
+        help="启用逐字稿存储（预热后重复视频直接命中）"
+    )
+    parser.add_argument("--output", help="结果JSON路径（默认 benchmarks/results/extract-<时间>.json）")
+    parser.add_argument("--baseline", help="与之对比的历史结果JSON")
+    args = parser.parse_args()
+
+    stub, base_url = start_stub({
+        "latency": args.latency,
+        "cdn_latency": args.cdn_latency,
+        "subtitle_lines": args.subtitle_lines,
+        "ai_subtitle_ratio": args.ai_subtitle_ratio,
+    })
+
+    with tempfile.TemporaryDirectory() as tmp:
+        use_temp_dirs(tmp)
+        try:
+            report = asyncio.run(run(args, base_url))
+        finally:
+            stub.terminate()
+            stub.join()
+
+    if args.baseline:
+        report["comparison"] = compare(report, json.loads(Path(args.baseline).read_text(encoding="utf-8")))
+
+    output = Path(args.output) if args.output else RESULTS_DIR / f"extract-{time.strftime('%Y%m%d-%H%M%S')}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+    print(f"Results saved to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""
+启动导入耗时（python -X importtime）回归检查
+
+在干净的子进程中多次执行 `import main`，统计:
+- 导入 main 的总耗时（取中位数）和导入后的常驻内存
+- 累计耗时最长的模块
+- 是否提前导入了应当按需加载的重量级依赖（openai、faster_whisper、playwright 等）
+
+总耗时超过 --max-ms 或提前导入了重量级依赖时以非0状态退出，可直接用作CI检查
+
+用法:
+    python -m benchmarks.bench_import --runs 5 --top 15 --max-ms 1500
+"""
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+from typing import Dict, List
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# 只在ASR、snapany 下载、AI总结、列式导出或二进制逐字稿压缩时才需要，不应出现在启动导入中
+LAZY_MODULES = (
+    "openai", "httpx", "faster_whisper", "ctranslate2", "bcut_asr", "playwright", "yt_dlp", "pyarrow", "zstandard"
+)
+
+_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+# 子进程导入完成后打印常驻内存（KB）
+_PROBE = (
+    "import main, resource, sys; "
+    "sys.stdout.write('RSS_KB=%d\\n' % resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)"
+)
+
+
+def parse_importtime(output: str) -> List[Dict]:
+    """解析 -X importtime 输出：模块名、自身耗时、累计耗时（微秒）、嵌套层级"""
+    modules = []
+    for line in output.splitlines():
+        match = _LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            modules.append({
+                "module": name,
+                "self_us": int(self_us),
+                "cumulative_us": int(cumulative_us),
+                "depth": len(indent) // 2,
+            })
+    return modules
+
+
+def run_once(env: Dict[str, str]) -> Dict:
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", _PROBE],
+        cwd=ROOT, env=env, capture_output=True, text=True
+    )
+    if completed.returncode != 0:
+        raise RuntimeError(completed.stderr[-2000:])
+    modules = parse_importtime(completed.stderr)
+    rss = re.search(r"RSS_KB=(\d+)", completed.stdout)
+    main_module = next(m for m in modules if m["module"] == "main")
+    return {
+        "total_ms": main_module["cumulative_us"] / 1000,
+        "rss_mb": round(int(rss.group(1)) / 1024, 1) if rss else None,
+        "modules": modules,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Startup import time benchmark")
+    parser.add_argument("--runs", type=int, default=5, help="重复次数（取中位数）")
+    parser.add_argument("--top", type=int, default=15, help="列出累计耗时最长的几个模块")
+    parser.add_argument("--max-ms", type=float, default=None, help="总耗时上限（毫秒），超过时以状态1退出")
+    parser.add_argument("--output", help="结果JSON路径")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # 导入 main 会初始化日志和任务存储，放到临时目录
+        env = {
+            **os.environ,
+            "LOG_FILE": str(Path(tmp) / "logs" / "app.log"),
+            "TASK_DB_PATH": str(Path(tmp) / "tasks.db"),
+            "SUMMARY_CACHE_DB_PATH": str(Path(tmp) / "summaries.db"),
+            "TRANSCRIPT_DB_PATH": str(Path(tmp) / "transcripts.db"),
+            "TEMP_DIR": str(Path(tmp) / "temp"),
+            "UPLOAD_DIR": str(Path(tmp) / "uploads"),
+        }
+        runs = [run_once(env) for _ in range(args.runs)]
+
+    median_run = sorted(runs, key=lambda r: r["total_ms"])[len(runs) // 2]
+    loaded = {m["module"] for m in median_run["modules"]}
+    eager = sorted(
+        name for name in LAZY_MODULES
+        if name in loaded or any(module.startswith(name + ".") for module in loaded)
+    )
+    report = {
+        "benchmark": "import",
+        "python": sys.version.split()[0],
+        "runs": args.runs,
+        "total_ms": {
+            "median": round(statistics.median(r["total_ms"] for r in runs), 1),
+            "min": round(min(r["total_ms"] for r in runs), 1),
+            "max": round(max(r["total_ms"] for r in runs), 1),
+        },
+        "rss_mb": median_run["rss_mb"],
+        "modules_loaded": len(loaded),
+        "eager_heavy_modules": eager,
+        "slowest": [
+            {"module": m["module"], "cumulative_ms": round(m["cumulative_us"] / 1000, 1),
+             "self_ms": round(m["self_us"] / 1000, 1)}
+            for m in sorted(median_run["modules"], key=lambda m: m["cumulative_us"], reverse=True)[:args.top]
+        ],
+    }
+
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        Path(args.output).write_text(text, encoding="utf-8")
+    print(text)
+
+    failed = bool(eager)
+    if eager:
+        print(f"Heavy modules imported at startup: {', '.join(eager)}", file=sys.stderr)
+    if args.max_ms is not None and report["total_ms"]["median"] > args.max_ms:
+        print(f"Import time {report['total_ms']['median']}ms exceeds {args.max_ms}ms", file=sys.stderr)
+        failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+"""
+日志管道对请求延迟的影响
+
+用桩B站接口驱动 /api/extract（同 bench_extract），日志级别为 INFO，依次测量:
+- sync: 处理器直接挂在根logger上，事件循环线程里写文件
+- queue: QueueHandler 入队，后台 QueueListener 线程写文件（默认配置）
+- queue_json: 同上，JSON格式
+- queue_sampled: 同上，按 --sampling 对INFO日志采样
+
+--io-delay 给每次写日志文件加上固定耗时，模拟慢磁盘、网络文件系统或日志轮转时的停顿；
+控制台输出重定向到 /dev/null
+
+用法:
+    python -m benchmarks.bench_logging --requests 1000 --concurrency 32 --io-delay 0.002
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import tempfile
+import time
+from logging.handlers import RotatingFileHandler
+from pathlib import Path
+
+from app.core.config import settings
+from benchmarks.bench_extract import drive, start_stub, summarize, use_temp_dirs
+
+MODES = {
+    "sync": {"LOG_ASYNC": False, "LOG_FORMAT": "text", "LOG_SAMPLING": ""},
+    "queue": {"LOG_ASYNC": True, "LOG_FORMAT": "text", "LOG_SAMPLING": ""},
+    "queue_json": {"LOG_ASYNC": True, "LOG_FORMAT": "json", "LOG_SAMPLING": ""},
+    "queue_sampled": {"LOG_ASYNC": True, "LOG_FORMAT": "text", "LOG_SAMPLING": None},
+}
+
+
+def _prepare_handlers(io_delay: float, devnull):
+    """控制台输出丢弃，日志文件写入加上固定延迟"""
+    from app.core import logger as app_logger
+
+    handlers = list(logging.getLogger().handlers)
+    if app_logger._listener is not None:
+        handlers = list(app_logger._listener.handlers)
+    for handler in handlers:
+        if isinstance(handler, RotatingFileHandler):
+            if io_delay > 0:
+                emit = handler.emit
+
+                def slow_emit(record, emit=emit):
+                    time.sleep(io_delay)
+                    emit(record)
+
+                handler.emit = slow_emit
+        elif isinstance(handler, logging.StreamHandler):
+            handler.setStream(devnull)
+
+
+def _count_lines(path: Path) -> int:
+    if not path.exists():
+        return 0
+    with open(path, "rb") as f:
+        return sum(1 for _ in f)
+
+
+async def run(args, base_url: str) -> dict:
+    import httpx
+
+    settings.BILIBILI_API_BASE = base_url
+    settings.LOG_LEVEL = "INFO"
+    settings.TRANSCRIPT_CACHE_ENABLED = False
+    # 在修改配置之后再导入，应用使用桩服务地址和临时目录
+    import main
+    from app.core.http import close_http_session
+    from app.core.logger import setup_logging, stop_logging
+
+    log_file = Path(settings.LOG_FILE)
+    results = {}
+    transport = httpx.ASGITransport(app=main.app)
+    with open(os.devnull, "w") as devnull:
+        try:
+            async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+                for mode, overrides in MODES.items():
+                    for key, value in overrides.items():
+                        setattr(settings, key, args.sampling if value is None else value)
+                    setup_logging()
+                    _prepare_handlers(args.io_delay, devnull)
+                    lines_before = _count_lines(log_file)
+
+                    if args.warmup:
+                        await drive(client, args.warmup, min(args.concurrency, args.warmup), args.videos)
+                    result = summarize(await drive(client, args.requests, args.concurrency, args.videos))
+
+                    # 等后台线程写完再统计，写完所需的时间单独记录
+                    flush_started = time.perf_counter()
+                    stop_logging()
+                    result["log_flush_seconds"] = round(time.perf_counter() - flush_started, 3)
+                    result["log_lines"] = _count_lines(log_file) - lines_before
+                    results[mode] = result
+        finally:
+            await close_http_session()
+            logging.getLogger().handlers.clear()
+
+    return {
+        "benchmark": "logging",
+        "config": {
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "io_delay": args.io_delay,
+            "sampling": args.sampling,
+            "latency": args.latency,
+        },
+        "results": results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Logging pipeline latency benchmark")
+    parser.add_argument("--requests", type=int, default=1000, help="每种模式的请求数")
+    parser.add_argument("--concurrency", type=int, default=32, help="并发请求数")
+    parser.add_argument("--warmup", type=int, default=20, help="预热请求数（不计入结果）")
+    parser.add_argument("--videos", type=int, default=200, help="不同视频的数量")
+    parser.add_argument("--latency", type=float, default=0.03, help="桩接口延迟（秒）")
+    parser.add_argument("--io-delay", type=float, default=0.002, help="每次写日志文件的附加耗时（秒）")
+    parser.add_argument(
+        "--sampling", default="app.api.routes=0.1,app.services=0.1",
+        help="queue_sampled 模式使用的 LOG_SAMPLING"
+    )
+    parser.add_argument("--output", help="结果JSON路径")
+    args = parser.parse_args()
+
+    stub, base_url = start_stub({"latency": args.latency, "cdn_latency": args.latency})
+    with tempfile.TemporaryDirectory() as tmp:
+        use_temp_dirs(tmp)
+        try:
+            report = asyncio.run(run(args, base_url))
+        finally:
+            stub.terminate()
+            stub.join()
+
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        Path(args.output).write_text(text, encoding="utf-8")
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""
+长逐字稿总结：单次请求 vs 分段（map-reduce）对比
+
+启动本地桩 OpenAI 接口（可配置上下文长度和生成速度），用确定性的长逐字稿分别测量:
+- single: 整篇逐字稿一次请求（超过上下文长度时会失败）
+- map_reduce: 按 SUMMARY_CHUNK_TOKENS 分块、并发提炼后合并
+
+用法:
+    python -m benchmarks.bench_summarize --minutes 240 --concurrency 4 --context 65536
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import time
+
+from app.core.config import settings
+from app.services.text_chunker import estimate_tokens
+from benchmarks.stub_openai import StubOpenAI
+
+_WORDS = ["今天", "我们", "来聊", "一下", "这个", "视频", "里面", "提到的", "问题", "首先", "然后", "其实"]
+
+
+def make_transcript(minutes: int, chars_per_second: float = 4.0) -> str:
+    """生成确定性的逐字稿（txt 格式：空格连接的字幕条），约每秒4个汉字"""
+    target = int(minutes * 60 * chars_per_second)
+    utterances = []
+    length = 0
+    index = 0
+    while length < target:
+        digest = hashlib.sha256(index.to_bytes(4, "big")).digest()
+        sentence = "".join(_WORDS[b % len(_WORDS)] for b in digest[:8]) + "。"
+        utterances.append(sentence)
+        length += len(sentence)
+        index += 1
+    return " ".join(utterances)
+
+
+async def time_summary(service, stub: StubOpenAI, transcript: str, single_shot_tokens: int) -> dict:
+    settings.SUMMARY_SINGLE_SHOT_TOKENS = single_shot_tokens
+    requests_before = stub.requests
+    stub.max_active = 0
+    stages = 0
+    started = time.perf_counter()
+    first_delta = None
+    try:
+        result = None
+        async for event, data in service.summarize_stream(transcript, "brief"):
+            if event == "stage":
+                stages += 1
+            elif event == "delta" and first_delta is None:
+                first_delta = time.perf_counter() - started
+            elif event == "done":
+                result = data
+    except Exception as e:
+        return {"ok": False, "error": str(e)[:200], "seconds": round(time.perf_counter() - started, 3)}
+    return {
+        "ok": True,
+        "seconds": round(time.perf_counter() - started, 3),
+        "first_token_seconds": round(first_delta, 3) if first_delta is not None else None,
+        "requests": stub.requests - requests_before,
+        "max_concurrent_requests": stub.max_active,
+        "stage_events": stages,
+        "summary_chars": len(result["summary"]),
+        "key_points": len(result["key_points"]),
+    }
+
+
+async def run(args) -> dict:
+    stub = StubOpenAI(latency=args.latency, decode_tps=args.decode_tps, context_tokens=args.context)
+    settings.DEEPSEEK_API_URL = await stub.start()
+    settings.DEEPSEEK_API_KEY = settings.DEEPSEEK_API_KEY or "stub"
+    settings.SUMMARY_MAP_CONCURRENCY = args.concurrency
+    settings.SUMMARY_CHUNK_TOKENS = args.chunk_tokens
+
+    # 在修改配置之后再导入，客户端使用桩服务地址
+    from app.services.deepseek_service import DeepSeekService
+    service = DeepSeekService()
+
+    transcript = make_transcript(args.minutes)
+    try:
+        results = {
+            "single": await time_summary(service, stub, transcript, single_shot_tokens=10 ** 9),
+            "map_reduce": await time_summary(service, stub, transcript, single_shot_tokens=args.single_shot_tokens),
+        }
+    finally:
+        await service.close()
+        await stub.stop()
+
+    return {
+        "transcript_minutes": args.minutes,
+        "transcript_chars": len(transcript),
+        "estimated_tokens": estimate_tokens(transcript),
+        "context_tokens": args.context,
+        "chunk_tokens": args.chunk_tokens,
+        "concurrency": args.concurrency,
+        "results": results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Long transcript summarization benchmark")
+    parser.add_argument("--minutes", type=int, default=240, help="逐字稿对应的视频时长（分钟）")
+    parser.add_argument("--concurrency", type=int, default=4, help="分块总结并发数")
+    parser.add_argument("--chunk-tokens", type=int, default=6000)
+    parser.add_argument("--single-shot-tokens", type=int, default=24000)
+    parser.add_argument("--context", type=int, default=65536, help="桩接口的上下文长度（token）")
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--decode-tps", type=float, default=200, help="桩接口的生成速度（token/秒）")
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(run(args)), ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+"""
+本地桩B站接口
+模拟 /x/web-interface/view、/x/player/v2 和字幕CDN，
+可配置延迟、字幕长度和有CC字幕/只有AI字幕的比例，用于离线压测 /api/extract；
+另外模拟热门列表和UP主投稿列表，供后台预取使用
+"""
+import asyncio
+import hashlib
+from typing import Dict, List
+
+from aiohttp import web
+
+_WORDS = ["今天", "我们", "来聊", "一下", "这个", "视频", "里面", "提到的", "问题", "首先", "然后", "其实"]
+
+
+def _bucket(bvid: str) -> float:
+    """bvid 映射到 [0, 1) 的确定性数值"""
+    digest = hashlib.sha256(bvid.encode()).digest()
+    return int.from_bytes(digest[:4], "big") / 2 ** 32
+
+
+def make_subtitle_body(lines: int, seed: str = "stub") -> List[Dict]:
+    """生成确定性的B站字幕 body，每条约3秒"""
+    body = []
+    for index in range(lines):
+        digest = hashlib.sha256(f"{seed}:{index}".encode()).digest()
+        content = "".join(_WORDS[b % len(_WORDS)] for b in digest[:6])
+        body.append({"from": index * 3.0, "to": index * 3.0 + 2.8, "content": content})
+    return body
+
+
+class StubBilibili:
+    """桩B站服务"""
+
+    def __init__(
+        self,
+        latency: float = 0.03,
+        cdn_latency: float = 0.02,
+        subtitle_lines: int = 400,
+        ai_subtitle_ratio: float = 0.0
+    ):
+        """
+        latency: view / player 接口每个请求的延迟（秒）
+        cdn_latency: 字幕CDN每个请求的延迟（秒）
+        subtitle_lines: 每个视频的字幕条数，决定字幕JSON大小
+        ai_subtitle_ratio: 只有AI字幕（没有CC字幕）的视频比例，这些视频多一次 player 请求
+        """
+        self.latency = latency
+        self.cdn_latency = cdn_latency
+        self.subtitle_lines = subtitle_lines
+        self.ai_subtitle_ratio = ai_subtitle_ratio
+        self.requests: Dict[str, int] = {"view": 0, "player": 0, "subtitle": 0, "not_modified": 0, "list": 0}
+        self._subtitles: Dict[str, bytes] = {}
+        self._runner = None
+        self.base_url = ""
+
+    def build_app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_get("/x/web-interface/view", self.handle_view)
+        app.router.add_get("/x/player/v2", self.handle_player)
+        app.router.add_get("/cdn/subtitle/{bvid}.json", self.handle_subtitle)
+        app.router.add_get("/x/web-interface/popular", self.handle_popular)
+        app.router.add_get("/x/series/recArchivesByKeywords", self.handle_uploader)
+        return app
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        """启动服务，返回可直接作为 BILIBILI_API_BASE 的地址"""
+        self._runner = web.AppRunner(self.build_app())
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        self.base_url = f"http://{host}:{port}"
+        return self.base_url
+
+    async def stop(self):
+        if self._runner:
+            await self._runner.cleanup()
+
+    def subtitle_payload(self, bvid: str) -> bytes:
+        payload = self._subtitles.get(bvid)
+        if payload is None:
+            body = make_subtitle_body(self.subtitle_lines, bvid)
+            payload = self._subtitles[bvid] = web.json_response({"body": body}).body
+        return payload
+
+    async def handle_view(self, request: web.Request) -> web.Response:
+        self.requests["view"] += 1
+        if self.latency > 0:
+            await asyncio.sleep(self.latency)
+        bvid = request.query.get("bvid", "")
+        return web.json_response({
+            "code": 0,
+            "data": {
+                "bvid": bvid,
+                "aid": 1,
+                "cid": int(_bucket(bvid) * 10 ** 8) + 1,
+                "title": f"桩视频 {bvid}",
+                "duration": self.subtitle_lines * 3,
+                "owner": {"name": "stub"},
+                "desc": "",
+            }
+        })
+
+    async def handle_player(self, request: web.Request) -> web.Response:
+        self.requests["player"] += 1
+        if self.latency > 0:
+            await asyncio.sleep(self.latency)
+        bvid = request.query.get("bvid", "")
+        subtitle_url = f"{self.base_url}/cdn/subtitle/{bvid}.json"
+        if _bucket(bvid) < self.ai_subtitle_ratio:
+            subtitle = {"subtitles": [], "ai_subtitle": {"subtitle_url": subtitle_url}}
+        else:
+            subtitle = {"subtitles": [{"lan": "zh-CN", "subtitle_url": subtitle_url}]}
+        return web.json_response({"code": 0, "data": {"subtitle": subtitle}})
+
+    async def handle_subtitle(self, request: web.Request) -> web.Response:
+        self.requests["subtitle"] += 1
+        if self.cdn_latency > 0:
+            await asyncio.sleep(self.cdn_latency)
+        payload = self.subtitle_payload(request.match_info["bvid"])
+        # 和CDN一样支持 ETag 条件请求
+        etag = '"' + hashlib.sha256(payload).hexdigest()[:16] + '"'
+        if request.headers.get("If-None-Match") == etag:
+            self.requests["not_modified"] += 1
+            return web.Response(status=304, headers={"ETag": etag})
+        return web.Response(body=payload, content_type="application/json", headers={"ETag": etag})
+
+    def _video_list(self, prefix: str, count: int) -> List[Dict]:
+        return [
+            {"bvid": f"BV{prefix}{index:06d}", "title": f"桩视频 {prefix}{index}", "duration": self.subtitle_lines * 3}
+            for index in range(count)
+        ]
+
+    async def handle_popular(self, request: web.Request) -> web.Response:
+        self.requests["list"] += 1
+        if self.latency > 0:
+            await asyncio.sleep(self.latency)
+        videos = self._video_list("hot", int(request.query.get("ps", 20)))
+        return web.json_response({"code": 0, "data": {"list": videos}})
+
+    async def handle_uploader(self, request: web.Request) -> web.Response:
+        self.requests["list"] += 1
+        if self.latency > 0:
+            await asyncio.sleep(self.latency)
+        videos = self._video_list(f"up{request.query.get('mid', '0')}x", int(request.query.get("ps", 20)))
+        return web.json_response({"code": 0, "data": {"archives": videos}})
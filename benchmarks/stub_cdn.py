@@ -0,0 +1,114 @@
+"""
+本地桩CDN
+模拟 /x/player/playurl 接口和支持Range请求的音频CDN，
+可配置每个请求的延迟和单连接带宽，用于离线对比下载方案
+"""
+import asyncio
+import hashlib
+from typing import Dict
+
+from aiohttp import web
+
+# 模拟B站的三档DASH音频: id -> 码率(bps)
+AUDIO_STREAMS = {30216: 67000, 30232: 132000, 30280: 192000}
+
+
+def make_payload(size: int, seed: str = "stub") -> bytes:
+    """生成确定性的伪音频数据"""
+    block = hashlib.sha256(seed.encode()).digest() * 2048
+    repeats = size // len(block) + 1
+    return (block * repeats)[:size]
+
+
+class StubCDN:
+    """桩CDN服务"""
+
+    def __init__(self, duration: int = 600, latency: float = 0.02, bandwidth: int = 2 * 1024 * 1024):
+        """
+        duration: 模拟的音频时长（秒），决定各档音频流的大小
+        latency: 每个请求的首字节延迟（秒）
+        bandwidth: 单连接带宽（字节/秒），<=0 表示不限速
+        """
+        self.duration = duration
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.payloads: Dict[str, bytes] = {
+            f"audio-{stream_id}.m4s": make_payload(bps // 8 * duration, str(stream_id))
+            for stream_id, bps in AUDIO_STREAMS.items()
+        }
+        self.requests = 0
+        self._runner = None
+        self.base_url = ""
+
+    def build_app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_get("/x/player/playurl", self.handle_playurl)
+        app.router.add_get("/cdn/{name}", self.handle_file)
+        return app
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        self._runner = web.AppRunner(self.build_app())
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        self.base_url = f"http://{host}:{port}"
+        return self.base_url
+
+    async def stop(self):
+        if self._runner:
+            await self._runner.cleanup()
+
+    async def handle_playurl(self, request: web.Request) -> web.Response:
+        audio = [
+            {
+                "id": stream_id,
+                "baseUrl": f"{self.base_url}/cdn/audio-{stream_id}.m4s",
+                "backupUrl": [],
+                "bandwidth": bps,
+                "mimeType": "audio/mp4",
+                "codecs": "mp4a.40.2",
+            }
+            for stream_id, bps in AUDIO_STREAMS.items()
+        ]
+        return web.json_response({"code": 0, "data": {"dash": {"audio": audio}}})
+
+    async def handle_file(self, request: web.Request) -> web.StreamResponse:
+        self.requests += 1
+        name = request.match_info["name"].replace(".m4a", ".m4s")
+        payload = self.payloads.get(name)
+        if payload is None:
+            raise web.HTTPNotFound()
+
+        total = len(payload)
+        start, end, status = 0, total - 1, 200
+        range_header = request.headers.get("Range")
+        if range_header and range_header.startswith("bytes="):
+            first, _, last = range_header[6:].partition("-")
+            start = int(first) if first else 0
+            end = min(int(last), total - 1) if last else total - 1
+            status = 206
+
+        if self.latency > 0:
+            await asyncio.sleep(self.latency)
+
+        response = web.StreamResponse(status=status)
+        response.content_type = "audio/mp4"
+        response.content_length = end - start + 1
+        response.headers["Accept-Ranges"] = "bytes"
+        if status == 206:
+            response.headers["Content-Range"] = f"bytes {start}-{end}/{total}"
+        await response.prepare(request)
+
+        chunk_size = 64 * 1024
+        try:
+            for offset in range(start, end + 1, chunk_size):
+                chunk = payload[offset:min(offset + chunk_size, end + 1)]
+                await response.write(chunk)
+                if self.bandwidth > 0:
+                    await asyncio.sleep(len(chunk) / self.bandwidth)
+            await response.write_eof()
+        except ConnectionResetError:
+            # 客户端提前断开（如探测请求）
+            pass
+        return response
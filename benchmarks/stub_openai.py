@@ -0,0 +1,154 @@
+"""
+本地桩 OpenAI 兼容接口
+模拟 DeepSeek 的 /v1/chat/completions（支持 stream=True/False），
+按配置的首字延迟、预填充速度和生成速度返回确定性的 Markdown 要点；
+输入超过上下文长度时像真实接口一样返回 400，用于离线测试长逐字稿总结
+"""
+import asyncio
+import hashlib
+import json
+import time
+from typing import Dict, List
+
+from aiohttp import web
+
+from app.services.text_chunker import estimate_tokens
+
+_VOCABULARY = [
+    "核心观点", "背景介绍", "实验结果", "关键数据", "方法对比", "常见误区",
+    "实际案例", "适用场景", "注意事项", "后续计划", "问题分析", "结论",
+]
+
+
+class StubOpenAI:
+    """桩 OpenAI 服务"""
+
+    def __init__(
+        self,
+        latency: float = 0.2,
+        prefill_tps: float = 20000,
+        decode_tps: float = 200,
+        context_tokens: int = 65536,
+        output_ratio: float = 0.05
+    ):
+        """
+        latency: 每个请求的首字延迟（秒）
+        prefill_tps: 处理输入的速度（token/秒）
+        decode_tps: 生成输出的速度（token/秒），<=0 表示不限速
+        context_tokens: 上下文长度，输入超过时返回 400
+        output_ratio: 输出token数约为输入的多少倍（不超过请求的 max_tokens）
+        """
+        self.latency = latency
+        self.prefill_tps = prefill_tps
+        self.decode_tps = decode_tps
+        self.context_tokens = context_tokens
+        self.output_ratio = output_ratio
+        self.requests = 0
+        self.input_tokens = 0
+        self.output_tokens = 0
+        self.active = 0
+        self.max_active = 0
+        self._runner = None
+        self.base_url = ""
+
+    def build_app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post("/v1/chat/completions", self.handle_completions)
+        return app
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        """启动服务，返回可直接作为 DEEPSEEK_API_URL 的地址"""
+        self._runner = web.AppRunner(self.build_app())
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        self.base_url = f"http://{host}:{port}/v1"
+        return self.base_url
+
+    async def stop(self):
+        if self._runner:
+            await self._runner.cleanup()
+
+    def make_reply(self, prompt: str, max_tokens: int) -> List[str]:
+        """根据输入生成确定性的 Markdown，按行返回"""
+        budget = min(max_tokens, max(32, int(estimate_tokens(prompt) * self.output_ratio)))
+        seed = hashlib.sha256(prompt.encode("utf-8")).digest()
+        lines = []
+        tokens = 0
+        index = 0
+        while tokens < budget:
+            digest = hashlib.sha256(seed + index.to_bytes(4, "big")).digest()
+            word = _VOCABULARY[digest[0] % len(_VOCABULARY)]
+            detail = "".join(_VOCABULARY[b % len(_VOCABULARY)] for b in digest[1:4])
+            line = f"## {word}{index + 1}\n" if index % 4 == 0 else f"- **{word}**: {detail}\n"
+            lines.append(line)
+            tokens += estimate_tokens(line)
+            index += 1
+        return lines
+
+    async def handle_completions(self, request: web.Request) -> web.StreamResponse:
+        body = await request.json()
+        prompt = "\n".join(message["content"] for message in body["messages"])
+        prompt_tokens = estimate_tokens(prompt)
+        if prompt_tokens > self.context_tokens:
+            return web.json_response({
+                "error": {
+                    "message": f"This model's maximum context length is {self.context_tokens} tokens, "
+                               f"however you requested {prompt_tokens} tokens",
+                    "type": "invalid_request_error",
+                    "code": "context_length_exceeded",
+                }
+            }, status=400)
+
+        self.requests += 1
+        self.input_tokens += prompt_tokens
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        try:
+            await asyncio.sleep(self.latency + prompt_tokens / self.prefill_tps)
+            lines = self.make_reply(prompt, body.get("max_tokens") or 4096)
+            if body.get("stream"):
+                return await self._stream(request, body, lines)
+
+            text = "".join(lines)
+            if self.decode_tps > 0:
+                await asyncio.sleep(estimate_tokens(text) / self.decode_tps)
+            self.output_tokens += estimate_tokens(text)
+            return web.json_response({
+                "id": "chatcmpl-stub",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": body.get("model", "stub"),
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": text},
+                    "finish_reason": "stop",
+                }],
+                "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": estimate_tokens(text)},
+            })
+        finally:
+            self.active -= 1
+
+    async def _stream(self, request: web.Request, body: Dict, lines: List[str]) -> web.StreamResponse:
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+        await response.prepare(request)
+        try:
+            for line in lines:
+                if self.decode_tps > 0:
+                    await asyncio.sleep(estimate_tokens(line) / self.decode_tps)
+                self.output_tokens += estimate_tokens(line)
+                chunk = {
+                    "id": "chatcmpl-stub",
+                    "object": "chat.completion.chunk",
+                    "created": int(time.time()),
+                    "model": body.get("model", "stub"),
+                    "choices": [{"index": 0, "delta": {"content": line}, "finish_reason": None}],
+                }
+                await response.write(f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n".encode("utf-8"))
+            await response.write(b"data: [DONE]\n\n")
+            await response.write_eof()
+        except ConnectionResetError:
+            # 客户端提前断开
+            pass
+        return response
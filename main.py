@@ -4,8 +4,10 @@ B站视频逐字稿提取系统 - FastAPI Main Application
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
+from fastapi.responses import Response
 from pydantic import BaseModel, HttpUrl
 from typing import Optional, List
+import asyncio
 import logging
 from pathlib import Path
 
@@ -13,6 +15,10 @@ from pathlib import Path
 from app.api import routes
 from app.core.config import settings
 from app.core.logger import setup_logging
+from app.core.http import close_http_session
+from app.core.task_store import run_sweeper
+from app.core import metrics
+from app.core.tracing import TracingMiddleware
 
 # 初始化日志
 setup_logging()
@@ -34,11 +40,25 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # 允许前端读取各阶段耗时和追踪ID
+    expose_headers=["Server-Timing", "X-Trace-Id"],
 )
 
+# 请求追踪（Server-Timing / ?trace=1 / 日志中的 trace_id:span_id）
+app.add_middleware(TracingMiddleware)
+
 # 注册路由
 app.include_router(routes.router, prefix="/api")
 
+
+# 要在挂载前端之前注册，否则会被挂载在 "/" 的静态文件覆盖
+@app.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    """Prometheus 指标（本进程）"""
+    # 部分指标采集时要查询SQLite，放到线程池里
+    return Response(await asyncio.to_thread(metrics.REGISTRY.render), media_type=metrics.CONTENT_TYPE)
+
+
 # 挂载静态文件目录（前端）
 frontend_path = Path(__file__).parent / "frontend"
 if frontend_path.exists():
@@ -55,6 +75,19 @@ async def startup_event():
     Path(settings.TEMP_DIR).mkdir(parents=True, exist_ok=True)
     Path(settings.LOG_FILE).parent.mkdir(parents=True, exist_ok=True)
 
+    # 后台定期清理过期任务和结果，以及逐字稿存储中超过保留期的条目（不依赖预取是否开启）
+    cleanups = [routes.transcript_store.evict] if routes.transcript_store is not None else []
+    app.state.task_sweeper = asyncio.create_task(run_sweeper(routes.task_store, cleanups=cleanups))
+
+    # 后台预取关注的UP主和热门视频的逐字稿（多实例部署时只在一个实例上开启）
+    app.state.prefetch = None
+    if settings.PREFETCH_ENABLED:
+        prefetcher = routes.get_prefetcher()
+        if prefetcher is None:
+            logger.warning("PREFETCH_ENABLED requires TRANSCRIPT_CACHE_ENABLED, prefetch disabled")
+        else:
+            app.state.prefetch = asyncio.create_task(prefetcher.run_forever())
+
     logger.info("Application started successfully")
 
 
@@ -62,6 +95,12 @@ async def startup_event():
 async def shutdown_event():
     """应用关闭时执行"""
     logger.info("Shutting down Bilibili Transcript Extractor...")
+    app.state.task_sweeper.cancel()
+    if app.state.prefetch is not None:
+        routes.get_prefetcher().stop()
+        app.state.prefetch.cancel()
+    await routes.close_services()
+    await close_http_session()
 
 
 @app.get("/")